@@ -0,0 +1,246 @@
+# backend/admission.py
+# Admission control berbasis memori: setiap request berat diberi perkiraan biaya RAM
+# (dari dimensi gambar di header, model & jenis operasi) dan baru jalan kalau total
+# biaya yang sedang berjalan masih di bawah budget. Sisanya menunggu di antrian FIFO
+# (request besar tidak diserobot request kecil) dengan timeout -> 503 + Retry-After.
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from ingest import ImageInfo, target_size
+
+MB = 1024 * 1024
+
+# Byte per pixel gambar kerja (setelah resize) untuk setiap operasi:
+# gambar RGB + mask + salinan hasil (RGBA) + buffer encode, plus kerja float32
+OPERATION_BYTES_PER_PIXEL = {
+    "remove-bg": 16,
+    "remove-bg-full": 32,   # + guided filter float32 & cutout di resolusi hires
+    "erase": 24,            # + patch float32 untuk inpainting
+    "edit-session": 8,      # decode + gambar kerja sesi
+    "edit-stroke": 24,
+    "edit-undo": 8,         # paste patch + encode
+}
+
+# Aktivasi ONNX Runtime per gambar saat inference (di luar bobot model di SessionPool)
+MODEL_ACTIVATION_BYTES = {
+    "u2netp": 40 * MB,
+    "silueta": 60 * MB,
+    "u2net_human_seg": 120 * MB,
+    "u2net": 120 * MB,
+    "isnet-anime": 150 * MB,
+    "isnet-general-use": 150 * MB,
+}
+DEFAULT_ACTIVATION_BYTES = 120 * MB
+
+# Tiket admission request yang sedang berjalan (dipakai run_inference untuk menahan budget
+# sampai job di worker benar-benar selesai, walau client sudah putus)
+current_ticket = contextvars.ContextVar("admission_ticket", default=None)
+
+
+class AdmissionRejected(Exception):
+    """Request tidak mendapat budget memori (antrian penuh / timeout)"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def decode_bytes(info: ImageInfo, max_dimension: int) -> int:
+    """Memori sementara saat decode: JPEG di-decode dengan draft (<= 2x target per sisi),
+    format lain di-decode penuh dulu sebelum resize"""
+    source = info.width * info.height
+    work_w, work_h = target_size(info.width, info.height, max_dimension)
+    if info.format == "JPEG":
+        return min(source, 4 * work_w * work_h) * 3
+    return source * 4
+
+
+def work_cost(width: int, height: int, operation: str) -> int:
+    """Biaya operasi di gambar kerja yang sudah di-decode (mis. gambar sesi edit)"""
+    return width * height * OPERATION_BYTES_PER_PIXEL[operation]
+
+
+def estimate_cost(info: ImageInfo, operation: str, max_dimension: int, model: str = None) -> int:
+    """Perkiraan puncak RAM (byte) untuk memproses satu gambar upload"""
+    cost = decode_bytes(info, max_dimension)
+    cost += work_cost(*target_size(info.width, info.height, max_dimension), operation)
+    if model is not None:
+        cost += MODEL_ACTIVATION_BYTES.get(model, DEFAULT_ACTIVATION_BYTES)
+    return cost
+
+
+class Ticket:
+    """Budget yang dipegang satu request. Kembali ke controller setelah request selesai
+    DAN semua job worker yang sempat jalan (hold) selesai"""
+
+    def __init__(self, controller: "AdmissionController", cost: int):
+        self.controller = controller
+        self.cost = cost
+        self.acquired = time.perf_counter()
+        self._lock = threading.Lock()
+        self._holds = 0
+        self._closed = False
+
+    def wrap(self, fn):
+        """fn untuk worker thread: budget ditahan selama fn jalan"""
+        def job(*args, **kwargs):
+            if not self.hold():
+                # Tiket sudah ditutup & budget sudah kembali: jalan tanpa dihitung,
+                # supaya selesainya job tidak melepas budget untuk kedua kalinya
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._unhold()
+        return job
+
+    def hold(self) -> bool:
+        """Tahan budget untuk satu job (wrap, atau batch inference bersama yang dijalankan
+        pihak lain). False jika tiket sudah ditutup (budget sudah kembali)"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._holds += 1
+            return True
+
+    def unhold(self):
+        """Pasangan hold() setelah job selesai"""
+        self._unhold()
+
+    def _unhold(self):
+        with self._lock:
+            self._holds -= 1
+            finished = self._closed and self._holds == 0
+        if finished:
+            self.controller._release_threadsafe(self.cost)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            finished = self._holds == 0
+        if finished:
+            self.controller._release(self.cost)
+
+
+class AdmissionController:
+    """Budget memori bersama + antrian tunggu FIFO (semua method async dipanggil dari event loop)"""
+
+    def __init__(self, budget_bytes: int, timeout: float = 30, max_waiting: int = 32):
+        self.budget = max(1, budget_bytes)
+        self.timeout = timeout
+        self.max_waiting = max(0, max_waiting)
+        self.in_use = 0
+        self._waiters = deque()  # [cost, future]
+        self._loop = None
+
+        # Statistik
+        self.admitted = 0
+        self.admitted_after_wait = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.peak_in_use = 0
+        self._wait_total = 0.0
+        self._hold_total = 0.0
+        self._released = 0
+
+    def retry_after(self) -> int:
+        """Perkiraan detik sampai antrian sekarang habis (rata-rata lama budget dipegang)"""
+        avg_hold = self._hold_total / self._released if self._released else 5.0
+        return max(1, min(60, math.ceil(avg_hold * (len(self._waiters) + 1))))
+
+    def _fits(self, cost: int) -> bool:
+        # Request yang lebih besar dari budget tetap bisa jalan, tapi sendirian
+        return self.in_use == 0 or self.in_use + cost <= self.budget
+
+    def _grant(self, cost: int):
+        self.in_use += cost
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        self.admitted += 1
+
+    async def acquire(self, cost: int) -> Ticket:
+        self._loop = asyncio.get_running_loop()
+        cost = min(cost, self.budget)
+        if not self._waiters and self._fits(cost):
+            self._grant(cost)
+            return Ticket(self, cost)
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected_full += 1
+            raise AdmissionRejected("Antrian memori penuh", self.retry_after())
+
+        waiter = [cost, self._loop.create_future()]
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[1]), self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Budget bisa saja diberikan tepat saat timeout / cancel
+            granted = waiter[1].done() and not waiter[1].cancelled()
+            cancelled = isinstance(e, asyncio.CancelledError)
+            if not granted:
+                waiter[1].cancel()
+                self._waiters.remove(waiter)
+                # Yang dibuang mungkin kepala antrian yang menghalangi request lain
+                self._wake()
+            elif cancelled:
+                self._release(cost)
+            if cancelled:
+                raise
+            if not granted:
+                self.rejected_timeout += 1
+                raise AdmissionRejected("Timeout menunggu memori", self.retry_after())
+        self._wait_total += time.perf_counter() - start
+        self.admitted_after_wait += 1
+        return Ticket(self, cost)
+
+    def _wake(self):
+        # FIFO ketat: berhenti di kepala antrian yang belum muat
+        while self._waiters and self._fits(self._waiters[0][0]):
+            cost, future = self._waiters.popleft()
+            self._grant(cost)
+            future.set_result(True)
+
+    def _release(self, cost: int):
+        self.in_use -= cost
+        self._wake()
+
+    def _release_threadsafe(self, cost: int):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._release, cost)
+
+    def release(self, ticket: Ticket):
+        """Request selesai memakai tiket (sekali per tiket). Budget kembali setelah
+        job worker yang masih memegang tiket selesai"""
+        self._hold_total += time.perf_counter() - ticket.acquired
+        self._released += 1
+        ticket.close()
+
+    @asynccontextmanager
+    async def holding(self, ticket: Ticket):
+        """Pegang budget dari acquire() selama blok berjalan (tiket tersedia lewat current_ticket)"""
+        token = current_ticket.set(ticket)
+        try:
+            yield ticket
+        finally:
+            current_ticket.reset(token)
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        return {
+            "budget_bytes": self.budget,
+            "in_use_bytes": self.in_use,
+            "peak_in_use_bytes": self.peak_in_use,
+            "waiting": len(self._waiters),
+            "max_waiting": self.max_waiting,
+            "timeout_seconds": self.timeout,
+            "admitted": self.admitted,
+            "admitted_after_wait": self.admitted_after_wait,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_wait_ms": round(self._wait_total / self.admitted_after_wait * 1000, 2) if self.admitted_after_wait else 0.0,
+            "avg_hold_ms": round(self._hold_total / self._released * 1000, 2) if self._released else 0.0,
+        }
@@ -0,0 +1,168 @@
+# backend/benchmarks/bench_erase_payload.py
+# Ukuran payload & waktu parse+decode request magic eraser:
+# JSON base64 (/api/erase-object) vs multipart biner (/api/erase-object/upload)
+# dengan mask PNG RGBA (seperti canvas.toDataURL), PNG 1-bit, RLE dan strokes.
+# Parsing memakai parser Starlette yang sama dengan server.
+#
+#   python benchmarks/bench_erase_payload.py [--size 1600x1200] [--repeat 20] [--json]
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageFilter  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from masks import decode_mask, encode_rle  # noqa: E402
+
+
+def sample_inputs(width: int, height: int):
+    """Foto sintetis (JPEG) + stroke brush user"""
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 255, (height // 4, width // 4, 3), dtype=np.uint8))
+    photo = noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    photo.save(buffer, "JPEG", quality=90)
+
+    strokes = []
+    for i in range(4):
+        points = [[width * (0.2 + 0.15 * i) + 40 * np.sin(t / 3), height * 0.2 + t * height / 60]
+                  for t in range(30)]
+        strokes.append({"size": max(8, width // 40), "points": [[round(x, 1), round(y, 1)] for x, y in points]})
+    spec = {"width": width, "height": height, "strokes": strokes}
+    return buffer.getvalue(), spec
+
+
+def canvas_mask_png(spec) -> bytes:
+    """Mask seperti canvas frontend: RGBA, stroke warna di atas transparan"""
+    mask = decode_mask("strokes", json.dumps(spec))
+    canvas = Image.new("RGBA", mask.size, (0, 0, 0, 0))
+    canvas.paste((255, 60, 60, 160), mask=mask)
+    buffer = io.BytesIO()
+    canvas.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def png_1bit(spec) -> bytes:
+    buffer = io.BytesIO()
+    decode_mask("strokes", json.dumps(spec)).convert("1").save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def multipart_body(fields: dict, files: dict):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data, media_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {media_type}\r\n\r\n'.encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def make_request(body: bytes, content_type: str) -> Request:
+    scope = {
+        "type": "http", "method": "POST", "path": "/", "query_string": b"",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request(scope, receive)
+
+
+async def parse_json(body: bytes, content_type: str):
+    data = await make_request(body, content_type).json()
+    image = Image.open(io.BytesIO(base64.b64decode(data["image"].split(",")[1])))
+    image.load()
+    mask = Image.open(io.BytesIO(base64.b64decode(data["mask"].split(",")[1]))).convert("L")
+    return image, mask
+
+
+def parse_multipart(kind: str):
+    async def parse(body: bytes, content_type: str):
+        form = await make_request(body, content_type).form()
+        image = Image.open(io.BytesIO(await form["image"].read()))
+        image.load()
+        payload = await form["mask"].read() if kind == "png" else form["mask_rle" if kind == "rle" else "strokes"]
+        return image, decode_mask(kind, payload)
+    return parse
+
+
+def build_cases(photo: bytes, spec):
+    canvas_png = canvas_mask_png(spec)
+    json_body = json.dumps({
+        "image": "data:image/jpeg;base64," + base64.b64encode(photo).decode(),
+        "mask": "data:image/png;base64," + base64.b64encode(canvas_png).decode(),
+        "strength": 5, "detail": 2, "quality": "Medium",
+    }).encode()
+    image_file = ("photo.jpg", photo, "image/jpeg")
+    fields = {"strength": 5, "detail": 2, "quality": "Medium"}
+    rle = encode_rle(np.asarray(decode_mask("strokes", json.dumps(spec))))
+    return [
+        ("json-base64 (canvas png)", json_body, "application/json", parse_json),
+        ("multipart png rgba", *multipart_body(fields, {"image": image_file, "mask": ("m.png", canvas_png, "image/png")}),
+         parse_multipart("png")),
+        ("multipart png 1-bit", *multipart_body(fields, {"image": image_file, "mask": ("m.png", png_1bit(spec), "image/png")}),
+         parse_multipart("png")),
+        ("multipart rle", *multipart_body({**fields, "mask_rle": rle}, {"image": image_file}), parse_multipart("rle")),
+        ("multipart strokes", *multipart_body({**fields, "strokes": json.dumps(spec)}, {"image": image_file}),
+         parse_multipart("strokes")),
+    ]
+
+
+async def run(size, repeat: int):
+    photo, spec = sample_inputs(*size)
+    results = []
+    for name, body, content_type, parse in build_cases(photo, spec):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await parse(body, content_type)
+            timings.append((time.perf_counter() - start) * 1000)
+        results.append({
+            "path": name,
+            "payload_bytes": len(body),
+            "parse_decode_ms": round(sorted(timings)[len(timings) // 2], 2),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark payload magic eraser")
+    parser.add_argument("--size", default="1600x1200", help="Ukuran gambar WxH")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    results = asyncio.run(run((width, height), args.repeat))
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results[0]["payload_bytes"]
+    print(f"{'path':<28}{'payload KB':>12}{'vs json':>9}{'parse+decode ms':>17}")
+    for row in results:
+        print(f"{row['path']:<28}{row['payload_bytes'] / 1024:>12.1f}"
+              f"{row['payload_bytes'] / baseline:>9.2f}{row['parse_decode_ms']:>17}")
+
+
+if __name__ == "__main__":
+    main()
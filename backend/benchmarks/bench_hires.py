@@ -0,0 +1,171 @@
+# backend/benchmarks/bench_hires.py
+# Benchmark remove-bg resolusi penuh: inference di gambar penuh vs inference di
+# salinan kecil + upsample mask (guided filter / bilinear biasa).
+# Setiap mode jalan di subprocess sendiri supaya peak RSS tidak tercampur.
+#
+#   python benchmarks/bench_hires.py [--size 4000x3000] [--model u2netp] [--repeat 3] [--json]
+#
+# Tanpa --model (atau rembg tidak terpasang) dipakai segmenter sintetis "ideal"
+# (ground truth di resolusi input), jadi latency hanya mengukur biaya di luar model
+# dan MAE murni mengukur kualitas upsampling.
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from matting import guided_upsample  # noqa: E402
+
+SERVER_MAX_DIMENSION = 1024
+MODES = ("full", "hires", "bilinear")
+
+
+def draw_shape(draw: ImageDraw.ImageDraw, width: int, height: int, fill):
+    """Objek dengan tepi lengkung + sudut tajam + detail tipis"""
+    draw.ellipse((width * 0.2, height * 0.15, width * 0.7, height * 0.85), fill=fill)
+    draw.polygon([
+        (width * 0.55, height * 0.3), (width * 0.9, height * 0.2),
+        (width * 0.75, height * 0.55), (width * 0.92, height * 0.8), (width * 0.55, height * 0.7),
+    ], fill=fill)
+    for i in range(6):
+        x = width * (0.25 + i * 0.06)
+        draw.line((x, height * 0.05, x + width * 0.02, height * 0.2), fill=fill, width=max(2, width // 800))
+
+
+def synthetic_scene(width: int, height: int, seed: int = 0):
+    """Gambar uji (background bertekstur) + ground truth mask resolusi penuh"""
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 40, size=(height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+    background = Image.fromarray(noise).resize((width, height), Image.BILINEAR)
+    background = Image.blend(background, Image.new("RGB", (width, height), (40, 90, 160)), 0.6)
+
+    truth = Image.new("L", (width, height), 0)
+    draw_shape(ImageDraw.Draw(truth), width, height, 255)
+    foreground = Image.new("RGB", (width, height), (225, 190, 120))
+    image = Image.composite(foreground, background, truth).filter(ImageFilter.GaussianBlur(1))
+    return image, truth
+
+
+def downscale(image: Image.Image) -> Image.Image:
+    w, h = image.size
+    if max(w, h) <= SERVER_MAX_DIMENSION:
+        return image
+    ratio = SERVER_MAX_DIMENSION / max(w, h)
+    return image.resize((int(w * ratio), int(h * ratio)), Image.LANCZOS)
+
+
+def make_predictor(model_name, truth: Image.Image):
+    if model_name:
+        try:
+            from rembg import new_session
+        except ImportError:
+            print("rembg tidak terpasang, pakai segmenter sintetis", file=sys.stderr)
+        else:
+            session = new_session(model_name)
+            return lambda image: session.predict(image)[0].convert("L")
+    # Segmenter ideal: ground truth diperkecil ke ukuran input
+    return lambda image: truth.resize(image.size, Image.LANCZOS)
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS proses ini. VmHWM (Linux) karena ru_maxrss ikut mewarisi peak proses parent"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, scene_dir: str, model_name, repeat: int) -> dict:
+    image = Image.open(os.path.join(scene_dir, "image.png")).convert("RGB")
+    truth = Image.open(os.path.join(scene_dir, "truth.png")).convert("L")
+    predict = make_predictor(model_name, truth)
+    baseline_mb = peak_rss_mb()
+    timings = []
+    mask = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if mode == "full":
+            mask = predict(image)
+        else:
+            low_mask = predict(downscale(image))
+            if mode == "hires":
+                mask = guided_upsample(low_mask, image)
+            else:
+                mask = low_mask.resize(image.size, Image.BILINEAR)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    error = np.abs(np.asarray(mask, dtype=np.int16) - np.asarray(truth, dtype=np.int16))
+    # Area tepi: pixel yang berubah setelah ground truth di-dilate/erode
+    edge = (np.asarray(truth.filter(ImageFilter.MaxFilter(9)))
+            != np.asarray(truth.filter(ImageFilter.MinFilter(9))))
+    return {
+        "mode": mode,
+        "size": f"{image.width}x{image.height}",
+        "predictor": model_name or "synthetic",
+        "latency_ms": round(sorted(timings)[len(timings) // 2], 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        # Tambahan memori di atas gambar input + model yang sudah di-load
+        "peak_extra_mb": round(peak_rss_mb() - baseline_mb, 1),
+        "mae": round(float(error.mean()), 3),
+        "edge_mae": round(float(error[edge].mean()), 2),
+    }
+
+
+def parse_size(text: str):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mask upsampling resolusi penuh")
+    parser.add_argument("--size", default="4000x3000", help="Ukuran gambar uji WxH")
+    parser.add_argument("--model", default=None, help="Model rembg (default: segmenter sintetis)")
+    parser.add_argument("--repeat", type=int, default=3)
+    # Dipakai subprocess per mode
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--scene-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.scene_dir, args.model, args.repeat)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as scene_dir:
+        image, truth = synthetic_scene(*parse_size(args.size))
+        image.save(os.path.join(scene_dir, "image.png"), compress_level=1)
+        truth.save(os.path.join(scene_dir, "truth.png"), compress_level=1)
+        del image, truth
+        for mode in MODES:
+            cmd = [sys.executable, os.path.abspath(__file__), "--mode", mode,
+                   "--scene-dir", scene_dir, "--repeat", str(args.repeat)]
+            if args.model:
+                cmd += ["--model", args.model]
+            output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"predictor: {results[0]['predictor']}, gambar {results[0]['size']}")
+    print(f"{'mode':<10}{'latency ms':>12}{'peak RSS MB':>14}{'+MB':>8}{'MAE':>8}{'edge MAE':>10}")
+    for row in results:
+        print(f"{row['mode']:<10}{row['latency_ms']:>12}{row['peak_rss_mb']:>14}"
+              f"{row['peak_extra_mb']:>8}{row['mae']:>8}{row['edge_mae']:>10}")
+
+
+if __name__ == "__main__":
+    main()
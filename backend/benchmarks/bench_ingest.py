@@ -0,0 +1,133 @@
+# backend/benchmarks/bench_ingest.py
+# Benchmark decode upload: jalur lama (Image.open + exif_transpose ukuran penuh + resize)
+# vs ingest.load_image (cek header, JPEG draft/DCT scaling, orientasi setelah resize).
+# Setiap kombinasi jalan di subprocess sendiri supaya peak RSS tidak tercampur.
+#
+#   python benchmarks/bench_ingest.py [--size 4000x3000] [--repeat 5] [--bomb] [--json]
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageFilter, ImageOps  # noqa: E402
+
+from ingest import ImageTooLarge, load_image  # noqa: E402
+
+SERVER_MAX_DIMENSION = 1024
+PATHS = ("legacy", "ingest")
+FORMATS = ("jpeg", "png")
+
+
+def photo(width: int, height: int) -> Image.Image:
+    """Foto sintetis bertekstur (supaya ukuran file realistis)"""
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8))
+    return noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(1))
+
+
+def write_samples(directory: str, width: int, height: int):
+    """Foto kamera: disimpan landscape dengan EXIF Orientation=6 (portrait)"""
+    image = photo(width, height)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image.save(os.path.join(directory, "photo.jpeg"), "JPEG", quality=90, exif=exif)
+    image.save(os.path.join(directory, "photo.png"), "PNG", compress_level=1, exif=exif)
+    # Decompression bomb: PNG 1-bit 9000x9000 (81MP, masih di bawah batas bawaan PIL)
+    # hanya beberapa KB tapi ~80MB setelah decode
+    Image.new("1", (9000, 9000)).save(os.path.join(directory, "bomb.png"), optimize=True)
+
+
+def legacy_decode(data: bytes) -> Image.Image:
+    """Jalur sebelum ingest.py (decode_image_job lama)"""
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    w, h = image.size
+    if max(w, h) > SERVER_MAX_DIMENSION:
+        ratio = SERVER_MAX_DIMENSION / max(w, h)
+        image = image.resize((int(w * ratio), int(h * ratio)), Image.LANCZOS)
+    return image
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS proses ini. VmHWM (Linux) karena ru_maxrss ikut mewarisi peak proses parent"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(path: str, filename: str, repeat: int) -> dict:
+    with open(filename, "rb") as f:
+        data = f.read()
+    decode = legacy_decode if path == "legacy" else (lambda d: load_image(d, SERVER_MAX_DIMENSION))
+    baseline_mb = peak_rss_mb()
+    timings = []
+    image = None
+    rejected = False
+    for _ in range(repeat):
+        start = time.perf_counter()
+        try:
+            image = decode(data)
+            image.load()
+        except (ImageTooLarge, Image.DecompressionBombError):
+            rejected = True
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "path": path,
+        "file": os.path.basename(filename),
+        "file_kb": round(len(data) / 1024, 1),
+        "output": "rejected" if rejected else f"{image.width}x{image.height}",
+        "decode_ms": round(sorted(timings)[len(timings) // 2], 1),
+        "peak_extra_mb": round(peak_rss_mb() - baseline_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decode gambar upload")
+    parser.add_argument("--size", default="4000x3000", help="Ukuran foto uji WxH")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--bomb", action="store_true", help="Sertakan PNG decompression bomb")
+    # Dipakai subprocess per kombinasi
+    parser.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    if args.path:
+        print(json.dumps(run_case(args.path, args.file, args.repeat)))
+        return
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        write_samples(directory, width, height)
+        files = [f"photo.{fmt}" for fmt in FORMATS] + (["bomb.png"] if args.bomb else [])
+        for name in files:
+            for path in PATHS:
+                cmd = [sys.executable, os.path.abspath(__file__), "--path", path,
+                       "--file", os.path.join(directory, name), "--repeat", str(args.repeat)]
+                output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'file':<12}{'path':<8}{'KB':>9}{'output':>11}{'decode ms':>11}{'peak +MB':>10}")
+    for row in results:
+        print(f"{row['file']:<12}{row['path']:<8}{row['file_kb']:>9}{row['output']:>11}"
+              f"{row['decode_ms']:>11}{row['peak_extra_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+# backend/benchmarks/bench_quantize.py
+# Benchmark model rembg FP32 vs INT8 (dynamic quantization) dengan profil ONNX Runtime
+# yang sama: latency, RAM (load model & puncak saat inference), ukuran file, dan
+# kemiripan mask INT8 terhadap FP32 (IoU mask biner + MAE alpha).
+# Setiap presisi jalan di subprocess sendiri supaya peak RSS tidak tercampur.
+#
+#   python benchmarks/bench_quantize.py [--model u2netp] [--images DIR] [--repeat 5]
+#          [--intra 2] [--inter 1] [--execution-mode sequential] [--opt-level extended]
+#          [--no-arena] [--no-mem-pattern] [--json]
+#
+# Butuh rembg + onnxruntime (model di-download rembg ke ~/.u2net kalau belum ada).
+# Tanpa --images dipakai gambar sintetis dari bench_hires.
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from bench_hires import downscale, synthetic_scene  # noqa: E402
+from model_runtime import EXECUTION_MODES, GRAPH_OPTIMIZATION_LEVELS, PRECISIONS, ExecutionProfile, SessionBuilder  # noqa: E402
+
+MASK_THRESHOLD = 128  # alpha >= nilai ini dianggap foreground untuk IoU
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS proses ini. VmHWM (Linux) karena ru_maxrss ikut mewarisi peak proses parent"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_inputs(directory: str, images_dir: str, count: int):
+    """Gambar uji (sudah diperkecil ke ukuran server) sebagai PNG di directory"""
+    if images_dir:
+        paths = sorted(p for ext in ("jpg", "jpeg", "png", "webp") for p in glob.glob(os.path.join(images_dir, f"*.{ext}")))
+        if not paths:
+            sys.exit(f"Tidak ada gambar di {images_dir}")
+        images = (Image.open(p).convert("RGB") for p in paths)
+    else:
+        images = (synthetic_scene(1024 + 128 * i, 768, seed=i)[0] for i in range(count))
+    for i, image in enumerate(images):
+        downscale(image).save(os.path.join(directory, f"input_{i:03d}.png"), compress_level=1)
+
+
+def profile_from_args(args) -> ExecutionProfile:
+    return ExecutionProfile(
+        intra_op_threads=args.intra,
+        inter_op_threads=args.inter,
+        execution_mode=args.execution_mode,
+        graph_optimization=args.opt_level,
+        cpu_mem_arena=not args.no_arena,
+        mem_pattern=not args.no_mem_pattern,
+    )
+
+
+def run_precision(precision: str, args) -> dict:
+    inputs = sorted(glob.glob(os.path.join(args.work_dir, "input_*.png")))
+    images = [Image.open(p).convert("RGB") for p in inputs]
+    builder = SessionBuilder(args.cache_dir, profile_from_args(args), precision)
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    session = builder(args.model)
+    load_ms = (time.perf_counter() - start) * 1000
+    if builder.fallbacks:
+        sys.exit(f"Session {precision} gagal dibuat (lihat log di atas)")
+    model_mb = rss_mb() - rss_before
+    session.predict(images[0])  # warmup (alokasi arena)
+    baseline_mb = peak_rss_mb()
+
+    timings = []
+    for _ in range(args.repeat):
+        for image in images:
+            t = time.perf_counter()
+            session.predict(image)
+            timings.append((time.perf_counter() - t) * 1000)
+    # Mask terakhir disimpan untuk dibandingkan dengan FP32 di proses parent
+    for path, image in zip(inputs, images):
+        mask = session.predict(image)[0].convert("L")
+        mask.save(path.replace("input_", f"mask_{precision}_"))
+
+    timings.sort()
+    model_path = glob.glob(os.path.join(args.cache_dir, f"{args.model}.int8.onnx")) if precision == "int8" else []
+    source = model_path[0] if model_path else str(type(session).download_models())
+    return {
+        "precision": precision,
+        "model_file_mb": round(os.path.getsize(source) / 1024 / 1024, 1),
+        "load_ms": round(load_ms, 1),
+        "p50_ms": round(timings[len(timings) // 2], 1),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 1),
+        "model_mb": round(model_mb, 1),
+        # Tambahan RAM puncak saat inference, di atas model yang sudah di-load + warmup
+        "peak_extra_mb": round(peak_rss_mb() - baseline_mb, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def compare_masks(work_dir: str, precision: str) -> dict:
+    """IoU & MAE mask presisi ini vs FP32 (per gambar, dirangkum)"""
+    ious, maes = [], []
+    for reference in sorted(glob.glob(os.path.join(work_dir, "mask_fp32_*.png"))):
+        a = np.asarray(Image.open(reference), dtype=np.int16)
+        b = np.asarray(Image.open(reference.replace("mask_fp32_", f"mask_{precision}_")), dtype=np.int16)
+        fa, fb = a >= MASK_THRESHOLD, b >= MASK_THRESHOLD
+        union = np.logical_or(fa, fb).sum()
+        ious.append(np.logical_and(fa, fb).sum() / union if union else 1.0)
+        maes.append(np.abs(a - b).mean())
+    return {
+        "iou_mean": round(float(np.mean(ious)), 4),
+        "iou_min": round(float(np.min(ious)), 4),
+        "alpha_mae": round(float(np.mean(maes)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model rembg FP32 vs INT8")
+    parser.add_argument("--model", default="u2netp")
+    parser.add_argument("--images", default=None, help="Folder gambar uji (default: gambar sintetis)")
+    parser.add_argument("--count", type=int, default=4, help="Jumlah gambar sintetis")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cache-dir", default=None, help="Folder model INT8 & graph cache (default: sementara)")
+    parser.add_argument("--intra", type=int, default=0, help="Thread intra-op (0 = default ORT)")
+    parser.add_argument("--inter", type=int, default=0, help="Thread inter-op (0 = default ORT)")
+    parser.add_argument("--execution-mode", default="sequential", choices=EXECUTION_MODES)
+    parser.add_argument("--opt-level", default="extended", choices=GRAPH_OPTIMIZATION_LEVELS)
+    parser.add_argument("--no-arena", action="store_true", help="Matikan CPU memory arena")
+    parser.add_argument("--no-mem-pattern", action="store_true", help="Matikan memory pattern")
+    # Dipakai subprocess per presisi
+    parser.add_argument("--precision", choices=PRECISIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    if args.precision:
+        print(json.dumps(run_precision(args.precision, args)))
+        return
+
+    try:
+        import onnxruntime  # noqa: F401
+        import rembg  # noqa: F401
+    except ImportError as e:
+        sys.exit(f"Benchmark ini butuh rembg & onnxruntime: {e}")
+
+    passthrough = [
+        "--model", args.model, "--repeat", str(args.repeat), "--intra", str(args.intra),
+        "--inter", str(args.inter), "--execution-mode", args.execution_mode, "--opt-level", args.opt_level,
+    ] + (["--no-arena"] if args.no_arena else []) + (["--no-mem-pattern"] if args.no_mem_pattern else [])
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_dir = args.cache_dir or os.path.join(work_dir, "models")
+        os.makedirs(cache_dir, exist_ok=True)
+        write_inputs(work_dir, args.images, args.count)
+        for precision in PRECISIONS:
+            cmd = [sys.executable, os.path.abspath(__file__), "--precision", precision,
+                   "--work-dir", work_dir, "--cache-dir", cache_dir] + passthrough
+            output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        for row in results:
+            row.update(compare_masks(work_dir, row["precision"]))
+
+    if args.json:
+        print(json.dumps({"model": args.model, "profile": profile_from_args(args).describe(), "results": results}, indent=2))
+        return
+    print(f"model: {args.model}, profil ORT: {profile_from_args(args).describe()}")
+    print(f"{'precision':<10}{'file MB':>8}{'load ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'model MB':>10}"
+          f"{'peak +MB':>10}{'IoU':>8}{'IoU min':>9}{'MAE':>7}")
+    for row in results:
+        print(f"{row['precision']:<10}{row['model_file_mb']:>8}{row['load_ms']:>9}{row['p50_ms']:>8}{row['p95_ms']:>8}"
+              f"{row['model_mb']:>10}{row['peak_extra_mb']:>10}{row['iou_mean']:>8}{row['iou_min']:>9}{row['alpha_mae']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_ratelimit.py
+# Microbenchmark rate limiter: biaya per check harus konstan walau client banyak.
+#
+#   python benchmarks/bench_ratelimit.py [--checks 200000] [--json]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ratelimit import TokenBucketLimiter  # noqa: E402
+
+
+def legacy_check(history: dict, ip: str, now: float) -> bool:
+    """Algoritma lama check_rate_limit (scan semua IP setiap request)"""
+    if ip in history and now - history[ip] > 3600:
+        del history[ip]
+    request_count = sum(1 for t in history.values() if now - t < 60)
+    if request_count > 10:
+        return False
+    history[ip] = now
+    return True
+
+
+def bench_token_bucket(clients: int, checks: int) -> float:
+    limiter = TokenBucketLimiter(rate_per_minute=10, burst=10, max_clients=clients * 2)
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    now = time.monotonic()
+    for ip in ips:
+        limiter.check(ip, now)
+    sample = [random.choice(ips) for _ in range(checks)]
+    start = time.perf_counter()
+    for ip in sample:
+        limiter.check(ip)
+    return (time.perf_counter() - start) / checks * 1e9
+
+
+def bench_legacy(clients: int, checks: int) -> float:
+    now = time.time()
+    history = {f"ip{i}": now - 120 for i in range(clients)}
+    start = time.perf_counter()
+    for i in range(checks):
+        legacy_check(history, f"ip{i % clients}", now)
+    return (time.perf_counter() - start) / checks * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rate limiter")
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    results = []
+    for clients in (100, 1_000, 10_000, 100_000):
+        row = {"clients": clients, "token_bucket_ns_per_check": round(bench_token_bucket(clients, args.checks), 1)}
+        # Algoritma lama O(N): cukup sedikit iterasi supaya tidak kelamaan
+        legacy_checks = max(10, args.checks // clients // 10)
+        row["legacy_ns_per_check"] = round(bench_legacy(clients, legacy_checks), 1)
+        results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'clients':>10} {'token bucket (ns)':>20} {'legacy (ns)':>15}")
+        for row in results:
+            print(f"{row['clients']:>10} {row['token_bucket_ns_per_check']:>20} {row['legacy_ns_per_check']:>15}")
+
+
+if __name__ == "__main__":
+    main()
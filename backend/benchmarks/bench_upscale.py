@@ -0,0 +1,128 @@
+# backend/benchmarks/bench_upscale.py
+# Benchmark Smart Upscaler: jalur naif (resize gambar utuh + unsharp + PNG Pillow)
+# vs upscaler.upscale_png_stream (tile paralel + PNG streaming per band).
+# Setiap jalur jalan di subprocess sendiri supaya peak RSS tidak tercampur.
+#
+#   python benchmarks/bench_upscale.py [--size 3000x2000] [--scale 4] [--workers N] [--json]
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageFilter  # noqa: E402
+
+from upscaler import UpscaleParams, upscale_png_stream  # noqa: E402
+
+PATHS = ("naive", "tiled")
+
+
+def photo(width: int, height: int) -> Image.Image:
+    """Foto sintetis bertekstur (supaya ukuran PNG realistis)"""
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8))
+    return noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(1))
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS proses ini. VmHWM (Linux) karena ru_maxrss ikut mewarisi peak proses parent"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def naive_upscale(image: Image.Image, params: UpscaleParams, output: str):
+    result = image.resize((image.width * params.scale, image.height * params.scale), Image.LANCZOS)
+    result = result.filter(ImageFilter.UnsharpMask(params.radius, params.sharpen, params.threshold))
+    result.save(output, "PNG", compress_level=1)
+
+
+def tiled_upscale(image: Image.Image, params: UpscaleParams, output: str, workers: int):
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(output, "wb") as f:
+        for chunk in upscale_png_stream(image, params, executor, "fast"):
+            f.write(chunk)
+
+
+def run_case(path: str, source: str, scale: int, workers: int) -> dict:
+    image = Image.open(source)
+    image.load()
+    params = UpscaleParams(scale=scale)
+    baseline_mb = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "out.png")
+        cpu_start, start = cpu_seconds(), time.perf_counter()
+        if path == "naive":
+            naive_upscale(image, params, output)
+        else:
+            tiled_upscale(image, params, output, workers)
+        elapsed = time.perf_counter() - start
+        cpu = cpu_seconds() - cpu_start
+        size = os.path.getsize(output)
+        with Image.open(output) as result:
+            output_size = f"{result.width}x{result.height}"
+    return {
+        "path": path,
+        "output": output_size,
+        "seconds": round(elapsed, 2),
+        # > 1 berarti lebih dari satu core terpakai
+        "cores_used": round(cpu / elapsed, 2),
+        "output_mb": round(size / 1024 / 1024, 1),
+        "peak_extra_mb": round(peak_rss_mb() - baseline_mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Smart Upscaler")
+    parser.add_argument("--size", default="3000x2000", help="Ukuran foto sumber WxH")
+    parser.add_argument("--scale", type=int, default=4, choices=(2, 4))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    # Dipakai subprocess per jalur
+    parser.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    if args.path:
+        print(json.dumps(run_case(args.path, args.file, args.scale, args.workers)))
+        return
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "photo.png")
+        photo(width, height).save(source, compress_level=1)
+        for path in PATHS:
+            cmd = [sys.executable, os.path.abspath(__file__), "--path", path, "--file", source,
+                   "--scale", str(args.scale), "--workers", str(args.workers)]
+            output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"sumber {args.size}, scale {args.scale}x, workers {args.workers}")
+    print(f"{'path':<8}{'output':>13}{'detik':>8}{'core':>7}{'PNG MB':>9}{'peak +MB':>10}")
+    for row in results:
+        print(f"{row['path']:<8}{row['output']:>13}{row['seconds']:>8}{row['cores_used']:>7}"
+              f"{row['output_mb']:>9}{row['peak_extra_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# backend/benchmarks/check_remove_bg_resolution.py
+# Cek ukuran output remove-bg per resolution x quality: mode standard dibatasi sisi
+# quality (Low 640 / Medium 1024 / High 2048), mode full harus tetap di resolusi decode
+# (sisi terpanjang dibatasi HIRES_MAX_DIMENSION), apa pun quality-nya.
+# Model sintetis dari loadtest.py (tanpa rembg), pipeline main dipanggil langsung.
+#
+#   python benchmarks/check_remove_bg_resolution.py [--size 4000x3000]
+#
+# Exit 1 jika ada ukuran yang tidak sesuai.
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image  # noqa: E402
+
+from loadtest import SyntheticSession, configure_environment, encode, synthetic_photo  # noqa: E402
+
+QUALITY_DIMENSIONS = {"Low": 640, "Medium": 1024, "High": 2048}
+
+
+def expected_size(width: int, height: int, max_dimension: int):
+    if max(width, height) <= max_dimension:
+        return width, height
+    ratio = max_dimension / max(width, height)
+    return int(width * ratio), int(height * ratio)
+
+
+async def run_checks(main, photo: bytes, width: int, height: int) -> list:
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        while not main.startup.ready:
+            await asyncio.sleep(0.05)
+        for resolution in main.RESOLUTION_MODES:
+            for quality, quality_dimension in QUALITY_DIMENSIONS.items():
+                data = await main.remove_bg_pipeline(photo, quality, "png", "fast", resolution=resolution)
+                with Image.open(io.BytesIO(data)) as result:
+                    got = result.size
+                if resolution == "full":
+                    want = expected_size(width, height, main.HIRES_MAX_DIMENSION)
+                else:
+                    # Inference & output standard: decode ke SERVER_MAX_DIMENSION, lalu batas quality
+                    decoded = expected_size(width, height, main.SERVER_MAX_DIMENSION)
+                    want = expected_size(*decoded, quality_dimension)
+                results.append((resolution, quality, got, want))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek ukuran output remove-bg per resolution")
+    parser.add_argument("--size", default="4000x3000", help="Ukuran foto upload WxH")
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        import main as app_main
+
+        app_main.session_pool.session_factory = lambda name: SyntheticSession(0)
+        photo = encode(synthetic_photo(width, height), "JPEG", quality=90)
+        results = asyncio.run(run_checks(app_main, photo, width, height))
+
+    failed = 0
+    for resolution, quality, got, want in results:
+        # Toleransi 1 px: pembulatan draft JPEG / resize
+        ok = all(abs(g - w) <= 1 for g, w in zip(got, want))
+        failed += not ok
+        print(f"{'OK  ' if ok else 'GAGAL'} {resolution:<9}{quality:<8} {got[0]}x{got[1]} (harus {want[0]}x{want[1]})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# backend/benchmarks/check_video_stream.py
+# Cek jalur rawan download video mode stream terhadap sumber media HTTP lokal
+# (MediaServer + StandInYDL dari loadtest.py, tanpa jaringan / yt-dlp):
+# - client putus di tengah stream: download tetap selesai ke disk
+# - cancel saat antrian penuh (backpressure): worker lepas, job berikutnya jalan
+# - event loop berhenti saat antrian penuh (shutdown): worker tidak tertahan
+# - channel yang tidak pernah dibaca tidak menahan worker setelah di-detach
+#
+#   python benchmarks/check_video_stream.py [--video-mb 4]
+#
+# Exit 1 jika ada cek yang gagal.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from jobs import JOB_CANCELLED, JOB_FINISHED, VideoJobManager  # noqa: E402
+from loadtest import MediaServer, StandInYDL  # noqa: E402
+
+URL = "https://www.youtube.com/watch?v=check000"
+TIMEOUT = 10
+
+
+def make_manager(folder: str, media: MediaServer, video_bytes: int) -> VideoJobManager:
+    # Satu worker: job yang tertahan langsung terlihat dari job berikutnya yang tidak jalan
+    return VideoJobManager(
+        folder, max_workers=1, max_pending=4,
+        ydl_factory=lambda opts: StandInYDL(opts, 0, video_bytes, 0, media.base_url),
+    )
+
+
+def wait_done(job, timeout: float = TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return job.done
+
+
+async def wait_full(channel, timeout: float = TIMEOUT):
+    """Tunggu sampai producer tertahan di antrian penuh"""
+    deadline = time.monotonic() + timeout
+    while not channel._queue.full() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return channel._queue.full()
+
+
+async def check_disconnect(manager, video_bytes: int):
+    job, channel = manager.submit_stream(URL + "a", "best", asyncio.get_running_loop(), 2)
+    kind, meta = await channel.get()
+    received = 0
+    chunks = channel.chunks()
+    async for chunk in chunks:
+        received += len(chunk)
+        if received >= video_bytes // 4:
+            break
+    await chunks.aclose()  # seperti StreamingResponse saat client putus
+    finished = await asyncio.to_thread(wait_done, job)
+    size = os.path.getsize(job.path) if job.path else 0
+    return finished and job.status == JOB_FINISHED and size == video_bytes, \
+        f"status {job.status}, file {size}/{video_bytes} byte setelah putus di {received}"
+
+
+async def check_cancel_backpressure(manager):
+    job, channel = manager.submit_stream(URL + "b", "best", asyncio.get_running_loop(), 1)
+    await channel.get()
+    full = await wait_full(channel)
+    manager.cancel(job.id)
+    cancelled = await asyncio.to_thread(wait_done, job)
+    # Worker harus sudah bebas untuk job berikutnya
+    nxt, next_channel = manager.submit_stream(URL + "c", "best", asyncio.get_running_loop(), 1)
+    started = (await asyncio.wait_for(next_channel.get(), TIMEOUT))[0] == "meta"
+    next_channel.detach()
+    await asyncio.to_thread(wait_done, nxt)
+    return full and cancelled and job.status == JOB_CANCELLED and started, \
+        f"antrian penuh {full}, status {job.status}, job berikutnya mulai {started}"
+
+
+async def check_never_iterated(manager):
+    job, channel = manager.submit_stream(URL + "d", "best", asyncio.get_running_loop(), 1)
+    await channel.get()
+    await wait_full(channel)
+    await channel.close()  # BackgroundTask / finally endpoint
+    finished = await asyncio.to_thread(wait_done, job)
+    return finished and job.status == JOB_FINISHED, f"status {job.status}"
+
+
+def check_loop_stopped(manager):
+    """Event loop berhenti (shutdown server) selagi producer menunggu antrian penuh"""
+    loop = asyncio.new_event_loop()
+    state = {}
+
+    async def start():
+        state["job"], channel = manager.submit_stream(URL + "e", "best", loop, 1)
+        await channel.get()
+        await wait_full(channel)
+
+    loop.run_until_complete(start())
+    # Seperti asyncio.run / uvicorn saat berhenti: task yang tersisa dibatalkan, loop ditutup
+    pending = asyncio.all_tasks(loop)
+    for task in pending:
+        task.cancel()
+    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+    job = state["job"]
+    finished = wait_done(job)
+    return finished and job.status == JOB_FINISHED, f"status {job.status} setelah loop ditutup"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cek download video mode stream")
+    parser.add_argument("--video-mb", type=float, default=4)
+    args = parser.parse_args()
+    video_bytes = int(args.video_mb * 1024 * 1024)
+    media = MediaServer(video_bytes, 0)
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as folder:
+        manager = make_manager(folder, media, video_bytes)
+
+        async def run_async():
+            return [
+                ("client putus", await check_disconnect(manager, video_bytes)),
+                ("cancel saat backpressure", await check_cancel_backpressure(manager)),
+                ("channel tidak dibaca", await check_never_iterated(manager)),
+            ]
+
+        results = asyncio.run(run_async())
+        results.append(("event loop berhenti", check_loop_stopped(manager)))
+        manager.shutdown()
+
+        for name, (ok, detail) in results:
+            failed += not ok
+            print(f"{'OK  ' if ok else 'GAGAL'} {name}: {detail}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
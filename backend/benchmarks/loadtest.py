@@ -0,0 +1,553 @@
+# backend/benchmarks/loadtest.py
+# Load test API Azura Engine yang bisa diulang: throughput, latency p50/p95/p99
+# dan peak RSS server per endpoint, dengan concurrency yang bisa diatur.
+#
+# - transport "inprocess": app FastAPI dipanggil langsung lewat ASGI (httpx.ASGITransport)
+# - transport "http": server uvicorn di subprocess, request lewat TCP lokal
+# Gambar sintetis beberapa ukuran; setiap request diberi byte unik setelah marker
+# akhir file (EOI / IEND) supaya result cache tidak membuat angka jadi terlalu bagus.
+# yt-dlp diganti stand-in lokal (tanpa jaringan); sumber media untuk mode stream
+# dilayani server HTTP lokal di thread terpisah. Model rembg dipakai kalau terpasang,
+# selain itu (atau --synthetic-model) dipakai model sintetis dengan latency tetap.
+# Peak RSS diukur dari proses server; di mode inprocess angka itu termasuk client
+# (httpx.ASGITransport menampung body response di memori), pakai mode http untuk RSS.
+#
+#   python benchmarks/loadtest.py [--transport inprocess|http] [--concurrency 4] [--requests 40]
+#          [--sizes 640x480,1600x1200] [--scenarios remove-bg,erase-object,video-info]
+#          [--json hasil.json] [--compare baseline.json --max-regression 0.2]
+#
+# Butuh httpx (dan uvicorn untuk --transport http).
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+SCENARIOS = ("health", "remove-bg", "erase-object", "erase-object-upload", "video-info", "video-download",
+             "video-stream")
+IMAGE_SCENARIOS = ("remove-bg", "erase-object", "erase-object-upload")
+# Metrik yang dibandingkan dengan baseline (--compare): naik = regresi
+LOWER_IS_BETTER = ("p95_ms", "p99_ms")
+
+
+# --- STAND-IN LOKAL ---
+
+def throttle_delay(chunk: int, mbps: float) -> float:
+    return chunk / (mbps * 1024 * 1024 / 8) if mbps > 0 else 0
+
+
+class MediaServer:
+    """Sumber media lokal (pengganti CDN video): GET /media/<id> = video_bytes byte
+    dengan Content-Length, dikirim per chunk dengan bandwidth mbps"""
+
+    def __init__(self, video_bytes: int, mbps: float):
+        video_bytes_, mbps_ = video_bytes, mbps
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(video_bytes_))
+                self.end_headers()
+                chunk = 256 * 1024
+                sent = 0
+                try:
+                    while sent < video_bytes_:
+                        size = min(chunk, video_bytes_ - sent)
+                        self.wfile.write(b"\0" * size)
+                        sent += size
+                        time.sleep(throttle_delay(size, mbps_))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+class StandInYDL:
+    """Pengganti yt_dlp.YoutubeDL: metadata tetap, download = tulis file lokal,
+    URL format terpilih menunjuk ke MediaServer (dibaca lewat urlopen di mode stream)"""
+
+    def __init__(self, opts: dict, extract_ms: float, video_bytes: int, mbps: float, media_url: str = None):
+        self.opts = opts
+        self.extract_ms = extract_ms
+        self.video_bytes = video_bytes
+        self.mbps = mbps
+        self.media_url = media_url
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, url: str, download: bool = False) -> dict:
+        time.sleep(self.extract_ms / 1000)
+        return {
+            # Format terpilih (seperti yt-dlp setelah format selection)
+            "url": f"{self.media_url}/media/{url[-8:]}" if self.media_url else None,
+            "ext": "mp4",
+            "protocol": "http",
+            "http_headers": {"User-Agent": "azura-bench"},
+            "title": f"Bench video {url[-8:]}",
+            "thumbnail": None,
+            "duration_string": "0:30",
+            "extractor_key": "Youtube",
+            "formats": [
+                {"format_id": str(18 + i), "vcodec": "avc1", "ext": "mp4", "height": height,
+                 "filesize": self.video_bytes, "format_note": f"{height}p"}
+                for i, height in enumerate((360, 480, 720, 1080))
+            ],
+        }
+
+    def urlopen(self, request):
+        if isinstance(request, str):
+            return urllib.request.urlopen(request)
+        return urllib.request.urlopen(urllib.request.Request(request.url, headers=dict(request.headers)))
+
+    def download(self, urls):
+        path = self.opts["outtmpl"] % {"ext": "mp4"}
+        hooks = self.opts.get("progress_hooks", [])
+        chunk = 256 * 1024
+        delay = throttle_delay(chunk, self.mbps)
+        written = 0
+        with open(path, "wb") as f:
+            while written < self.video_bytes:
+                size = min(chunk, self.video_bytes - written)
+                f.write(b"\0" * size)
+                written += size
+                for hook in hooks:
+                    hook({"status": "downloading", "downloaded_bytes": written,
+                          "total_bytes": self.video_bytes, "speed": None, "eta": None})
+                time.sleep(delay)
+        for hook in hooks:
+            hook({"status": "finished", "downloaded_bytes": written, "total_bytes": self.video_bytes})
+        return 0
+
+
+class SyntheticInner:
+    """Pengganti onnxruntime.InferenceSession: batch dinamis, mask elips di tengah"""
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        yy, xx = np.mgrid[0:320, 0:320]
+        self.mask = (((yy - 160) / 120.0) ** 2 + ((xx - 160) / 90.0) ** 2 < 1).astype(np.float32)
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input.1", shape=["batch", 3, 320, 320])]
+
+    def run(self, outputs, feeds):
+        batch = next(iter(feeds.values())).shape[0]
+        # time.sleep melepas GIL, sama seperti ONNX Runtime saat komputasi
+        time.sleep(self.latency_ms / 1000 * (1 + 0.5 * (batch - 1)))
+        return [np.broadcast_to(self.mask, (batch, 1, 320, 320)).copy()]
+
+
+class SyntheticSession:
+    """Pengganti session rembg (predict + inner_session) untuk micro-batcher"""
+
+    def __init__(self, latency_ms: float):
+        self.inner_session = SyntheticInner(latency_ms)
+
+    def predict(self, image):
+        pred = self.inner_session.run(None, {"input.1": np.zeros((1, 3, 320, 320), np.float32)})[0][0, 0]
+        mask = Image.fromarray((pred * 255).astype(np.uint8), "L")
+        return [mask.resize(image.size, Image.LANCZOS)]
+
+
+def rembg_available() -> bool:
+    try:
+        import rembg  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def configure_environment(workdir: str):
+    """Env sebelum main di-import: rate limit dimatikan, folder kerja di temp dir"""
+    for key in ("RATE_INFERENCE_PER_MIN", "RATE_VIDEO_PER_MIN", "RATE_METADATA_PER_MIN"):
+        os.environ[key] = "1000000"
+    for key in ("RATE_INFERENCE_BURST", "RATE_VIDEO_BURST", "RATE_METADATA_BURST"):
+        os.environ[key] = "1000000"
+    os.chdir(workdir)
+
+
+def install_stand_ins(main, args):
+    """Pasang yt-dlp & sumber media lokal (selalu) dan model sintetis (kalau dipilih) ke modul main"""
+    video_bytes = int(args.video_mb * 1024 * 1024)
+    media = MediaServer(video_bytes, args.video_mbps)
+    main.video_jobs.ydl_factory = lambda opts: StandInYDL(
+        opts, args.extract_ms, video_bytes, args.video_mbps, media.base_url
+    )
+    if args.synthetic_model:
+        main.session_pool.session_factory = lambda name: SyntheticSession(args.model_latency_ms)
+
+
+# --- PAYLOAD ---
+
+def synthetic_photo(width: int, height: int) -> Image.Image:
+    rng = np.random.default_rng(width * height)
+    noise = Image.fromarray(rng.integers(0, 255, (max(1, height // 8), max(1, width // 8), 3), dtype=np.uint8))
+    photo = noise.resize((width, height), Image.BICUBIC).filter(ImageFilter.GaussianBlur(1))
+    ImageDraw.Draw(photo).ellipse((width * 0.3, height * 0.2, width * 0.7, height * 0.9), fill=(220, 180, 140))
+    return photo
+
+
+def encode(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+class Payloads:
+    """Payload per ukuran gambar: foto JPEG, mask PNG (JSON) dan mask RLE (multipart)"""
+
+    def __init__(self, width: int, height: int, unique: bool):
+        from masks import encode_rle
+
+        self.size = f"{width}x{height}"
+        self.unique = unique
+        self.photo = encode(synthetic_photo(width, height), "JPEG", quality=90)
+        mask = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(mask).ellipse((width * 0.45, height * 0.4, width * 0.55, height * 0.5), fill=255)
+        self.mask_png = encode(mask, "PNG")
+        self.mask_rle = encode_rle(np.asarray(mask))
+
+    def tagged(self, data: bytes, i: int) -> bytes:
+        # Byte setelah EOI/IEND diabaikan decoder, tapi hash konten jadi unik
+        return data + b"bench%08d" % i if self.unique else data
+
+
+def build_request(scenario: str, payloads: Payloads, i: int, run_id: str):
+    """(method, path, kwargs httpx) untuk request ke-i"""
+    if scenario == "health":
+        return "GET", "/health", {}
+    if scenario == "remove-bg":
+        files = {"file": ("photo.jpg", payloads.tagged(payloads.photo, i), "image/jpeg")}
+        return "POST", "/api/remove-bg", {"files": files, "data": {"quality": "Medium"}}
+    if scenario == "erase-object":
+        body = {
+            "image": "data:image/jpeg;base64," + base64.b64encode(payloads.tagged(payloads.photo, i)).decode(),
+            "mask": "data:image/png;base64," + base64.b64encode(payloads.mask_png).decode(),
+        }
+        return "POST", "/api/erase-object", {"json": body}
+    if scenario == "erase-object-upload":
+        files = {"image": ("photo.jpg", payloads.tagged(payloads.photo, i), "image/jpeg")}
+        return "POST", "/api/erase-object/upload", {"files": files, "data": {"mask_rle": payloads.mask_rle}}
+    # Video: URL unik per request supaya cache metadata tidak kena
+    url = f"https://www.youtube.com/watch?v={run_id}{i:06d}"
+    if scenario == "video-info":
+        return "POST", "/api/video-info", {"json": {"url": url}}
+    if scenario == "video-download":
+        return "POST", "/api/video-download", {"json": {"url": url, "format_id": "best"}}
+    if scenario == "video-stream":
+        return "POST", "/api/video-download", {"json": {"url": url, "format_id": "best", "stream": True}}
+    raise ValueError(f"Skenario tidak dikenal: {scenario}")
+
+
+# --- PENGUKURAN ---
+
+def read_rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class RssSampler:
+    """Sampling RSS proses server di thread terpisah (peak selama satu skenario)"""
+
+    def __init__(self, pid: int, interval: float = 0.01):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, read_rss_mb(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start_mb = read_rss_mb(self.pid)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, read_rss_mb(self.pid))
+        return False
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(np.ceil(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name: str, scenario: str, payloads, args, pid: int, run_id: str) -> dict:
+    # Pemanasan (model load, JIT cache, koneksi) tidak ikut diukur
+    for i in range(args.warmup):
+        method, path, kwargs = build_request(scenario, payloads, 10_000_000 + i, run_id)
+        await client.request(method, path, **kwargs)
+
+    latencies, statuses = [], {}
+    counter = iter(range(args.requests))
+
+    async def worker():
+        for i in counter:
+            method, path, kwargs = build_request(scenario, payloads, i, run_id)
+            start = time.perf_counter()
+            try:
+                # Body dibaca sampai habis tapi tidak disimpan (file video bisa besar)
+                async with client.stream(method, path, **kwargs) as response:
+                    async for _ in response.aiter_raw():
+                        pass
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    with RssSampler(pid) as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "ok": len(latencies),
+        "errors": {str(k): v for k, v in statuses.items() if k != 200},
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "rss_start_mb": round(rss.start_mb, 1),
+        "peak_rss_mb": round(rss.peak, 1),
+    }
+
+
+def plan(args):
+    """Daftar (nama, skenario, payload). Skenario gambar diulang per ukuran"""
+    payloads = {size: Payloads(*size, unique=not args.cache_hits) for size in args.sizes}
+    jobs = []
+    for scenario in args.scenarios:
+        if scenario in IMAGE_SCENARIOS:
+            jobs += [(f"{scenario}@{p.size}", scenario, p) for p in payloads.values()]
+        else:
+            jobs.append((scenario, scenario, None))
+    return jobs
+
+
+async def run_all(client, args, pid: int) -> list:
+    run_id = f"{int(time.time()) % 100000:05d}"
+    results = []
+    for name, scenario, payloads in plan(args):
+        row = await run_scenario(client, name, scenario, payloads, args, pid, run_id)
+        print(f"  {name:<32}{row['throughput_rps']:>8} rps  p95 {row['p95_ms']:>8} ms", file=sys.stderr)
+        results.append(row)
+    return results
+
+
+async def run_inprocess(args) -> list:
+    import httpx
+    import main
+
+    install_stand_ins(main, args)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await run_all(client, args, os.getpid())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_http(args, workdir: str) -> list:
+    import httpx
+
+    port = free_port()
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+           "--workdir", workdir, "--model-latency-ms", str(args.model_latency_ms),
+           "--extract-ms", str(args.extract_ms), "--video-mb", str(args.video_mb),
+           "--video-mbps", str(args.video_mbps)]
+    if args.synthetic_model:
+        cmd.append("--synthetic-model")
+    server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            deadline = time.time() + 60
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("Server benchmark gagal start")
+                await asyncio.sleep(0.2)
+            return await run_all(client, args, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def serve(args):
+    """Mode internal: jalankan uvicorn dengan stand-in terpasang (dipakai --transport http)"""
+    import uvicorn
+
+    configure_environment(args.workdir)
+    import main
+
+    install_stand_ins(main, args)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def compare(results: list, baseline_path: str, max_regression: float) -> list:
+    """Skenario yang lebih buruk dari baseline melebihi max_regression (rasio)"""
+    with open(baseline_path) as f:
+        baseline = {row["scenario"]: row for row in json.load(f)["results"]}
+    regressions = []
+    for row in results:
+        base = baseline.get(row["scenario"])
+        if base is None:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if base[metric] and row[metric] > base[metric] * (1 + max_regression):
+                regressions.append(f"{row['scenario']}: {metric} {base[metric]} -> {row[metric]}")
+        if base["throughput_rps"] and row["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{row['scenario']}: throughput {base['throughput_rps']} -> {row['throughput_rps']}")
+        if row["ok"] < base["ok"]:
+            regressions.append(f"{row['scenario']}: ok {base['ok']} -> {row['ok']}")
+    return regressions
+
+
+def parse_sizes(text: str):
+    return [tuple(int(v) for v in size.lower().split("x")) for size in text.split(",") if size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test API Azura Engine")
+    parser.add_argument("--transport", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Daftar skenario dipisah koma")
+    parser.add_argument("--sizes", default="640x480,1600x1200,4000x3000", help="Ukuran gambar WxH dipisah koma")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40, help="Request per skenario")
+    parser.add_argument("--warmup", type=int, default=2, help="Request pemanasan per skenario (tidak diukur)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache-hits", action="store_true", help="Payload identik (ukur jalur result cache)")
+    parser.add_argument("--synthetic-model", action="store_true",
+                        help="Pakai model sintetis walau rembg terpasang (otomatis jika tidak)")
+    parser.add_argument("--model-latency-ms", type=float, default=40, help="Latency model sintetis per gambar")
+    parser.add_argument("--extract-ms", type=float, default=50, help="Latency ekstraksi yt-dlp stand-in")
+    parser.add_argument("--video-mb", type=float, default=8, help="Ukuran file video stand-in")
+    parser.add_argument("--video-mbps", type=float, default=400, help="Bandwidth download stand-in (0 = tanpa batas)")
+    parser.add_argument("--json", dest="json_path", help="Tulis hasil JSON ke file ini ('-' = stdout)")
+    parser.add_argument("--compare", help="File JSON baseline; exit 1 jika ada regresi")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Toleransi regresi (0.2 = 20%%)")
+    # Dipakai subprocess server (--transport http)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.synthetic_model = args.synthetic_model or not rembg_available()
+
+    if args.serve:
+        serve(args)
+        return
+
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Skenario tidak dikenal: {', '.join(sorted(unknown))}")
+    args.sizes = parse_sizes(args.sizes)
+
+    with tempfile.TemporaryDirectory(prefix="azura-bench-") as workdir:
+        cwd = os.getcwd()
+        if args.transport == "inprocess":
+            configure_environment(workdir)
+            try:
+                results = asyncio.run(run_inprocess(args))
+            finally:
+                os.chdir(cwd)
+        else:
+            results = asyncio.run(run_http(args, workdir))
+
+    report = {
+        "meta": {
+            "transport": args.transport,
+            "model": "synthetic" if args.synthetic_model else "rembg",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cache_hits": args.cache_hits,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+    }
+    if args.json_path == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        if args.json_path:
+            with open(args.json_path, "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"transport {args.transport}, model {report['meta']['model']}, concurrency {args.concurrency}")
+        print(f"{'scenario':<32}{'ok':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+        for row in results:
+            print(f"{row['scenario']:<32}{row['ok']:>5}{row['throughput_rps']:>9}{row['p50_ms']:>10}"
+                  f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['peak_rss_mb']:>13}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        for line in regressions:
+            print(f"REGRESI {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
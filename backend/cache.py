@@ -0,0 +1,258 @@
+# backend/cache.py
+# Cache hasil proses (content-addressed): key = hash(input bytes + model + parameter).
+# Dua tingkat: RAM (LRU, budget byte kecil) dan disk (LRU, budget byte lebih besar).
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data) -> str:
+    """SHA-256 hex dari bytes/str"""
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_key(*parts) -> str:
+    """Key cache dari beberapa bagian (hash input, nama model, parameter, ...)"""
+    h = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview)):
+            part = str(part).encode()
+        # Prefix panjang supaya ("ab", "c") != ("a", "bc")
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache bytes dengan eviksi LRU per budget byte, di RAM dan di disk"""
+
+    def __init__(self, memory_budget: int, disk_budget: int = 0, disk_folder: str = None):
+        self.memory_budget = max(0, memory_budget)
+        self.disk_budget = max(0, disk_budget) if disk_folder else 0
+        self.disk_folder = disk_folder
+        self._lock = threading.Lock()
+
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()    # key -> ukuran file
+        self._disk_bytes = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_budget:
+            os.makedirs(self.disk_folder, exist_ok=True)
+            self._load_disk_index()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_folder, f"{key}.bin")
+
+    def _load_disk_index(self):
+        """Bangun index LRU disk dari file yang sudah ada (urut mtime, terlama dulu)"""
+        entries = []
+        for f in os.listdir(self.disk_folder):
+            if not f.endswith(".bin"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_folder, f))
+                entries.append((st.st_mtime, f[:-4], st.st_size))
+            except OSError:
+                pass
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def get(self, key: str):
+        """Ambil bytes dari cache, None jika tidak ada"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return data
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                with self._lock:
+                    self._drop_disk_entry(key)
+                data = None
+            if data is not None:
+                with self._lock:
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    self.hits_disk += 1
+                    self._put_memory(key, data)
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        """Simpan bytes ke cache (RAM + disk)"""
+        if not data:
+            return
+        with self._lock:
+            self._put_memory(key, data)
+            write_disk = self.disk_budget and len(data) <= self.disk_budget and key not in self._disk
+
+        if write_disk:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"⚠️ Cache disk write gagal: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            with self._lock:
+                if key not in self._disk:
+                    self._disk[key] = len(data)
+                    self._disk_bytes += len(data)
+                self._evict_disk()
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_budget and self._disk:
+            key, _ = next(iter(self._disk.items()))
+            self._drop_disk_entry(key)
+            self.evictions += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _drop_disk_entry(self, key: str):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_budget": self.memory_budget,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_budget": self.disk_budget,
+            }
+
+
+class TTLCache:
+    """Cache objek kecil (mis. metadata video) dengan TTL dan batas jumlah entry (LRU)"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+
+class SingleFlight:
+    """Gabungkan pemanggilan bersamaan dengan key yang sama jadi satu eksekusi"""
+
+    def __init__(self):
+        self._inflight = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, coro_fn):
+        """Jalankan coro_fn() sekali per key; pemanggil lain menunggu hasil yang sama"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            future = asyncio.ensure_future(coro_fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: pemanggil yang batal (client putus) tidak membatalkan pemanggil lain
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,165 @@
+# backend/edit_sessions.py
+# Sesi edit magic eraser: gambar di-upload sekali, stroke berikutnya hanya kirim mask baru.
+# Gambar kerja disimpan di RAM (TTL + budget byte total, sesi LRU dibuang dulu).
+# History undo hanya menyimpan patch region yang berubah, bukan salinan gambar penuh.
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Optional
+
+from PIL import Image
+
+
+class EditSessionError(Exception):
+    """Gambar terlalu besar untuk budget memori sesi"""
+
+
+def image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * len(image.getbands())
+
+
+class EditSession:
+    def __init__(self, image: Image.Image):
+        self.id = uuid.uuid4().hex
+        self.image = image
+        self.created = time.time()
+        self.last_used = self.created
+        self.version = 0
+        # Setiap entry: list (box, patch lama) sebelum stroke diterapkan
+        self.history = deque()
+        self.history_bytes = 0
+        # Stroke / undo di sesi yang sama dijalankan berurutan. Lock thread (bukan asyncio)
+        # karena dipegang di worker: job tetap jalan walau request-nya dibatalkan
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return image_nbytes(self.image) + self.history_bytes
+
+    def snapshot(self) -> dict:
+        return {
+            "session_id": self.id,
+            "width": self.image.width,
+            "height": self.image.height,
+            "version": self.version,
+            "undo_steps": len(self.history),
+            "bytes": self.nbytes,
+        }
+
+
+class EditSessionStore:
+    """Sesi edit di RAM dengan TTL (sejak terakhir dipakai), budget byte dan history terbatas"""
+
+    def __init__(self, ttl: float = 900, max_bytes: int = 64 * 1024 * 1024, max_history: int = 10):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_history = max(0, max_history)
+        self._sessions = OrderedDict()  # id -> EditSession, urut terakhir dipakai
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, image: Image.Image) -> EditSession:
+        if image_nbytes(image) > self.max_bytes:
+            raise EditSessionError("Gambar terlalu besar untuk sesi edit")
+        session = EditSession(image)
+        with self._lock:
+            self._purge_expired(time.time())
+            self._sessions[session.id] = session
+            self.created += 1
+            self._evict(keep=session.id)
+        return session
+
+    def get(self, session_id: str) -> Optional[EditSession]:
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                self.expired += 1
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def push_history(self, session: EditSession, patches):
+        """Simpan patch lama (sebelum stroke) untuk undo, history terlama dibuang jika penuh"""
+        with self._lock:
+            session.version += 1
+            if self.max_history:
+                session.history.append(patches)
+                session.history_bytes += sum(image_nbytes(patch) for _, patch in patches)
+            while len(session.history) > self.max_history:
+                self._drop_oldest_history(session)
+            self._evict(keep=session.id)
+
+    def pop_history(self, session: EditSession):
+        """Patch untuk undo stroke terakhir, None jika history kosong"""
+        with self._lock:
+            if not session.history:
+                return None
+            patches = session.history.pop()
+            session.history_bytes -= sum(image_nbytes(patch) for _, patch in patches)
+            session.version += 1
+            return patches
+
+    def _drop_oldest_history(self, session: EditSession):
+        patches = session.history.popleft()
+        session.history_bytes -= sum(image_nbytes(patch) for _, patch in patches)
+
+    def _evict(self, keep: str):
+        """Budget penuh: kurangi history sesi lain, lalu buang sesi LRU"""
+        total = sum(s.nbytes for s in self._sessions.values())
+        for session in list(self._sessions.values()):
+            if total <= self.max_bytes:
+                return
+            if session.id == keep:
+                continue
+            while session.history and total > self.max_bytes:
+                before = session.history_bytes
+                self._drop_oldest_history(session)
+                total -= before - session.history_bytes
+            if total > self.max_bytes:
+                del self._sessions[session.id]
+                total -= session.nbytes
+                self.evicted += 1
+        # Masih penuh: history sesi ini sendiri yang dikurangi
+        current = self._sessions.get(keep)
+        while current is not None and current.history and total > self.max_bytes:
+            before = current.history_bytes
+            self._drop_oldest_history(current)
+            total -= before - current.history_bytes
+
+    def _purge_expired(self, now: float):
+        # Urut terakhir dipakai, jadi yang kedaluwarsa selalu di depan
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expired += 1
+
+    def purge_expired(self):
+        with self._lock:
+            self._purge_expired(time.time())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": sum(s.nbytes for s in self._sessions.values()),
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "max_history": self.max_history,
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
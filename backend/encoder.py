@@ -0,0 +1,279 @@
+# backend/encoder.py
+# Tahap encode output: PNG / JPEG / WebP / AVIF dengan preset speed/size.
+# Metadata (EXIF, ICC, text chunk) dibuang tanpa copy pixel per pixel.
+# PNG juga bisa di-encode bertahap per band baris (output besar, mis. upscale).
+import io
+import logging
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+from metrics import stage_seconds
+
+logger = logging.getLogger(__name__)
+
+# --- IMPORT OPTIONAL: pillow-avif-plugin ---
+# Pillow baru sudah punya AVIF bawaan, versi lama butuh plugin ini
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+Image.init()
+
+# format -> (nama format Pillow, media type, ekstensi file, support alpha)
+FORMATS = {
+    "png": ("PNG", "image/png", ".png", True),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg", False),
+    "webp": ("WEBP", "image/webp", ".webp", True),
+    "avif": ("AVIF", "image/avif", ".avif", True),
+}
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+PRESETS = ("fast", "balanced", "small")
+
+# Opsi encoder per format & preset (quality diisi terpisah dari quality_mode)
+_PRESET_OPTIONS = {
+    "png": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 6},
+        "small": {"optimize": True},
+    },
+    "jpeg": {
+        "fast": {},
+        "balanced": {"optimize": True},
+        "small": {"optimize": True, "progressive": True},
+    },
+    "webp": {
+        "fast": {"method": 0},
+        "balanced": {"method": 4},
+        "small": {"method": 6},
+    },
+    "avif": {
+        "fast": {"speed": 8},
+        "balanced": {"speed": 6},
+        "small": {"speed": 4},
+    },
+}
+
+
+class EncoderError(ValueError):
+    """Format / preset output tidak valid atau tidak didukung"""
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: str
+    media_type: str
+    ext: str
+    encode_ms: float
+
+
+def normalize_format(fmt: str) -> str:
+    fmt = (fmt or "png").lower().lstrip(".")
+    return FORMAT_ALIASES.get(fmt, fmt)
+
+
+def supported_formats() -> list:
+    """Format output yang bisa di-encode di instalasi Pillow ini"""
+    return [name for name, (pil_name, *_rest) in FORMATS.items() if pil_name in Image.SAVE]
+
+
+def check_format(fmt: str, preset: str = "balanced", need_alpha: bool = False) -> str:
+    """Validasi format + preset, return nama format yang sudah dinormalisasi"""
+    fmt = normalize_format(fmt)
+    if fmt not in FORMATS:
+        raise EncoderError(f"Format output tidak dikenal: {fmt}")
+    if fmt not in supported_formats():
+        raise EncoderError(f"Format {fmt} tidak didukung di server ini")
+    if preset not in PRESETS:
+        raise EncoderError(f"Preset tidak dikenal: {preset} (pilih: {', '.join(PRESETS)})")
+    if need_alpha and not FORMATS[fmt][3]:
+        raise EncoderError(f"Format {fmt} tidak mendukung transparansi")
+    return fmt
+
+
+def media_type_for(fmt: str) -> str:
+    return FORMATS[normalize_format(fmt)][1]
+
+
+def ext_for(fmt: str) -> str:
+    return FORMATS[normalize_format(fmt)][2]
+
+
+class EncoderStats:
+    """Statistik encode per format: jumlah, waktu, ukuran output"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, fmt: str, preset: str, encode_ms: float, size: int):
+        with self._lock:
+            entry = self._stats.setdefault(f"{fmt}/{preset}", {"count": 0, "total_ms": 0.0, "total_bytes": 0})
+            entry["count"] += 1
+            entry["total_ms"] += encode_ms
+            entry["total_bytes"] += size
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                key: {
+                    "count": e["count"],
+                    "avg_encode_ms": round(e["total_ms"] / e["count"], 2),
+                    "avg_size_bytes": int(e["total_bytes"] / e["count"]),
+                }
+                for key, e in self._stats.items()
+            }
+
+
+encoder_stats = EncoderStats()
+
+
+def encode(image: Image.Image, fmt: str = "png", preset: str = "balanced", quality: int = 85) -> EncodedImage:
+    """Encode PIL image ke bytes tanpa metadata"""
+    fmt = check_format(fmt, preset)
+    pil_name, media_type, ext, has_alpha = FORMATS[fmt]
+
+    if not has_alpha and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L", "LA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    options = dict(_PRESET_OPTIONS[fmt][preset])
+    if fmt != "png":
+        options["quality"] = quality
+
+    # Buang metadata: encoder Pillow membaca EXIF/ICC/text dari image.info,
+    # jadi cukup kosongkan info sementara (tanpa copy pixel)
+    saved_info, image.info = image.info, {}
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    try:
+        image.save(buffer, pil_name, **options)
+    finally:
+        image.info = saved_info
+    encode_ms = (time.perf_counter() - start) * 1000
+
+    data = buffer.getvalue()
+    encoder_stats.record(fmt, preset, encode_ms, len(data))
+    stage_seconds.observe(encode_ms / 1000, "encode")
+    return EncodedImage(data=data, format=fmt, media_type=media_type, ext=ext, encode_ms=encode_ms)
+
+
+# --- PNG STREAMING ---
+# Gambar besar di-encode per band baris tanpa pernah ada di RAM utuh. Tiap band
+# dikompres independen (deflate raw + sync flush), jadi band bisa dikompres paralel
+# di thread berbeda lalu disambung berurutan ke stream IDAT (teknik pigz).
+PNG_COLOR_TYPES = {"L": 0, "RGB": 2, "LA": 4, "RGBA": 6}
+PNG_STREAM_LEVELS = {"fast": 1, "balanced": 6, "small": 9}
+_ADLER_BASE = 65521
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """adler32(a + b) dari adler32(a), adler32(b) & len(b) (port adler32_combine zlib)"""
+    rem = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = (rem * sum1) % _ADLER_BASE
+    sum1 += (adler2 & 0xFFFF) + _ADLER_BASE - 1
+    sum2 += (adler1 >> 16) + (adler2 >> 16) + _ADLER_BASE - rem
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum2 >= 2 * _ADLER_BASE:
+        sum2 -= 2 * _ADLER_BASE
+    if sum2 >= _ADLER_BASE:
+        sum2 -= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+@dataclass
+class DeflatedBand:
+    data: bytes     # blok deflate raw, diakhiri sync flush (belum final)
+    adler: int      # adler32 data sebelum kompresi
+    length: int     # panjang data sebelum kompresi
+    rows: int
+    deflate_ms: float
+
+
+def deflate_band(rows: np.ndarray, level: int = 6) -> DeflatedBand:
+    """Band baris pixel (h, w, channel) uint8 -> blok deflate siap disambung.
+
+    Baris pertama pakai filter Sub, sisanya Up: band tidak butuh baris band sebelumnya.
+    """
+    start = time.perf_counter()
+    height = rows.shape[0]
+    flat = rows.reshape(height, -1)
+    channels = rows.shape[2] if rows.ndim == 3 else 1
+    filtered = np.empty((height, flat.shape[1] + 1), dtype=np.uint8)
+    filtered[0, 0] = 1
+    filtered[0, 1:channels + 1] = flat[0, :channels]
+    np.subtract(flat[0, channels:], flat[0, :-channels], out=filtered[0, channels + 1:])
+    if height > 1:
+        filtered[1:, 0] = 2
+        np.subtract(flat[1:], flat[:-1], out=filtered[1:, 1:])
+    raw = filtered.data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return DeflatedBand(data, zlib.adler32(raw), filtered.size, height, (time.perf_counter() - start) * 1000)
+
+
+class PNGStreamWriter:
+    """Penyusun file PNG dari band-band DeflatedBand (harus ditulis berurutan dari atas)"""
+
+    def __init__(self, width: int, height: int, mode: str, preset: str = "balanced"):
+        if mode not in PNG_COLOR_TYPES:
+            raise EncoderError(f"Mode gambar {mode} tidak didukung PNG streaming")
+        if preset not in PNG_STREAM_LEVELS:
+            raise EncoderError(f"Preset tidak dikenal: {preset} (pilih: {', '.join(PRESETS)})")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.preset = preset
+        self.level = PNG_STREAM_LEVELS[preset]
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._adler = 1  # adler32 data kosong
+        self._deflate_ms = 0.0
+
+    def _emit(self, data: bytes) -> bytes:
+        self.bytes_written += len(data)
+        return data
+
+    def header(self) -> bytes:
+        ihdr = struct.pack(">IIBBBBB", self.width, self.height, 8, PNG_COLOR_TYPES[self.mode], 0, 0, 0)
+        # Header zlib (CMF/FLG, window 32KB) di awal stream IDAT
+        flevel = 0 if self.level < 2 else (1 if self.level < 6 else (2 if self.level == 6 else 3))
+        cmf_flg = 0x7800 | (flevel << 6)
+        cmf_flg += 31 - cmf_flg % 31
+        return self._emit(
+            b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", ihdr)
+            + _png_chunk(b"IDAT", struct.pack(">H", cmf_flg))
+        )
+
+    def band(self, band: DeflatedBand) -> bytes:
+        self._adler = _adler32_combine(self._adler, band.adler, band.length)
+        self.rows_written += band.rows
+        self._deflate_ms += band.deflate_ms
+        return self._emit(_png_chunk(b"IDAT", band.data))
+
+    def finish(self) -> bytes:
+        if self.rows_written != self.height:
+            raise EncoderError(f"PNG belum lengkap: {self.rows_written}/{self.height} baris")
+        # Blok final kosong (BFINAL=1, fixed Huffman) + adler32 seluruh data
+        tail = _png_chunk(b"IDAT", b"\x03\x00" + struct.pack(">I", self._adler)) + _png_chunk(b"IEND", b"")
+        data = self._emit(tail)
+        encoder_stats.record("png-stream", self.preset, self._deflate_ms, self.bytes_written)
+        stage_seconds.observe(self._deflate_ms / 1000, "encode")
+        return data
@@ -0,0 +1,201 @@
+# backend/eraser.py
+# Magic eraser: inpainting per region (bounding box komponen mask + margin),
+# bukan seluruh gambar. Biaya mengikuti luas area yang dihapus, bukan ukuran gambar.
+import logging
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from inpaint import INPAINT_PRESETS, dilate, inpaint_numpy
+
+logger = logging.getLogger(__name__)
+
+# --- IMPORT OPTIONAL (lazy): cv2 (OpenCV) ---
+# Import cv2 memakan ratusan ms & puluhan MB: baru dilakukan saat dibutuhkan
+_cv2 = False  # False = belum dicoba, None = tidak tersedia
+
+
+def opencv():
+    """Modul cv2 (di-import saat pertama dipanggil), None jika OpenCV tidak tersedia"""
+    global _cv2
+    if _cv2 is False:
+        try:
+            import cv2
+        except ImportError:
+            cv2 = None
+        _cv2 = cv2
+    return _cv2
+
+MASK_THRESHOLD = 10  # pixel mask > nilai ini dianggap area yang dihapus
+GRID_CELL = 16       # ukuran sel grid untuk mencari komponen mask
+# Kalau total area region sudah sebesar ini (fraksi gambar), proses sekali saja
+FULL_IMAGE_FRACTION = 0.5
+
+Box = Tuple[int, int, int, int]  # (x0, y0, x1, y1), x1/y1 eksklusif
+
+
+@dataclass
+class InpaintParams:
+    strength: int
+    kernel_size: int  # kernel dilasi mask
+    radius: int       # radius inpainting
+    preset: str = "balanced"  # preset engine NumPy (tanpa OpenCV)
+
+    @property
+    def margin(self) -> int:
+        """Konteks di sekitar mask yang dibutuhkan supaya hasil per region = hasil gambar penuh"""
+        # Dilasi 2 iterasi melebar ~kernel_size, inpaint membaca radius pixel di luar area dilasi
+        return self.kernel_size + 2 * self.radius + 2
+
+
+def inpaint_params(size, strength: int, preset: str = "balanced") -> InpaintParams:
+    """Parameter dihitung dari ukuran gambar penuh (bukan ukuran region)"""
+    if preset not in INPAINT_PRESETS:
+        raise ValueError(f"Preset inpaint tidak dikenal: {preset} (pilih: {', '.join(INPAINT_PRESETS)})")
+    min_dim = min(size)
+    return InpaintParams(
+        strength=strength,
+        kernel_size=max(3, int(min_dim * 0.005) * strength),
+        radius=max(3, int(min_dim * 0.01)),
+        preset=preset,
+    )
+
+
+def find_regions(binary: np.ndarray, margin: int) -> List[Box]:
+    """Bounding box (plus margin) tiap komponen mask, box yang bersinggungan digabung"""
+    h, w = binary.shape
+    gh, gw = -(-h // GRID_CELL), -(-w // GRID_CELL)
+    padded = np.zeros((gh * GRID_CELL, gw * GRID_CELL), dtype=bool)
+    padded[:h, :w] = binary
+    grid = padded.reshape(gh, GRID_CELL, gw, GRID_CELL).any(axis=(1, 3))
+
+    # Label komponen (8-neighbour) di grid kasar: jumlah sel kecil, BFS Python cukup cepat
+    seen = np.zeros_like(grid)
+    boxes = []
+    for start in map(tuple, np.argwhere(grid).tolist()):
+        if seen[start]:
+            continue
+        seen[start] = True
+        stack = [start]
+        r0 = r1 = start[0]
+        c0 = c1 = start[1]
+        while stack:
+            r, c = stack.pop()
+            r0, r1, c0, c1 = min(r0, r), max(r1, r), min(c0, c), max(c1, c)
+            for nr in range(max(r - 1, 0), min(r + 2, gh)):
+                for nc in range(max(c - 1, 0), min(c + 2, gw)):
+                    if grid[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        boxes.append([
+            max(0, c0 * GRID_CELL - margin), max(0, r0 * GRID_CELL - margin),
+            min(w, (c1 + 1) * GRID_CELL + margin), min(h, (r1 + 1) * GRID_CELL + margin),
+        ])
+
+    # Gabung box yang overlap (margin-nya saling butuh) sampai stabil
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+    if area >= FULL_IMAGE_FRACTION * w * h:
+        return [(0, 0, w, h)]
+    return [tuple(box) for box in boxes]
+
+
+def inpaint_patch(rgb: np.ndarray, mask: np.ndarray, params: InpaintParams):
+    """Inpaint satu patch RGB. Return (patch hasil, mask area yang berubah)"""
+    cv2 = opencv()
+    if cv2 is not None:
+        _, mask_binary = cv2.threshold(mask, MASK_THRESHOLD, 255, cv2.THRESH_BINARY)
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (params.kernel_size, params.kernel_size))
+        mask_dilated = cv2.dilate(mask_binary, kernel, iterations=2)
+        result = cv2.inpaint(rgb, mask_dilated, params.radius, cv2.INPAINT_TELEA)
+        return result, mask_dilated
+
+    # Fallback tanpa OpenCV: engine NumPy, dilasi setara 2 iterasi kernel cv2
+    mask_dilated = dilate(mask > MASK_THRESHOLD, 2 * (params.kernel_size // 2))
+    result = inpaint_numpy(rgb, mask_dilated, params.preset)
+    return result, mask_dilated.astype(np.uint8) * 255
+
+
+def _process_region(rgb: np.ndarray, mask: np.ndarray, box: Box, params: InpaintParams, detail: int):
+    x0, y0, x1, y1 = box
+    result, changed = inpaint_patch(
+        np.ascontiguousarray(rgb[y0:y1, x0:x1]), np.ascontiguousarray(mask[y0:y1, x0:x1]), params
+    )
+    patch = Image.fromarray(result)
+    # Sharpen hanya patch region, bukan seluruh gambar
+    for _ in range(detail):
+        patch = patch.filter(ImageFilter.SHARPEN)
+    # Paste lewat mask area yang berubah (tepi dihaluskan) supaya tidak ada
+    # kotak sharpen yang terlihat di sekitar region
+    paste_mask = Image.fromarray(changed).filter(ImageFilter.GaussianBlur(2))
+    return box, patch, paste_mask
+
+
+def normalize_mode(image: Image.Image) -> Image.Image:
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return image
+
+
+def erase_patches(image: Image.Image, mask: Image.Image, strength: int = 5, detail: int = 0,
+                  executor: Optional[Executor] = None, inpaint_preset: str = "balanced"):
+    """Inpaint per region tanpa mengubah image. Return list (box, patch, paste_mask).
+
+    image harus RGB/RGBA (lihat normalize_mode). Region independen dijalankan paralel di executor.
+    """
+    mask = mask.convert("L")
+    if mask.size != image.size:
+        mask = mask.resize(image.size, Image.NEAREST)
+
+    mask_array = np.asarray(mask)
+    params = inpaint_params(image.size, strength, inpaint_preset)
+    regions = find_regions(mask_array > MASK_THRESHOLD, params.margin)
+    if not regions:
+        return []
+
+    rgb = np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+    if executor is not None and len(regions) > 1:
+        results = list(executor.map(
+            lambda box: _process_region(rgb, mask_array, box, params, detail), regions
+        ))
+    else:
+        results = [_process_region(rgb, mask_array, box, params, detail) for box in regions]
+    logger.info(
+        f"🧽 Inpaint {len(regions)} region, "
+        f"{sum((b[2] - b[0]) * (b[3] - b[1]) for b in regions) * 100 // (image.width * image.height)}% area"
+    )
+    return results
+
+
+def paste_patches(image: Image.Image, patches):
+    """Tempel hasil erase_patches ke image (in place)"""
+    for (x0, y0, _, _), patch, paste_mask in patches:
+        image.paste(patch, (x0, y0), paste_mask)
+
+
+def erase_regions(image: Image.Image, mask: Image.Image, strength: int = 5, detail: int = 0,
+                  executor: Optional[Executor] = None, inpaint_preset: str = "balanced") -> Image.Image:
+    """Inpaint area mask per region, return gambar baru"""
+    image = normalize_mode(image)
+    patches = erase_patches(image, mask, strength, detail, executor, inpaint_preset)
+    if not patches:
+        return image
+    output = image.copy()
+    paste_patches(output, patches)
+    return output
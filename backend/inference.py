@@ -0,0 +1,289 @@
+# backend/inference.py
+# Executor khusus untuk inference AI (rembg / inpainting).
+# Tujuannya: kerja CPU-berat tidak jalan di event loop uvicorn,
+# jadi /health, /api/video-info, dll tetap responsif.
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Antrian inference sudah penuh (request harus ditolak dengan 503)"""
+
+
+class InferenceExecutor:
+    """Thread pool terbatas + antrian tunggu terbatas untuk inference.
+
+    ONNX Runtime dan OpenCV melepas GIL saat komputasi, jadi thread pool
+    cukup (tidak perlu process pool yang menggandakan model di RAM).
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 8, name: str = "azura-infer"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # Statistik
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """Jalankan fn(*args, **kwargs) di worker pool, tunggu hasilnya secara async"""
+        with self._lock:
+            if self._waiting >= self.max_queue + self.max_workers - self._running:
+                self._rejected += 1
+                raise InferenceQueueFull("Antrian inference penuh")
+            self._waiting += 1
+
+        enqueued_at = time.perf_counter()
+        state = {"started": False, "abandoned": False}
+
+        def _job():
+            started_at = time.perf_counter()
+            waited = started_at - enqueued_at
+            with self._lock:
+                state["started"] = True
+                if not state["abandoned"]:
+                    self._waiting -= 1
+                self._running += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_total += time.perf_counter() - started_at
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, _job)
+        except asyncio.CancelledError:
+            # Client putus sebelum job jalan: future dibatalkan, job tidak pernah start
+            with self._lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    self._waiting -= 1
+            raise
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._waiting,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_total / finished * 1000, 2) if finished else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+                "avg_run_ms": round(self._run_total / finished * 1000, 2) if finished else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- MICRO-BATCHING ---
+# Parameter normalisasi per model (sama dengan rembg.sessions.*.predict).
+# Model yang tidak ada di sini tetap jalan, tapi per-gambar via session.predict().
+BATCH_PROFILES = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_human_seg": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "silueta": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+}
+
+
+class MicroBatcher:
+    """Kumpulkan request mask beberapa milidetik, lalu jalankan model sekali untuk satu batch.
+
+    Request yang datang bersamaan di-stack jadi satu tensor (N, 3, H, W),
+    hasil mask dibagikan lagi ke masing-masing request yang menunggu.
+    """
+
+    def __init__(self, executor: InferenceExecutor, session, model_name: str,
+                 max_batch: int = 4, max_wait_ms: float = 10.0):
+        self.executor = executor
+        self.session = session
+        self.model_name = model_name
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue = None
+        self._slots = None
+        self._collector = None
+        # Collector berhenti sendiri jika idle (model yang dibuang dari pool bisa di-GC)
+        self.idle_timeout = 30.0
+        self._dynamic_batch = self._detect_dynamic_batch()
+
+        # Statistik okupansi per batch (ditulis dari worker thread, dibaca dari /api/stats)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._histogram = {}
+
+    def _detect_dynamic_batch(self) -> bool:
+        """Cek apakah dimensi batch input model ONNX dinamis"""
+        try:
+            dim = self.session.inner_session.get_inputs()[0].shape[0]
+            return not isinstance(dim, int)
+        except Exception:
+            return False
+
+    async def predict(self, image, ticket=None):
+        """Mask (PIL mode 'L') untuk satu gambar, lewat batch bersama.
+
+        ticket (admission.Ticket) ditahan selama batch yang memuat gambar ini jalan,
+        jadi budget memori tidak kembali saat client putus di tengah inference.
+        """
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.executor.max_workers)
+        if self._collector is None or self._collector.done():
+            self._collector = loop.create_task(self._collect())
+
+        future = loop.create_future()
+        await self._queue.put((image, future, ticket))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Tunggu worker kosong dulu, selama itu antrian bisa terisi (batch jadi lebih penuh)
+            await self._slots.acquire()
+            try:
+                batch = [await asyncio.wait_for(self._queue.get(), self.idle_timeout)]
+            except asyncio.TimeoutError:
+                self._slots.release()
+                if self._queue.empty():
+                    return
+                continue
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            # Buang request yang client-nya sudah putus
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                return
+            held = [ticket for _, _, ticket in batch if ticket is not None and ticket.hold()]
+            try:
+                masks = await self.executor.run(self._predict_batch, [img for img, _, _ in batch])
+            except BaseException as e:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                return
+            finally:
+                for ticket in held:
+                    ticket.unhold()
+            for (_, fut, _), mask in zip(batch, masks):
+                if not fut.done():
+                    fut.set_result(mask)
+        finally:
+            self._slots.release()
+
+    def _predict_batch(self, images):
+        """Inference sync untuk satu batch (jalan di worker thread)"""
+        size = len(images)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._histogram[size] = self._histogram.get(size, 0) + 1
+        with stage("inference"):
+            return self._run_batch(images)
+
+    def _run_batch(self, images):
+        size = len(images)
+        profile = BATCH_PROFILES.get(self.model_name)
+        if profile is None or size == 1:
+            return [self.session.predict(img)[0] for img in images]
+
+        mean, std, model_size = profile
+        mean = np.array(mean, dtype=np.float32)
+        std = np.array(std, dtype=np.float32)
+        tensors = []
+        for img in images:
+            arr = np.asarray(img.convert("RGB").resize(model_size, Image.LANCZOS), dtype=np.float32)
+            arr = arr / max(float(arr.max()), 1e-6)
+            tensors.append(((arr - mean) / std).transpose((2, 0, 1)))
+        stacked = np.stack(tensors)
+        del tensors
+
+        inner = self.session.inner_session
+        input_name = inner.get_inputs()[0].name
+        if self._dynamic_batch:
+            preds = inner.run(None, {input_name: stacked})[0][:, 0, :, :]
+        else:
+            # Model dengan batch tetap = 1: tetap satu job di worker, tapi run per item
+            preds = np.concatenate([
+                inner.run(None, {input_name: stacked[i:i + 1]})[0][:, 0, :, :]
+                for i in range(size)
+            ])
+
+        masks = []
+        for img, pred in zip(images, preds):
+            ma, mi = float(pred.max()), float(pred.min())
+            pred = (pred - mi) / max(ma - mi, 1e-6)
+            mask = Image.fromarray((pred * 255).astype("uint8"), mode="L")
+            masks.append(mask.resize(img.size, Image.LANCZOS))
+        return masks
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches, items, histogram = self._batches, self._items, dict(self._histogram)
+        return {
+            "model": self.model_name,
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "dynamic_batch": self._dynamic_batch,
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "avg_occupancy": round(items / (batches * self.max_batch), 3) if batches else 0.0,
+            "batch_size_histogram": dict(sorted(histogram.items())),
+        }
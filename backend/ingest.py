@@ -0,0 +1,161 @@
+# backend/ingest.py
+# Tahap ingest gambar upload: baca ukuran dari header dulu (tanpa decode pixel),
+# tolak decompression bomb, JPEG di-decode langsung mendekati ukuran target
+# (DCT scaling lewat Image.draft), orientasi EXIF diterapkan setelah resize
+# sehingga tidak ada salinan ukuran penuh.
+import io
+import threading
+import time
+from dataclasses import dataclass
+
+from PIL import Image
+
+from metrics import stage
+
+# Default batas pixel (sebelum decode). Upload 10MB bisa berisi PNG ratusan megapixel
+DEFAULT_MAX_PIXELS = 40_000_000
+
+# Tag EXIF Orientation -> operasi transpose
+_ORIENTATION = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class IngestError(ValueError):
+    """File gambar tidak bisa dibaca"""
+
+
+class ImageTooLarge(IngestError):
+    """Dimensi gambar melebihi batas pixel (decompression bomb)"""
+
+
+@dataclass
+class ImageInfo:
+    format: str
+    width: int
+    height: int
+    orientation: int
+
+
+def _open(data: bytes) -> Image.Image:
+    try:
+        return Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ImageTooLarge("Dimensi gambar terlalu besar")
+    except Exception:
+        raise IngestError("File gambar tidak valid")
+
+
+def _orientation(image: Image.Image) -> int:
+    try:
+        return int(image.getexif().get(0x0112, 1))
+    except Exception:
+        return 1
+
+
+def _check_pixels(image: Image.Image, max_pixels: int):
+    if image.width * image.height > max_pixels:
+        raise ImageTooLarge(
+            f"Dimensi gambar terlalu besar ({image.width}x{image.height}). "
+            f"Maksimum {max_pixels // 1_000_000} megapixel"
+        )
+
+
+def probe(data: bytes, max_pixels: int = DEFAULT_MAX_PIXELS) -> ImageInfo:
+    """Format, ukuran & orientasi dari header saja (pixel belum di-decode)"""
+    try:
+        image = _open(data)
+        _check_pixels(image, max_pixels)
+    except ImageTooLarge:
+        ingest_stats.record_rejected()
+        raise
+    return ImageInfo(image.format, image.width, image.height, _orientation(image))
+
+
+def target_size(width: int, height: int, max_dimension: int):
+    if max(width, height) <= max_dimension:
+        return width, height
+    ratio = max_dimension / max(width, height)
+    return int(width * ratio), int(height * ratio)
+
+
+class IngestStats:
+    """Statistik decode: jumlah, waktu, berapa yang pakai JPEG draft, penolakan"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.drafted = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+        self.source_pixels = 0
+        self.decoded_pixels = 0
+
+    def record(self, decode_ms: float, source_pixels: int, decoded_pixels: int, drafted: bool):
+        with self._lock:
+            self.count += 1
+            self.drafted += int(drafted)
+            self.total_ms += decode_ms
+            self.source_pixels += source_pixels
+            self.decoded_pixels += decoded_pixels
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "decoded": self.count,
+                "jpeg_draft": self.drafted,
+                "rejected_too_large": self.rejected,
+                "avg_decode_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+                # Rasio pixel yang benar-benar di-decode vs ukuran asli (draft < 1.0)
+                "decoded_pixel_ratio": round(self.decoded_pixels / self.source_pixels, 3) if self.source_pixels else 1.0,
+            }
+
+
+ingest_stats = IngestStats()
+
+
+def load_image(data: bytes, max_dimension: int, max_pixels: int = DEFAULT_MAX_PIXELS,
+               resample=Image.LANCZOS) -> Image.Image:
+    """Decode upload ke ukuran max_dimension (sisi terpanjang), sudah diputar sesuai EXIF"""
+    start = time.perf_counter()
+    try:
+        image = _open(data)
+        _check_pixels(image, max_pixels)
+    except ImageTooLarge:
+        ingest_stats.record_rejected()
+        raise
+    orientation = _orientation(image)
+    source_pixels = image.width * image.height
+    target = target_size(image.width, image.height, max_dimension)
+
+    if image.format == "JPEG" and target != image.size:
+        # Decode di domain DCT dengan skala 1/2, 1/4 atau 1/8 (hasil >= target)
+        image.draft(image.mode, target)
+    drafted = image.width * image.height < source_pixels
+    try:
+        with stage("decode"):
+            image.load()
+    except Exception:
+        raise IngestError("File gambar rusak / tidak bisa di-decode")
+    decoded_pixels = image.width * image.height
+
+    with stage("resize"):
+        if image.size != target:
+            image = image.resize(target, resample)
+        # Orientasi diterapkan di gambar yang sudah kecil (bukan salinan ukuran penuh)
+        method = _ORIENTATION.get(orientation)
+        if method is not None:
+            image = image.transpose(method)
+
+    ingest_stats.record((time.perf_counter() - start) * 1000, source_pixels, decoded_pixels, drafted)
+    return image
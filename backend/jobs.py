@@ -0,0 +1,549 @@
+# backend/jobs.py
+# Job download video asinkron: submit -> job id, download jalan di worker pool,
+# progress dari progress_hooks yt-dlp bisa di-poll atau di-stream (SSE).
+# Klip (start/end): hanya segmen yang diminta yang di-download (ffmpeg seek lewat HTTP
+# range / fragmen yang relevan saja), dipotong di keyframe dengan stream copy.
+# Mode stream: format tanpa post-processing dibaca langsung dari sumber media dan
+# chunk-nya diteruskan ke client sambil ditulis ke disk (tee), dengan buffer terbatas.
+import asyncio
+import concurrent.futures
+import glob
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_DOWNLOADING = "downloading"
+JOB_PROCESSING = "processing"
+JOB_FINISHED = "finished"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINAL_STATES = (JOB_FINISHED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Terlalu banyak job video yang sedang antri"""
+
+
+class JobCancelled(Exception):
+    """Dilempar dari progress hook untuk menghentikan download"""
+
+
+class FileTooLarge(Exception):
+    """Ukuran file media melebihi batas download"""
+
+
+# Chunk baca dari sumber media saat mode stream
+STREAM_CHUNK_SIZE = 256 * 1024
+# Protokol yang bisa dibaca berurutan apa adanya (HLS/DASH = fragmen, butuh downloader yt-dlp)
+STREAM_PROTOCOLS = ("http", "https")
+
+
+def default_ydl_factory(opts: dict):
+    """Factory extractor default (yt-dlp asli). Test bisa mengganti dengan stand-in lokal"""
+    import yt_dlp
+    return yt_dlp.YoutubeDL(opts)
+
+
+# Parameter query yang tidak mengubah video (tracking / share), dibuang saat normalisasi URL
+TRACKING_PARAMS = {"si", "feature", "fbclid", "gclid", "igshid", "igsh", "pp", "share_id", "is_from_webapp", "sender_device"}
+
+
+def normalize_video_url(url: str) -> str:
+    """Normalisasi URL video supaya link yang sama (beda tracking param / host alias) punya key sama"""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = (parsed.scheme or "https").lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = parsed.path.rstrip("/") or "/"
+    query = [
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=False)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+
+    # YouTube: youtu.be/ID & /shorts/ID -> youtube.com/watch?v=ID
+    if host == "youtu.be" and len(path) > 1:
+        host, query = "youtube.com", [("v", path[1:])] + [(k, v) for k, v in query if k != "v"]
+        path = "/watch"
+    elif host == "youtube.com" and path.startswith("/shorts/"):
+        query = [("v", path[len("/shorts/"):])] + [(k, v) for k, v in query if k != "v"]
+        path = "/watch"
+
+    return urlunparse((scheme, host, path, "", urlencode(sorted(query)), ""))
+
+
+def extract_video_info(url: str, ydl_factory: Callable = None) -> dict:
+    """Ambil metadata video tanpa download (sync, jalankan di thread)"""
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'extract_flat': False
+    }
+    with stage("ytdlp_extract"), (ydl_factory or default_ydl_factory)(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+def build_download_opts(format_id: str, output_template: str, max_filesize: int, clip: tuple = None):
+    """Opsi yt-dlp untuk download + ekstensi file akhir yang diharapkan.
+    clip = (start, end) detik, end None = sampai akhir video"""
+    ydl_opts = {
+        'outtmpl': output_template,
+        'quiet': True,
+        'noplaylist': True,
+        'max_filesize': max_filesize,
+        'socket_timeout': 30,
+        'retries': 3
+    }
+
+    # Format spesifik
+    if format_id == 'mp3':
+        ydl_opts.update({
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }],
+        })
+        final_ext = "mp3"
+    else:
+        # Untuk video, pilih format yang reasonable
+        if format_id == 'best':
+            # Klip dengan end: ukuran file penuh tidak relevan (hasil dicek setelah download)
+            ydl_opts['format'] = 'best' if bounded_clip(clip) else f'best[filesize<{max_filesize // (1024 * 1024)}M]'
+        else:
+            ydl_opts['format'] = format_id
+        final_ext = "mp4"
+
+    if clip is not None:
+        from yt_dlp.utils import download_range_func
+
+        start, end = clip
+        ydl_opts['download_ranges'] = download_range_func(None, [(start, float('inf') if end is None else end)])
+        # Potong di keyframe terdekat dengan stream copy (tanpa re-encode, CPU ffmpeg minimal)
+        ydl_opts['force_keyframes_at_cuts'] = False
+        if bounded_clip(clip):
+            del ydl_opts['max_filesize']
+    return ydl_opts, final_ext
+
+
+def bounded_clip(clip: tuple) -> bool:
+    return clip is not None and clip[1] is not None
+
+
+def stream_format(info: dict) -> Optional[dict]:
+    """Format terpilih jika bisa di-stream apa adanya: satu file, HTTP biasa, tanpa merge"""
+    if info.get("_type") == "playlist" or info.get("requested_formats"):
+        return None
+    if not info.get("url") or info.get("protocol", "https") not in STREAM_PROTOCOLS:
+        return None
+    return info
+
+
+def open_media(ydl, fmt: dict):
+    """Buka URL media lewat networking yt-dlp (proxy, cookie & header format yang sama)"""
+    try:
+        from yt_dlp.networking import Request
+    except ImportError:
+        return ydl.urlopen(fmt["url"])
+    return ydl.urlopen(Request(fmt["url"], headers=fmt.get("http_headers") or {}))
+
+
+class StreamChannel:
+    """Antrian chunk terbatas dari thread download ke response async.
+
+    Antrian penuh = thread download menunggu (backpressure sampai ke koneksi sumber).
+    Setelah client putus (detach), download tetap lanjut ke disk tanpa antrian,
+    jadi file utuh bisa diambil / di-resume lewat /api/video-jobs/{id}/file.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_chunks: int = 16,
+                 cancelled: Callable[[], bool] = None):
+        self._loop = loop
+        self._queue = asyncio.Queue(max(1, max_chunks))
+        self._cancelled = cancelled or (lambda: False)
+        self.detached = False
+
+    def put(self, kind: str, payload=None):
+        """Dipanggil dari thread download (blok selama antrian penuh)"""
+        if self.detached:
+            return
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._queue.put((kind, payload)), self._loop)
+        except RuntimeError:
+            # Event loop sudah berhenti
+            self.detached = True
+            return
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.CancelledError:
+                # Task put dibatalkan event loop (shutdown)
+                self.detached = True
+                return
+            except concurrent.futures.TimeoutError:
+                # Jangan menahan worker video: job dibatalkan atau event loop sudah berhenti
+                # (tidak ada lagi yang akan mengosongkan antrian)
+                if self._loop.is_closed():
+                    self.detached = True
+                    return
+                if self.detached or self._cancelled() or not self._loop.is_running():
+                    future.cancel()
+                    self.detached = True
+                    return
+
+    async def get(self):
+        return await self._queue.get()
+
+    def detach(self):
+        """Dipanggil dari event loop"""
+        self.detached = True
+        # Buang chunk yang belum terkirim (RAM) & bebaskan put yang sedang menunggu
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def close(self):
+        """Untuk BackgroundTask response (jalan di event loop, bukan threadpool)"""
+        self.detach()
+
+    async def chunks(self):
+        """Async generator data untuk StreamingResponse, exception download diteruskan"""
+        try:
+            while True:
+                kind, payload = await self.get()
+                if kind == "data":
+                    yield payload
+                elif kind == "end":
+                    return
+                elif kind == "error":
+                    raise payload
+        finally:
+            self.detach()
+
+
+class VideoJob:
+    def __init__(self, url: str, format_id: str, clip: tuple = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.format_id = format_id
+        self.clip = clip
+        self.status = JOB_QUEUED
+        self.created = time.time()
+        self.updated = self.created
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        self.filename = None
+        self.path = None
+        self.error = None
+        self.version = 0  # naik setiap ada perubahan (untuk SSE)
+        self.cancel_requested = False
+        self.future = None
+
+    def update(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+        self.updated = time.time()
+        self.version += 1
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINAL_STATES
+
+    def snapshot(self) -> dict:
+        percent = None
+        if self.total_bytes:
+            percent = round(min(100.0, self.downloaded_bytes / self.total_bytes * 100), 1)
+        elif self.status == JOB_FINISHED:
+            percent = 100.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "format_id": self.format_id,
+            "clip": {"start": self.clip[0], "end": self.clip[1]} if self.clip else None,
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "percent": percent,
+            "speed": self.speed,
+            "eta": self.eta,
+            "filename": self.filename,
+            "error": self.error,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class VideoJobManager:
+    """Worker pool terbatas untuk download video"""
+
+    def __init__(self, output_folder: str, max_workers: int = 2, max_pending: int = 16,
+                 max_filesize: int = 100 * 1024 * 1024, job_ttl: float = 900,
+                 ydl_factory: Callable = None, on_finished: Optional[Callable] = None):
+        self.output_folder = output_folder
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self.max_filesize = max_filesize
+        self.job_ttl = job_ttl
+        self.ydl_factory = ydl_factory or default_ydl_factory
+        self.on_finished = on_finished
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="azura-video")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _new_job(self, url: str, format_id: str, clip: tuple = None) -> VideoJob:
+        with self._lock:
+            self._prune(time.time())
+            active = sum(1 for job in self._jobs.values() if not job.done)
+            if active >= self.max_workers + self.max_pending:
+                raise JobQueueFull("Antrian download penuh")
+            job = VideoJob(url, format_id, clip)
+            self._jobs[job.id] = job
+        return job
+
+    def submit(self, url: str, format_id: str, clip: tuple = None) -> VideoJob:
+        """clip = (start, end) detik: hanya segmen itu yang di-download"""
+        job = self._new_job(url, format_id, clip)
+        job.future = self._pool.submit(self._run, job)
+        return job
+
+    def submit_stream(self, url: str, format_id: str, loop: asyncio.AbstractEventLoop,
+                      max_chunks: int = 16):
+        """Job download mode stream: (job, channel). Item pertama channel:
+        ("meta", dict) = stream dimulai, ("meta", None) = format tidak bisa di-stream
+        (job jalan seperti download biasa), ("error", exc) = gagal sebelum mulai"""
+        job = self._new_job(url, format_id)
+        channel = StreamChannel(loop, max_chunks, cancelled=lambda: job.cancel_requested)
+        job.future = self._pool.submit(self._run_stream, job, channel)
+        return job, channel
+
+    def get(self, job_id: str) -> Optional[VideoJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[VideoJob]:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.cancel_requested = True
+        if job.future is not None and job.future.cancel():
+            # Belum sempat jalan
+            job.update(status=JOB_CANCELLED)
+        return job
+
+    async def wait(self, job: VideoJob) -> VideoJob:
+        """Tunggu job selesai tanpa memblok event loop"""
+        if job.future is not None and not job.future.cancelled():
+            try:
+                await asyncio.wrap_future(job.future)
+            except asyncio.CancelledError:
+                if not job.future.cancelled():
+                    raise
+            except Exception:
+                pass
+        return job
+
+    async def events(self, job: VideoJob, poll_interval: float = 0.5):
+        """Async generator snapshot job setiap ada perubahan, berhenti saat job selesai"""
+        last_version = -1
+        while True:
+            if job.version != last_version:
+                last_version = job.version
+                yield job.snapshot()
+            if job.done:
+                return
+            await asyncio.sleep(poll_interval)
+
+    def _prune(self, now: float):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.updated > self.job_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _progress_hook(self, job: VideoJob):
+        def hook(d):
+            if job.cancel_requested:
+                raise JobCancelled("Download dibatalkan")
+            status = d.get('status')
+            if status == 'downloading':
+                job.update(
+                    status=JOB_DOWNLOADING,
+                    downloaded_bytes=d.get('downloaded_bytes') or 0,
+                    total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate'),
+                    speed=d.get('speed'),
+                    eta=d.get('eta'),
+                )
+            elif status == 'finished':
+                job.update(
+                    status=JOB_PROCESSING,
+                    downloaded_bytes=d.get('downloaded_bytes') or job.downloaded_bytes,
+                    total_bytes=d.get('total_bytes') or job.total_bytes,
+                    eta=0,
+                )
+        return hook
+
+    def _run(self, job: VideoJob):
+        if job.cancel_requested:
+            job.update(status=JOB_CANCELLED)
+            return job
+        prefix = f"dl_{job.id}"
+        output_template = os.path.join(self.output_folder, f"{prefix}.%(ext)s")
+        ydl_opts, final_ext = build_download_opts(job.format_id, output_template, self.max_filesize, job.clip)
+        ydl_opts['progress_hooks'] = [self._progress_hook(job)]
+        job.update(status=JOB_DOWNLOADING)
+
+        try:
+            with stage("ytdlp_download"), self.ydl_factory(ydl_opts) as ydl:
+                ydl.download([job.url])
+
+            # Cari file yang didownload
+            final_path = os.path.join(self.output_folder, f"{prefix}.{final_ext}")
+            if not os.path.exists(final_path):
+                # Fallback: cari file dengan prefix yang sama (ekstensi bisa beda)
+                candidates = [
+                    p for p in glob.glob(os.path.join(self.output_folder, f"{prefix}.*"))
+                    if not p.endswith(('.part', '.ytdl', '.tmp'))
+                ]
+                if not candidates:
+                    raise RuntimeError("File download tidak ditemukan")
+                final_path = candidates[0]
+
+            if bounded_clip(job.clip) and os.path.getsize(final_path) > self.max_filesize:
+                raise RuntimeError(f"Klip lebih dari {self.max_filesize // (1024 * 1024)}MB")
+            if self.on_finished is not None:
+                self.on_finished(final_path)
+            job.update(
+                status=JOB_FINISHED,
+                path=final_path,
+                filename=os.path.basename(final_path),
+                downloaded_bytes=os.path.getsize(final_path),
+            )
+        except JobCancelled:
+            self._remove_leftovers(prefix)
+            job.update(status=JOB_CANCELLED)
+        except Exception as e:
+            if job.cancel_requested:
+                self._remove_leftovers(prefix)
+                job.update(status=JOB_CANCELLED)
+                return job
+            logger.error(f"❌ Error Download (job {job.id}): {e}")
+            # Hapus file parsial (.part, .ytdl, dll) dari download yang gagal
+            self._remove_leftovers(prefix)
+            job.update(status=JOB_FAILED, error=str(e))
+        return job
+
+    def _run_stream(self, job: VideoJob, channel: StreamChannel):
+        if job.cancel_requested:
+            job.update(status=JOB_CANCELLED)
+            channel.put("error", JobCancelled("Download dibatalkan"))
+            return job
+        prefix = f"dl_{job.id}"
+        ydl_opts, _ = build_download_opts(job.format_id, "-", self.max_filesize)
+        job.update(status=JOB_DOWNLOADING)
+        part_path = None
+
+        try:
+            with self.ydl_factory(ydl_opts) as ydl:
+                with stage("ytdlp_extract"):
+                    info = ydl.extract_info(job.url, download=False)
+                fmt = stream_format(info)
+                if fmt is None:
+                    # Butuh merge / fragmen: download biasa (endpoint menunggu job selesai)
+                    channel.put("meta", None)
+                    return self._run(job)
+
+                with stage("ytdlp_download"):
+                    response = open_media(ydl, fmt)
+                    try:
+                        length = int(response.headers.get("Content-Length") or 0) or None
+                    except (TypeError, ValueError):
+                        length = None
+                    if (length or fmt.get("filesize") or 0) > self.max_filesize:
+                        raise FileTooLarge(f"File lebih dari {self.max_filesize // (1024 * 1024)}MB")
+
+                    filename = f"{prefix}.{fmt.get('ext') or 'mp4'}"
+                    final_path = os.path.join(self.output_folder, filename)
+                    part_path = f"{final_path}.part"
+                    job.update(total_bytes=length or fmt.get("filesize"))
+                    channel.put("meta", {"filename": filename, "size": length, "ext": fmt.get("ext") or "mp4"})
+
+                    written = 0
+                    start = time.monotonic()
+                    with closing(response), open(part_path, "wb") as f:
+                        while True:
+                            if job.cancel_requested:
+                                raise JobCancelled("Download dibatalkan")
+                            chunk = response.read(STREAM_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            written += len(chunk)
+                            if written > self.max_filesize:
+                                raise FileTooLarge(f"File lebih dari {self.max_filesize // (1024 * 1024)}MB")
+                            f.write(chunk)
+                            elapsed = time.monotonic() - start
+                            job.update(downloaded_bytes=written, speed=written / elapsed if elapsed > 0 else None)
+                            channel.put("data", chunk)
+                    if length is not None and written != length:
+                        raise RuntimeError(f"Download terputus ({written}/{length} byte)")
+
+            os.replace(part_path, final_path)
+            if self.on_finished is not None:
+                self.on_finished(final_path)
+            job.update(status=JOB_FINISHED, path=final_path, filename=filename,
+                       downloaded_bytes=written, total_bytes=written, eta=0)
+            channel.put("end")
+        except Exception as e:
+            if part_path is not None:
+                self._remove_leftovers(prefix)
+            if isinstance(e, JobCancelled) or job.cancel_requested:
+                job.update(status=JOB_CANCELLED)
+            else:
+                logger.error(f"❌ Error Download stream (job {job.id}): {e}")
+                job.update(status=JOB_FAILED, error=str(e))
+            channel.put("error", e)
+        return job
+
+    def _remove_leftovers(self, prefix: str):
+        for leftover in glob.glob(os.path.join(self.output_folder, f"{prefix}.*")):
+            try:
+                os.remove(leftover)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "jobs": counts,
+            }
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel_requested = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
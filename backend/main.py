@@ -4,23 +4,48 @@ import time
 import logging
 import io
 import gc
-import numpy as np
 import base64
-import yt_dlp
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import List, Optional
 from urllib.parse import urlparse
 
+# Mulai import modul aplikasi (tahap "imports" di startup breakdown)
+_imports_started = time.time()
+
 # Library FastAPI
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 
 # AI Libraries
-from rembg import remove, new_session
-from PIL import Image, ImageEnhance, ImageOps, ImageFilter
+from PIL import Image
+
+from inference import InferenceExecutor, InferenceQueueFull, MicroBatcher
+from cache import ResultCache, SingleFlight, TTLCache, content_hash, make_key
+from ratelimit import RateLimiter
+import encoder
+from encoder import EncoderError
+from storage import DiskOutputStore, MemoryOutputStore, OutputJanitor, guess_media_type, is_safe_name
+from sessions import ModelNotAvailable, SessionPool
+from matting import guided_upsample
+from eraser import erase_patches, erase_regions, normalize_mode, opencv, paste_patches
+from edit_sessions import EditSessionError, EditSessionStore
+from masks import MASK_KINDS, MaskFormatError, decode_mask, parse_stats
+from ingest import ImageInfo, ImageTooLarge, IngestError, ingest_stats, load_image, probe
+from metrics import MetricsMiddleware, process_rss_bytes, registry, stage
+from model_runtime import ExecutionProfile, SessionBuilder
+from startup import startup
+from admission import AdmissionController, AdmissionRejected, current_ticket, decode_bytes, estimate_cost, work_cost
+from upscaler import SCALES, UpscaleParams, memory_estimate, upscale_png_stream, upscale_stats
+from jobs import (
+    JOB_FINISHED, STREAM_CHUNK_SIZE, FileTooLarge, JobQueueFull, VideoJobManager, extract_video_info,
+    normalize_video_url,
+)
 
 # --- CONFIGURATION & LOGGING ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -28,70 +53,298 @@ logger = logging.getLogger(__name__)
 
 # --- IMPORT OPTIONAL: cv2 (OpenCV) ---
 # Railway mungkin tidak support penuh OpenCV, jadi kita buat optional
-# Dengan fallback ke PIL jika cv2 tidak tersedia
-CV2_AVAILABLE = False
-cv2 = None
-try:
-    import cv2
-    CV2_AVAILABLE = True
-    logger.info("✅ OpenCV tersedia")
-except ImportError as e:
-    logger.warning(f"⚠️ OpenCV tidak tersedia: {e}. Beberapa fitur akan menggunakan PIL sebagai fallback")
+# Dengan fallback ke PIL jika cv2 tidak tersedia. Import-nya lazy (eraser.opencv):
+# di-preload di background saat startup, bukan saat import main
+def cv2_available() -> bool:
+    return opencv() is not None
 
 # --- Folder Config dan kode selanjutnya tetap sama ---
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'outputs'
 MODELS_FOLDER = 'models'
+CACHE_FOLDER = 'cache'
 
 # ... kode selanjutnya tetap sama ...
 # LIMITS (Penting untuk Railway Free Tier)
 SERVER_MAX_DIMENSION = 1024  # Lebih rendah lagi untuk Railway Free Tier (512MB RAM)
+# Mode resolution=full: inference tetap di SERVER_MAX_DIMENSION, mask di-upsample
+# (guided filter) ke gambar asli yang dibatasi sisi terpanjangnya ke nilai ini
+HIRES_MAX_DIMENSION = int(os.environ.get('HIRES_MAX_DIMENSION', 4096))
+RESOLUTION_MODES = ("standard", "full")
+# Batas pixel gambar upload (dicek dari header sebelum decode, anti decompression bomb)
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 40_000_000))
 MAX_VIDEO_SIZE_MB = 100      # Batas max download video (100MB)
+VIDEO_WORKERS = int(os.environ.get('VIDEO_WORKERS', 2))            # Download video paralel
+VIDEO_QUEUE_SIZE = int(os.environ.get('VIDEO_QUEUE_SIZE', 16))     # Job video yang boleh antri
+# Panjang maksimal klip (start/end) video; batas ukuran file berlaku pada hasil klip
+MAX_CLIP_SECONDS = float(os.environ.get('MAX_CLIP_SECONDS', 600))
+# Buffer per download mode stream (chunk yang sudah diterima tapi belum terkirim ke client)
+VIDEO_STREAM_BUFFER_MB = float(os.environ.get('VIDEO_STREAM_BUFFER_MB', 4))
+VIDEO_INFO_TTL_SECONDS = int(os.environ.get('VIDEO_INFO_TTL_SECONDS', 600))  # Cache metadata video
+VIDEO_INFO_CACHE_SIZE = int(os.environ.get('VIDEO_INFO_CACHE_SIZE', 512))
 MAX_REQUEST_SIZE = 10 * 1024 * 1024  # 10MB max per request
+MAX_BATCH_IMAGES = int(os.environ.get('MAX_BATCH_IMAGES', 10))  # Max gambar per request batch
+MAX_BATCH_BYTES = int(os.environ.get('MAX_BATCH_MB', 30)) * 1024 * 1024  # Total upload per request batch
+
+# MODEL AI: model default + budget RAM untuk pool model (model lain di-load saat diminta)
+# Graph ONNX hasil optimasi ONNX Runtime di-cache di MODELS_FOLDER (RMBG_GRAPH_CACHE=0 untuk mematikan)
+# Pilihan berdasarkan ukuran model:
+# 1. u2netp: 4.7MB (Sangat Ringan)
+# 2. silueta: 43MB (Quick silhouette)
+# 3. u2net_human_seg / u2net / isnet-anime: ~176MB
+RMBG_MODEL = os.environ.get('RMBG_MODEL', 'u2netp')
+MODEL_MEMORY_MB = int(os.environ.get('MODEL_MEMORY_MB', 256))
+RMBG_PIN_DEFAULT = os.environ.get('RMBG_PIN_DEFAULT', '1') != '0'
+RMBG_GRAPH_CACHE = os.environ.get('RMBG_GRAPH_CACHE', '1') != '0'
+# Presisi model: fp32 (asli) atau int8 (dynamic quantization, dibuat sekali ke MODELS_FOLDER;
+# file model ~4x lebih kecil, mask sedikit berbeda -> cek benchmarks/bench_quantize.py)
+RMBG_PRECISION = os.environ.get('RMBG_PRECISION', 'fp32').lower()
+
+# PROFIL ONNX RUNTIME untuk session rembg (thread 0 = default ORT: semua core).
+# Di container kecil: ORT_INTRA_OP_THREADS = jumlah vCPU, mode sequential, dan
+# ORT_CPU_MEM_ARENA=0 kalau RAM puncak lebih penting dari latency
+ORT_INTRA_OP_THREADS = int(os.environ.get('ORT_INTRA_OP_THREADS', os.environ.get('OMP_NUM_THREADS', 0)))
+ORT_INTER_OP_THREADS = int(os.environ.get('ORT_INTER_OP_THREADS', os.environ.get('OMP_NUM_THREADS', 0)))
+ORT_EXECUTION_MODE = os.environ.get('ORT_EXECUTION_MODE', 'sequential').lower()
+ORT_GRAPH_OPTIMIZATION = os.environ.get('ORT_GRAPH_OPTIMIZATION', 'extended').lower()
+ORT_CPU_MEM_ARENA = os.environ.get('ORT_CPU_MEM_ARENA', '1') != '0'
+ORT_MEM_PATTERN = os.environ.get('ORT_MEM_PATTERN', '1') != '0'
+# Inference dummy setelah model di-load (alokasi arena ONNX Runtime) sebelum ready
+RMBG_WARMUP = os.environ.get('RMBG_WARMUP', '1') != '0'
+
+# INFERENCE POOL: jumlah worker paralel & panjang antrian tunggu
+# 1 worker cukup untuk 512MB RAM (ONNX Runtime sendiri sudah multi-thread)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 1))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 8))
+
+# MAGIC ERASER: region mask yang terpisah di-inpaint paralel (cv2 melepas GIL)
+ERASE_REGION_WORKERS = int(os.environ.get('ERASE_REGION_WORKERS', 2))
+# Preset engine inpainting NumPy (dipakai jika OpenCV tidak ada): fast / balanced / quality
+INPAINT_PRESET = os.environ.get('INPAINT_PRESET', 'balanced')
+# Sesi edit eraser: gambar kerja di RAM (TTL sejak terakhir dipakai, budget total, langkah undo)
+EDIT_SESSION_TTL_SECONDS = int(os.environ.get('EDIT_SESSION_TTL_SECONDS', 900))
+EDIT_SESSION_MEMORY_MB = int(os.environ.get('EDIT_SESSION_MEMORY_MB', 64))
+EDIT_SESSION_HISTORY = int(os.environ.get('EDIT_SESSION_HISTORY', 10))
+
+# SMART UPSCALER: tile di-resize paralel (default semua core), hasil PNG di-encode per band.
+# Batas pixel hasil (4x foto 12MP = 192MP) membatasi waktu proses & ukuran file, bukan RAM
+UPSCALE_WORKERS = int(os.environ.get('UPSCALE_WORKERS', os.cpu_count() or 2))
+UPSCALE_TILE_SIZE = int(os.environ.get('UPSCALE_TILE_SIZE', 256))
+UPSCALE_MAX_OUTPUT_PIXELS = int(os.environ.get('UPSCALE_MAX_OUTPUT_PIXELS', 200_000_000))
+
+# ADMISSION CONTROL: budget RAM untuk request gambar yang sedang diproses (di luar
+# model, cache & output store). Biaya diperkirakan dari dimensi di header + model + operasi;
+# request yang tidak muat menunggu (FIFO) sampai timeout, lalu 503 + Retry-After
+ADMISSION_MEMORY_MB = int(os.environ.get('ADMISSION_MEMORY_MB', 192))
+ADMISSION_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_TIMEOUT_SECONDS', 30))
+ADMISSION_MAX_WAITING = int(os.environ.get('ADMISSION_MAX_WAITING', 32))
+
+# MICRO-BATCHING: kumpulkan request remove-bg max N gambar / max X ms per batch
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 4))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+
+# RESULT CACHE: hasil yang sama (input + model + parameter) tidak diproses ulang
+CACHE_MEMORY_MB = int(os.environ.get('CACHE_MEMORY_MB', 32))
+CACHE_DISK_MB = int(os.environ.get('CACHE_DISK_MB', 256))
+
+# OUTPUT STORE: "disk" (folder outputs/) atau "memory" (RAM, hemat disk write)
+# Catatan: backend memory hanya valid untuk 1 worker uvicorn
+OUTPUT_STORE = os.environ.get('OUTPUT_STORE', 'disk').lower()
+OUTPUT_TTL_SECONDS = int(os.environ.get('OUTPUT_TTL_SECONDS', 900))
+OUTPUT_MEMORY_MB = int(os.environ.get('OUTPUT_MEMORY_MB', 64))
+
+# JANITOR: hapus file output kedaluwarsa secara periodik + batas total disk
+MAX_OUTPUT_DISK_MB = int(os.environ.get('MAX_OUTPUT_DISK_MB', 500))
+JANITOR_INTERVAL_SECONDS = int(os.environ.get('JANITOR_INTERVAL_SECONDS', 60))
+
+# RATE LIMIT per IP: (request per menit, burst) untuk tiap kelas endpoint
+RATE_LIMITS = {
+    "inference": (float(os.environ.get('RATE_INFERENCE_PER_MIN', 10)), int(os.environ.get('RATE_INFERENCE_BURST', 10))),
+    "video": (float(os.environ.get('RATE_VIDEO_PER_MIN', 5)), int(os.environ.get('RATE_VIDEO_BURST', 3))),
+    "metadata": (float(os.environ.get('RATE_METADATA_PER_MIN', 30)), int(os.environ.get('RATE_METADATA_BURST', 10))),
+}
 
 for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER, MODELS_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
 # --- GLOBAL VARIABLES ---
-rembg_session = None
-request_history = {}
+rate_limiter = RateLimiter(RATE_LIMITS)
+output_janitor = OutputJanitor(
+    ttl=OUTPUT_TTL_SECONDS,
+    max_bytes=MAX_OUTPUT_DISK_MB * 1024 * 1024,
+    interval=JANITOR_INTERVAL_SECONDS
+)
+disk_outputs = DiskOutputStore(OUTPUT_FOLDER, janitor=output_janitor)
+if OUTPUT_STORE == 'memory':
+    output_store = MemoryOutputStore(ttl=OUTPUT_TTL_SECONDS, max_bytes=OUTPUT_MEMORY_MB * 1024 * 1024)
+    output_janitor.memory_stores.append(output_store)
+else:
+    output_store = disk_outputs
+result_cache = ResultCache(
+    memory_budget=CACHE_MEMORY_MB * 1024 * 1024,
+    disk_budget=CACHE_DISK_MB * 1024 * 1024,
+    disk_folder=CACHE_FOLDER
+)
+video_jobs = VideoJobManager(
+    OUTPUT_FOLDER,
+    max_workers=VIDEO_WORKERS,
+    max_pending=VIDEO_QUEUE_SIZE,
+    max_filesize=MAX_VIDEO_SIZE_MB * 1024 * 1024,
+    job_ttl=OUTPUT_TTL_SECONDS,
+    on_finished=output_janitor.track
+)
+video_info_cache = TTLCache(ttl=VIDEO_INFO_TTL_SECONDS, max_entries=VIDEO_INFO_CACHE_SIZE)
+video_info_flight = SingleFlight()
+erase_region_executor = ThreadPoolExecutor(max_workers=ERASE_REGION_WORKERS, thread_name_prefix="azura-erase")
+upscale_executor = ThreadPoolExecutor(max_workers=max(1, UPSCALE_WORKERS), thread_name_prefix="azura-upscale")
+edit_sessions = EditSessionStore(
+    ttl=EDIT_SESSION_TTL_SECONDS,
+    max_bytes=EDIT_SESSION_MEMORY_MB * 1024 * 1024,
+    max_history=EDIT_SESSION_HISTORY
+)
+# Sesi kedaluwarsa ikut dibersihkan di setiap sweep janitor
+output_janitor.memory_stores.append(edit_sessions)
+inference_executor = InferenceExecutor(max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE)
+admission = AdmissionController(
+    budget_bytes=ADMISSION_MEMORY_MB * 1024 * 1024,
+    timeout=ADMISSION_TIMEOUT_SECONDS,
+    max_waiting=ADMISSION_MAX_WAITING
+)
+
+def attach_batcher(entry):
+    """Setiap model di pool punya micro-batcher sendiri"""
+    entry.batcher = MicroBatcher(
+        inference_executor, entry.session, entry.model_name,
+        max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS
+    )
+
+session_builder = SessionBuilder(
+    cache_folder=MODELS_FOLDER if RMBG_GRAPH_CACHE else None,
+    profile=ExecutionProfile(
+        intra_op_threads=ORT_INTRA_OP_THREADS,
+        inter_op_threads=ORT_INTER_OP_THREADS,
+        execution_mode=ORT_EXECUTION_MODE,
+        graph_optimization=ORT_GRAPH_OPTIMIZATION,
+        cpu_mem_arena=ORT_CPU_MEM_ARENA,
+        mem_pattern=ORT_MEM_PATTERN
+    ),
+    precision=RMBG_PRECISION
+)
+session_pool = SessionPool(
+    budget_bytes=MODEL_MEMORY_MB * 1024 * 1024,
+    default_model=RMBG_MODEL,
+    pin_default=RMBG_PIN_DEFAULT,
+    session_factory=session_builder,
+    on_load=attach_batcher
+)
 app_start_time = time.time()
 
+# Gauge yang baru dihitung saat /metrics di-scrape (tanpa biaya per request)
+registry.callback(
+    "azura_ready", "1 jika startup (model, warmup) sudah selesai", lambda: int(startup.ready)
+)
+registry.callback(
+    "azura_startup_stage_seconds", "Durasi tiap tahap startup", startup.stage_seconds, ("stage",)
+)
+registry.callback(
+    "azura_inference_queue_depth", "Job inference yang menunggu worker",
+    lambda: inference_executor.queue_depth
+)
+registry.callback(
+    "azura_inference_running", "Job inference yang sedang jalan",
+    lambda: inference_executor.stats()["running"]
+)
+registry.callback(
+    "azura_video_jobs", "Job video per status",
+    lambda: {(status,): count for status, count in video_jobs.stats()["jobs"].items()}, ("status",)
+)
+registry.callback(
+    "azura_admission_in_use_bytes", "Perkiraan RAM request gambar yang sedang diproses",
+    lambda: admission.in_use
+)
+registry.callback(
+    "azura_admission_waiting", "Request yang menunggu budget memori",
+    lambda: admission.stats()["waiting"]
+)
+registry.callback(
+    "azura_model_resident_bytes", "Perkiraan RAM model yang sedang di-load",
+    lambda: session_pool.resident_bytes
+)
+registry.callback(
+    "azura_cache_memory_bytes", "Ukuran result cache di RAM",
+    lambda: result_cache.stats()["memory_bytes"]
+)
+registry.callback(
+    "azura_edit_session_bytes", "RAM yang dipakai sesi edit magic eraser",
+    lambda: edit_sessions.stats()["bytes"]
+)
+
 # --- LIFESPAN (OPTIMIZED MODEL) ---
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    global rembg_session
+def warmup_session(session):
+    """Satu inference dummy: alokasi arena & kernel ONNX Runtime terjadi di sini,
+    bukan di request pertama user"""
+    session.predict(Image.new("RGB", (320, 320)))
+
+async def load_models():
+    """Tahap startup berat, jalan di background setelah server menerima koneksi
+    (/health/live sudah 200, /health/ready 503 sampai tahap ini selesai)"""
     try:
         logger.info("⏳ [STARTUP] Loading AI Models...")
         
-        # OPTIMASI: Ganti ke model yang lebih ringan untuk Railway
-        # Pilihan berdasarkan ukuran model:
-        # 1. u2netp: 4.7MB (Sangat Ringan)
-        # 2. u2net_human_seg: 9.6MB (Spesifik manusia)
-        # 3. isnet-anime: 10MB (Untuk anime)
-        # 4. silueta: 5.4MB (Quick silhouette)
-        
-        # Untuk Railway Free Tier, gunakan yang paling ringan
-        model_name = os.environ.get('RMBG_MODEL', 'u2netp')
+        # Untuk Railway Free Tier, default pakai model yang paling ringan
+        model_name = session_pool.default_model
         logger.info(f"📦 Menggunakan model: {model_name}")
         
+        entry = None
         try:
-            rembg_session = new_session(model_name)
-            logger.info(f"✅ [STARTUP] Model {model_name} loaded!")
-        except Exception as model_error:
-            logger.error(f"❌ Gagal load model {model_name}: {model_error}")
-            # Fallback ke u2netp
-            rembg_session = new_session("u2netp")
-            logger.info("✅ [STARTUP] Fallback ke model u2netp")
-        
-    except Exception as e:
-        logger.error(f"⚠️ Model load failed: {e}")
-        # Jangan crash aplikasi, biarkan rembg_session = None
-        # Aplikasi tetap bisa berjalan untuk endpoint non-AI
-        rembg_session = None
+            with startup.stage("model_load"):
+                try:
+                    entry = await session_pool.acquire(model_name)
+                    logger.info(f"✅ [STARTUP] Model {model_name} loaded!")
+                except Exception as model_error:
+                    logger.error(f"❌ Gagal load model {model_name}: {model_error}")
+                    # Fallback ke u2netp
+                    session_pool.default_model = "u2netp"
+                    entry = await session_pool.acquire("u2netp")
+                    logger.info("✅ [STARTUP] Fallback ke model u2netp")
+        except Exception as e:
+            logger.error(f"⚠️ Model load failed: {e}")
+            # Jangan crash aplikasi: endpoint non-AI tetap jalan,
+            # model akan dicoba di-load lagi saat request AI pertama
+
+        if entry is not None and RMBG_WARMUP:
+            try:
+                with startup.stage("warmup"):
+                    await asyncio.to_thread(warmup_session, entry.session)
+            except Exception as e:
+                logger.warning(f"⚠️ Warmup model gagal: {e}")
+
+        with startup.stage("opencv"):
+            available = await asyncio.to_thread(cv2_available)
+        if available:
+            logger.info("✅ OpenCV tersedia")
+        else:
+            logger.warning("⚠️ OpenCV tidak tersedia. Beberapa fitur akan menggunakan PIL sebagai fallback")
+    finally:
+        startup.mark_ready()
+        logger.info(f"🚀 [STARTUP] Ready: {startup.summary()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Janitor: index file sisa proses sebelumnya sekali, lalu sweep periodik
+    with startup.stage("janitor_seed"):
+        await asyncio.to_thread(output_janitor.seed, [UPLOAD_FOLDER, OUTPUT_FOLDER])
+    janitor_task = asyncio.create_task(output_janitor.run())
+    startup_task = asyncio.create_task(load_models())
     yield
     logger.info("🛑 [SHUTDOWN] Cleaning up resources...")
-    rembg_session = None
+    startup_task.cancel()
+    janitor_task.cancel()
+    video_jobs.shutdown()
+    inference_executor.shutdown()
+    erase_region_executor.shutdown(wait=False, cancel_futures=True)
+    upscale_executor.shutdown(wait=False, cancel_futures=True)
+    session_pool.clear()
     gc.collect()
 
 # --- INIT APP ---
@@ -105,18 +358,25 @@ app = FastAPI(
 )
 
 # --- SECURITY: CORS ---
+# Header response yang dibaca frontend (beda origin): hasil inline, upscale, stream video, Range
+EXPOSED_HEADERS = [
+    "Content-Disposition", "X-Filename", "X-Quality", "X-Model", "X-Resolution",
+    "X-Session-Id", "X-Version", "X-Undo-Steps",
+    "X-Scale", "X-Width", "X-Height",
+    "X-Job-Id", "X-Resume-Url",
+    "ETag", "Accept-Ranges", "Content-Range", "Retry-After",
+]
 app.add_middleware(
     CORSMiddleware,
     # Di Railway, frontend di Vercel akan beda domain
     allow_origins=["*"],  # Untuk development, ganti dengan domain asli saat production
     allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=EXPOSED_HEADERS,
 )
-
-# Mount static files jika folder ada
-if os.path.exists(OUTPUT_FOLDER):
-    app.mount("/outputs", StaticFiles(directory=OUTPUT_FOLDER), name="outputs")
+# Latency per endpoint + request in-flight (lihat /metrics)
+app.add_middleware(MetricsMiddleware)
 
 # --- DATA MODELS ---
 class EraseRequest(BaseModel):
@@ -125,6 +385,9 @@ class EraseRequest(BaseModel):
     strength: int = 5
     detail: int = 2
     quality: str = "Medium"  # Default ke Medium untuk Railway
+    format: str = "jpeg"     # jpeg / png / webp / avif
+    preset: str = "balanced" # fast / balanced / small
+    response_mode: str = "url"  # url / inline
 
 class VideoRequest(BaseModel):
     url: str
@@ -132,24 +395,22 @@ class VideoRequest(BaseModel):
 class DownloadRequest(BaseModel):
     url: str
     format_id: str
+    stream: bool = False  # kirim bytes ke client sambil download (format tanpa post-processing)
+    start: Optional[float] = None  # detik; start/end = hanya segmen ini yang di-download
+    end: Optional[float] = None
 
 # --- HELPER FUNCTIONS ---
 
-def check_rate_limit(ip_address: str) -> bool:
-    """Rate limiting yang lebih longgar untuk Railway"""
-    now = time.time()
-    
-    # Reset history jika terlalu lama
-    if ip_address in request_history and now - request_history[ip_address] > 3600:
-        del request_history[ip_address]
-    
-    # Rate limit: 10 request per menit per IP
-    request_count = sum(1 for t in request_history.values() if now - t < 60)
-    if request_count > 10:
-        return False
-    
-    request_history[ip_address] = now
-    return True
+def check_rate_limit(request: Request, endpoint_class: str, tokens: int = 1):
+    """Rate limiting token bucket per IP & kelas endpoint (O(1) per request).
+    tokens = jumlah unit kerja (mis. gambar dalam batch)"""
+    allowed, retry_after = rate_limiter.check(endpoint_class, request.client.host, tokens)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Terlalu banyak request. Coba lagi nanti.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
 
 def validate_image_header(file_content: bytes) -> bool:
     """Validasi file image dengan magic bytes"""
@@ -170,70 +431,33 @@ def validate_image_header(file_content: bytes) -> bool:
     except:
         return False
 
-def initial_resize(image: Image.Image) -> Image.Image:
+def initial_resize(image: Image.Image, max_dimension: int = SERVER_MAX_DIMENSION) -> Image.Image:
     """Resize gambar untuk menghemat memory Railway"""
     w, h = image.size
     
     # Railway Free Tier punya RAM terbatas, resize lebih agresif
-    if max(w, h) > SERVER_MAX_DIMENSION:
-        ratio = SERVER_MAX_DIMENSION / max(w, h)
+    if max(w, h) > max_dimension:
+        ratio = max_dimension / max(w, h)
         new_size = (int(w * ratio), int(h * ratio))
         logger.info(f"📏 Resize dari {w}x{h} ke {new_size[0]}x{new_size[1]}")
         return image.resize(new_size, Image.LANCZOS)
     
     return image
 
-def cleanup_resources():
-    """Cleanup resources untuk Railway Free Tier"""
-    try:
-        now = time.time()
-        deleted_files = 0
-        
-        # Hapus file lama (>15 menit) untuk menghemat disk space
-        for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
-            if os.path.exists(folder):
-                for f in os.listdir(folder):
-                    path = os.path.join(folder, f)
-                    if os.path.isfile(path):
-                        try:
-                            file_age = now - os.path.getmtime(path)
-                            if file_age > 900:  # 15 menit
-                                os.remove(path)
-                                deleted_files += 1
-                        except:
-                            pass
-        
-        # Bersihkan rate limit history
-        keys_to_del = [k for k, v in request_history.items() if now - v > 3600]
-        for k in keys_to_del:
-            del request_history[k]
-        
-        # Paksa garbage collection
-        collected = gc.collect()
-        
-        if deleted_files > 0 or collected > 0:
-            logger.info(f"🧹 Cleanup: {deleted_files} file dihapus, {collected} objects collected")
-            
-    except Exception as e:
-        logger.error(f"Cleanup error: {e}")
-
-def save_image_smart(image_obj, path, quality_mode="Medium", is_cv2=False):
-    """Save image dengan optimasi untuk Railway"""
+def encode_image_smart(image_obj, fmt="png", quality_mode="Medium", is_cv2=False, preset="balanced",
+                       max_dimension=None):
+    """Encode image ke bytes dengan optimasi untuk Railway (None jika gagal).
+    max_dimension menggantikan batas sisi dari quality_mode (mis. resolution=full)"""
     try:
         # Convert dari cv2 ke PIL jika perlu
-        if is_cv2 and CV2_AVAILABLE:
+        cv2 = opencv() if is_cv2 else None
+        if cv2 is not None:
             try:
                 image_obj = Image.fromarray(cv2.cvtColor(image_obj, cv2.COLOR_BGR2RGB))
             except:
                 # Fallback jika cv2 error
                 image_obj = Image.fromarray(image_obj)
         
-        # Hilangkan metadata untuk privacy
-        data = list(image_obj.getdata())
-        clean_image = Image.new(image_obj.mode, image_obj.size)
-        clean_image.putdata(data)
-        image_obj = clean_image
-        
         # Optimasi quality untuk Railway
         target_max_dim = 1024
         q_val = 85
@@ -244,6 +468,8 @@ def save_image_smart(image_obj, path, quality_mode="Medium", is_cv2=False):
         elif quality_mode == "Low":
             target_max_dim = 640
             q_val = 75
+        if max_dimension:
+            target_max_dim = max_dimension
         
         # Resize jika terlalu besar
         w, h = image_obj.size
@@ -252,60 +478,314 @@ def save_image_smart(image_obj, path, quality_mode="Medium", is_cv2=False):
             new_size = (int(w * ratio), int(h * ratio))
             image_obj = image_obj.resize(new_size, Image.LANCZOS)
         
-        # Save dengan format yang sesuai
-        ext = os.path.splitext(path)[1].lower()
-        if ext in ['.jpg', '.jpeg']:
-            image_obj.save(path, "JPEG", quality=q_val, optimize=True)
-        else:
-            # PNG dengan kompresi
-            image_obj.save(path, "PNG", optimize=True, compress_level=6)
-        
-        return True
+        # Encode sesuai format & preset (metadata dibuang di encoder untuk privacy)
+        return encoder.encode(image_obj, fmt, preset=preset, quality=q_val).data
     except Exception as e:
         logger.error(f"❌ Save Failed: {e}")
-        return False
+        return None
 
-def pil_inpaint(image_pil, mask_pil, strength=5):
-    """Inpainting menggunakan PIL (fallback jika cv2 tidak tersedia)"""
+def ingest_image(contents: bytes, max_dimension: int = SERVER_MAX_DIMENSION) -> Image.Image:
+    """Decode upload langsung ke max_dimension (cek header, JPEG draft, orientasi EXIF)"""
     try:
-        # Convert ke array numpy
-        img_array = np.array(image_pil)
-        mask_array = np.array(mask_pil.convert('L'))  # Convert ke grayscale
-        
-        # Threshold mask
-        _, mask_binary = cv2.threshold(mask_array, 10, 255, cv2.THRESH_BINARY) if CV2_AVAILABLE else (None, mask_array > 10)
-        
-        if CV2_AVAILABLE:
-            # Use cv2 inpainting jika tersedia
-            kernel_size = max(3, int(min(img_array.shape[:2]) * 0.005) * strength)
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-            mask_dilated = cv2.dilate(mask_binary, kernel, iterations=2)
-            inpaint_radius = max(3, int(min(img_array.shape[:2]) * 0.01))
-            result = cv2.inpaint(img_array, mask_dilated, inpaint_radius, cv2.INPAINT_TELEA)
-            return Image.fromarray(result)
-        else:
-            # Fallback: simple blur/overpaint dengan PIL
-            logger.warning("⚠️ Menggunakan fallback inpainting (PIL)")
-            
-            # Buat copy image
-            result = image_pil.copy()
-            
-            # Dapatkan area yang perlu diinpaint
-            mask_data = mask_array > 10
-            
-            if mask_data.any():
-                # Untuk area kecil, gunakan blur
-                for i in range(strength):
-                    # Ambil region sekitar mask
-                    blurred = image_pil.filter(ImageFilter.GaussianBlur(radius=strength))
-                    # Composite hanya di area mask
-                    mask_img = Image.fromarray((mask_array * (255//(i+1))).astype(np.uint8))
-                    result = Image.composite(blurred, result, mask_img)
+        return load_image(contents, max_dimension, MAX_IMAGE_PIXELS)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def probe_upload(contents: bytes) -> ImageInfo:
+    """Format & dimensi dari header saja (untuk perkiraan biaya admission)"""
+    try:
+        return probe(contents, MAX_IMAGE_PIXELS)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def decode_image_job(contents: bytes) -> Image.Image:
+    """Decode upload + orientasi EXIF + resize (sync, dijalankan di inference pool)"""
+    return ingest_image(contents)
+
+def decode_hires_job(contents: bytes):
+    """Decode untuk resolution=full: (gambar resolusi penuh, salinan kecil untuk inference)"""
+    input_image = ingest_image(contents, HIRES_MAX_DIMENSION)
+    # Salinan kecil dari gambar hires (mask cache tetap dipakai bersama mode standard)
+    return input_image, initial_resize(input_image)
+
+def apply_mask(image: Image.Image, mask: Image.Image) -> Image.Image:
+    """Cutout RGBA dari mask (sama dengan naive_cutout di rembg)"""
+    empty = Image.new("RGBA", image.size, 0)
+    return Image.composite(image.convert("RGBA"), empty, mask)
+
+def finish_remove_bg_job(image: Image.Image, mask, quality: str, output_format: str, preset: str,
+                         mask_key=None, output_key=None, max_dimension=None) -> bytes:
+    """Cutout + encode hasil remove-bg (sync, dijalankan di inference pool).
+    max_dimension: batas sisi output (resolution=full), default dari quality"""
+    if isinstance(mask, bytes):
+        # Mask dari cache (PNG grayscale)
+        mask = Image.open(io.BytesIO(mask)).convert('L')
+    elif mask_key:
+        buffer = io.BytesIO()
+        mask.save(buffer, "PNG", compress_level=1)
+        result_cache.put(mask_key, buffer.getvalue())
+    
+    if mask.size != image.size:
+        # Mask dari inference resolusi rendah -> resolusi gambar, tepi mengikuti gambar asli
+        with stage("upsample"):
+            mask = guided_upsample(mask, image)
+    
+    output_image = apply_mask(image, mask)
+    data = encode_image_smart(
+        output_image, output_format, quality_mode=quality, preset=preset, max_dimension=max_dimension
+    )
+    if data is None:
+        raise RuntimeError("Encode gambar gagal")
+    if output_key:
+        result_cache.put(output_key, data)
+    return data
+
+def validate_upload(contents: bytes):
+    """Validasi ukuran & magic bytes file upload"""
+    # Validasi size
+    if len(contents) > MAX_REQUEST_SIZE:
+        raise HTTPException(status_code=413, detail=f"File terlalu besar. Maksimum {MAX_REQUEST_SIZE//1024//1024}MB")
+    
+    # Validasi tipe file
+    if not validate_image_header(contents):
+        raise HTTPException(status_code=400, detail="File gambar tidak valid")
+
+def check_output_format(output_format: str, preset: str, need_alpha: bool = False) -> str:
+    """Validasi format/preset output, 400 jika tidak valid"""
+    try:
+        return encoder.check_format(output_format, preset, need_alpha=need_alpha)
+    except EncoderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_resolution(resolution: str) -> str:
+    """standard = output max SERVER_MAX_DIMENSION, full = output seukuran gambar asli"""
+    if resolution not in RESOLUTION_MODES:
+        raise HTTPException(status_code=400, detail=f"resolution harus salah satu dari: {', '.join(RESOLUTION_MODES)}")
+    return resolution
+
+def check_response_mode(response_mode: str) -> str:
+    """url = simpan ke output store & return URL, inline = bytes langsung di response"""
+    if response_mode not in ("url", "inline"):
+        raise HTTPException(status_code=400, detail="response_mode harus 'url' atau 'inline'")
+    return response_mode
+
+def store_output(filename: str, data: bytes, media_type: str):
+    with stage("save"):
+        output_store.put(filename, data, media_type)
+
+async def deliver_output(data: bytes, filename: str, output_format: str, base_url: str,
+                         response_mode: str = "url", **extra):
+    """Kirim hasil: simpan ke output store (return URL) atau langsung sebagai body response"""
+    media_type = encoder.media_type_for(output_format)
+    if response_mode == "inline":
+        headers = {"X-Filename": filename, "Content-Disposition": f'inline; filename="{filename}"'}
+        headers.update({
+            "X-" + "-".join(part.capitalize() for part in k.split("_")): str(v) for k, v in extra.items()
+        })
+        return Response(content=data, media_type=media_type, headers=headers)
+    
+    if output_store.blocking:
+        await asyncio.to_thread(store_output, filename, data, media_type)
+    else:
+        store_output(filename, data, media_type)
+    return {
+        "url": f"{base_url}/outputs/{filename}",
+        "filename": filename,
+        **extra,
+        "format": output_format,
+        "size": len(data)
+    }
+
+async def remove_bg_to_output(contents: bytes, quality: str, base_url: str,
+                              output_format: str = "png", preset: str = "balanced",
+                              response_mode: str = "url", model_name: str = None,
+                              resolution: str = "standard"):
+    """Validasi + remove-bg + simpan ke output store, return info URL hasil (atau bytes inline)"""
+    validate_upload(contents)
+    output_format = check_output_format(output_format, preset, need_alpha=True)
+    resolution = check_resolution(resolution)
+    
+    filename = f"rbg_{uuid.uuid4().hex[:8]}{encoder.ext_for(output_format)}"
+    model_name = resolve_model(model_name)
+    data = await remove_bg_pipeline(contents, quality, output_format, preset, model_name, resolution)
+    return await deliver_output(
+        data, filename, output_format, base_url, response_mode,
+        quality=quality, model=model_name, resolution=resolution
+    )
+
+def remove_bg_keys(digest: str, model_name: str, max_dimension: int, quality: str,
+                   output_format: str, preset: str):
+    """Key cache (hasil, mask) remove-bg. Presisi = yang benar-benar termuat, bukan RMBG_PRECISION:
+    INT8 yang gagal & fallback ke FP32 tidak boleh berbagi cache dengan INT8 asli"""
+    precision = session_builder.loaded_precision(model_name)
+    return (
+        make_key("remove-bg", digest, model_name, precision, max_dimension, quality, output_format, preset),
+        make_key("mask", digest, model_name, precision, SERVER_MAX_DIMENSION),
+    )
+
+async def remove_bg_pipeline(contents: bytes, quality: str, output_format: str = "png",
+                             preset: str = "balanced", model_name: str = None,
+                             resolution: str = "standard") -> bytes:
+    """Decode -> mask (lewat micro-batcher) -> cutout + save, dengan cache hasil & mask.
+    
+    resolution=full: inference di salinan kecil, mask di-upsample ke resolusi asli.
+    """
+    digest = content_hash(contents)
+    model_name = model_name or session_pool.default_model
+    max_dimension = HIRES_MAX_DIMENSION if resolution == "full" else SERVER_MAX_DIMENSION
+    output_key, mask_key = remove_bg_keys(digest, model_name, max_dimension, quality, output_format, preset)
+    
+    # Cache hit: langsung pakai hasil encode sebelumnya, tanpa decode/inference
+    data = await cache_get(output_key)
+    if data is None:
+        operation = "remove-bg-full" if resolution == "full" else "remove-bg"
+        cost = estimate_cost(probe_upload(contents), operation, max_dimension, model_name)
+        async with admitted(cost):
+            if resolution == "full":
+                output_image, input_image = await run_inference(decode_hires_job, contents)
+            else:
+                input_image = output_image = await run_inference(decode_image_job, contents)
             
-            return result
+            # Mask tersimpan (mis. user ganti quality): skip inference
+            mask = await cache_get(mask_key)
+            if mask is None:
+                mask = await predict_mask(input_image, model_name)
+                # Model bisa baru dimuat di sini (dan jatuh ke FP32): simpan di bawah presisi sebenarnya
+                output_key, mask_key = remove_bg_keys(
+                    digest, model_name, max_dimension, quality, output_format, preset
+                )
+            else:
+                mask_key = None
+            del input_image
+            # resolution=full: output tetap di resolusi decode (tidak dikecilkan ke batas quality)
+            data = await run_inference(
+                finish_remove_bg_job, output_image, mask, quality, output_format, preset, mask_key, output_key,
+                max_dimension if resolution == "full" else None
+            )
+    
+    return data
+
+async def cache_get(key: str):
+    """Lookup result cache tanpa memblok event loop (bisa baca dari disk)"""
+    return await asyncio.to_thread(result_cache.get, key)
+
+def probe_b64_image(base64_str: str, prefix_bytes: int = 96 * 1024) -> ImageInfo:
+    """Dimensi gambar base64 dari potongan awal saja (header PNG/JPEG + EXIF muat di sini)"""
+    if ',' in base64_str[:256]:
+        base64_str = base64_str.split(',', 1)[1]
+    chars = prefix_bytes // 3 * 4
+    try:
+        return probe(base64.b64decode(base64_str[:chars]), MAX_IMAGE_PIXELS)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception:
+        # Header tidak terbaca dari potongan awal: anggap gambar kerja ukuran maksimum
+        return ImageInfo(None, SERVER_MAX_DIMENSION, SERVER_MAX_DIMENSION, 1)
+
+def decode_b64(base64_str: str) -> bytes:
+    """Decode base64 (boleh data URL) ke bytes mentah"""
+    try:
+        # Handle data URL jika ada
+        if ',' in base64_str:
+            base64_str = base64_str.split(',')[1]
+        
+        return base64.b64decode(base64_str)
     except Exception as e:
-        logger.error(f"❌ Inpainting error: {e}")
+        logger.error(f"❌ Decode error: {e}")
+        raise HTTPException(status_code=400, detail="Format base64 tidak valid")
+
+def erase_object_job(decode_inputs, strength: int, detail: int, quality: str,
+                     output_format: str = "jpeg", preset: str = "balanced", output_key=None,
+                     parse_path: str = None, payload_bytes: int = 0) -> bytes:
+    """Pipeline magic eraser (sync, dijalankan di inference pool).
+    
+    decode_inputs() -> (gambar, mask): decode payload di sini, bukan di event loop.
+    """
+    start = time.perf_counter()
+    try:
+        original_img, mask_img = decode_inputs()
+        mask_img = mask_img.convert('L')  # Convert ke grayscale
+    except MaskFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
         raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="Gambar / mask tidak bisa dibaca")
+    if parse_path:
+        parse_stats.record(parse_path, payload_bytes, (time.perf_counter() - start) * 1000)
+    
+    # Gambar sudah di-resize saat ingest, mask disamakan ukurannya
+    mask_img = mask_img.resize(original_img.size, Image.NEAREST)
+    
+    # Inpainting + sharpen hanya di region mask (bukan seluruh gambar)
+    with stage("inpaint"):
+        result = erase_regions(
+            original_img, mask_img, strength=strength, detail=detail,
+            executor=erase_region_executor, inpaint_preset=INPAINT_PRESET
+        )
+    
+    # Encode result
+    data = encode_image_smart(result, output_format, quality_mode=quality, preset=preset)
+    if data is None:
+        raise RuntimeError("Encode gambar gagal")
+    if output_key:
+        result_cache.put(output_key, data)
+    return data
+
+def server_busy_error(retry_after: int = 5) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server sedang sibuk. Coba lagi beberapa detik lagi.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+@asynccontextmanager
+async def admitted(cost: int):
+    """Jalankan blok setelah dapat budget memori (admission control), 503 jika tidak dapat"""
+    try:
+        ticket = await admission.acquire(cost)
+    except AdmissionRejected as e:
+        logger.warning(f"⚠️ Admission ditolak ({e}), butuh ~{cost / 1024 / 1024:.0f}MB")
+        raise server_busy_error(e.retry_after)
+    async with admission.holding(ticket):
+        yield
+
+async def run_inference(fn, *args):
+    """Jalankan job di inference pool, tolak dengan 503 kalau antrian penuh"""
+    ticket = current_ticket.get()
+    if ticket is not None:
+        # Budget admission ditahan sampai job selesai, walau request-nya dibatalkan
+        fn = ticket.wrap(fn)
+    try:
+        return await inference_executor.run(fn, *args)
+    except InferenceQueueFull:
+        raise server_busy_error()
+
+def resolve_model(model: Optional[str]) -> str:
+    """Validasi nama model dari request (None = model default)"""
+    try:
+        return session_pool.resolve(model)
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def predict_mask(image: Image.Image, model_name: str = None) -> Image.Image:
+    """Mask alpha via micro-batcher model tsb (beberapa request digabung jadi satu batch)"""
+    try:
+        entry = await session_pool.acquire(model_name)
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Gagal load model {model_name}: {e}")
+        raise HTTPException(status_code=503, detail="Model AI belum siap. Silakan coba beberapa saat lagi.")
+    try:
+        # Tiket admission ikut ke batch: budget ditahan sampai inference selesai
+        return await entry.batcher.predict(image, current_ticket.get())
+    except InferenceQueueFull:
+        raise server_busy_error()
 
 def format_bytes(size):
     """Format bytes ke readable format"""
@@ -327,9 +807,10 @@ async def read_root():
     return {
         "status": "Azura Engine v3.2 Ready 🚀",
         "model": "railway-optimized",
-        "cv2_available": CV2_AVAILABLE,
+        "cv2_available": cv2_available(),
+        "inpaint_engine": "opencv-telea" if cv2_available() else f"numpy-{INPAINT_PRESET}",
         "uptime_seconds": int(uptime),
-        "memory_usage": format_bytes(gc.get_stats()[0]['collected']),
+        "memory_usage": format_bytes(process_rss_bytes()),
         "message": "Backend berjalan di Railway Free Tier"
     }
 
@@ -339,59 +820,167 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "model_loaded": rembg_session is not None
+        "ready": startup.ready,
+        "model_loaded": session_pool.is_loaded()
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: proses hidup & event loop merespons (tidak menunggu model)"""
+    return {"status": "alive", "uptime_seconds": int(time.time() - app_start_time)}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: 503 sampai model di-load & warmup selesai"""
+    model_loaded = session_pool.is_loaded()
+    if not startup.ready:
+        status_code, status = 503, "starting"
+    else:
+        # Model gagal di-load: tetap ready (endpoint non-AI jalan), tapi degraded
+        status_code, status = 200, "ready" if model_loaded else "degraded"
+    return JSONResponse(status_code=status_code, content={
+        "status": status,
+        "model": session_pool.default_model,
+        "model_loaded": model_loaded,
+        "startup": startup.snapshot()
+    })
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Metrik format Prometheus (latency per stage & endpoint, queue depth, RSS)"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/stats")
+async def stats_endpoint():
+    """Statistik runtime (antrian inference, dll)"""
+    return {
+        "inference": inference_executor.stats(),
+        "models": session_pool.stats(),
+        "cache": result_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "output_store": output_store.stats(),
+        "janitor": output_janitor.stats(),
+        "video_jobs": video_jobs.stats(),
+        "video_info_cache": {**video_info_cache.stats(), **video_info_flight.stats()},
+        "encoder": {
+            "formats": encoder.supported_formats(),
+            "stats": encoder.encoder_stats.snapshot()
+        },
+        "erase_parsing": parse_stats.snapshot(),
+        "ingest": ingest_stats.snapshot(),
+        "erase_sessions": edit_sessions.stats(),
+        "upscale": upscale_stats.snapshot(),
+        "admission": admission.stats(),
+        "model_runtime": session_builder.stats(),
+        "startup": startup.snapshot()
+    }
+
+# 0. OUTPUT FILES (ganti StaticFiles: support memory store, ETag & Range)
+@app.api_route("/outputs/{name}", methods=["GET", "HEAD"])
+async def serve_output(request: Request, name: str):
+    """Ambil file hasil dari output store (HEAD: header saja, seperti StaticFiles)"""
+    if not is_safe_name(name):
+        raise HTTPException(status_code=404, detail="File tidak ditemukan")
+    
+    obj = output_store.get(name)
+    if obj is None and output_store is not disk_outputs:
+        # File video & hasil lama tetap ada di folder outputs/
+        obj = disk_outputs.get(name)
+    if obj is None:
+        raise HTTPException(status_code=404, detail="File tidak ditemukan")
+    response = stored_object_response(request, obj)
+    if request.method == "HEAD":
+        # Content-Length tetap ukuran file / range, body tidak dibaca dari store
+        return Response(status_code=response.status_code, headers=dict(response.headers))
+    return response
+
+def parse_range_header(range_header: str, size: int):
+    """Parse header Range (single range). Return (start, end) atau None jika diabaikan"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        # Multi-range tidak didukung: kirim file utuh (diizinkan RFC 9110)
+        return None
+    start_str, _, end_str = range_header[6:].strip().partition("-")
+    try:
+        if start_str == "":
+            # bytes=-N  -> N byte terakhir
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError
+            if size == 0:
+                raise HTTPException(status_code=416, detail="Range tidak valid", headers={"Content-Range": "bytes */0"})
+            return max(0, size - length), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise HTTPException(
+            status_code=416,
+            detail="Range tidak valid",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+def stored_object_response(request: Request, obj, download_name: str = None):
+    """Response untuk StoredObject: 304 jika ETag cocok, 206 untuk Range, selain itu 200"""
+    headers = {
+        "ETag": obj.etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=900",
+    }
+    if download_name:
+        headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and obj.etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == obj.etag:
+        byte_range = parse_range_header(request.headers.get("range"), obj.size)
+    
+    if byte_range is None:
+        headers["Content-Length"] = str(obj.size)
+        if obj.data is not None:
+            return Response(content=obj.data, media_type=obj.media_type, headers=headers)
+        return StreamingResponse(obj.read_range(0, obj.size - 1), media_type=obj.media_type, headers=headers)
+    
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{obj.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        obj.read_range(start, end), status_code=206, media_type=obj.media_type, headers=headers
+    )
+
 # 1. REMOVE BG
 @app.post("/api/remove-bg")
 async def remove_bg_endpoint(
     request: Request, 
-    background_tasks: BackgroundTasks, 
     file: UploadFile = File(...), 
-    quality: str = Form("Medium")
+    quality: str = Form("Medium"),
+    output_format: str = Form("png"),
+    preset: str = Form("balanced"),
+    response_mode: str = Form("url"),
+    model: Optional[str] = Form(None),
+    resolution: str = Form("standard")
 ):
     """Remove background dari gambar"""
-    if not check_rate_limit(request.client.host):
-        raise HTTPException(status_code=429, detail="Terlalu banyak request. Coba lagi nanti.")
-    
-    if rembg_session is None:
-        raise HTTPException(status_code=503, detail="Model AI belum siap. Silakan coba beberapa saat lagi.")
+    check_rate_limit(request, "inference")
+    check_response_mode(response_mode)
+    model_name = resolve_model(model)
     
     try:
         # Baca file
         contents = await file.read()
         
-        # Validasi size
-        if len(contents) > MAX_REQUEST_SIZE:
-            raise HTTPException(status_code=413, detail=f"File terlalu besar. Maksimum {MAX_REQUEST_SIZE//1024//1024}MB")
-        
-        # Validasi tipe file
-        if not validate_image_header(contents):
-            raise HTTPException(status_code=400, detail="File gambar tidak valid")
-        
-        # Process image
-        input_image = Image.open(io.BytesIO(contents))
-        input_image = ImageOps.exif_transpose(input_image)
-        input_image = initial_resize(input_image)
-        
-        # AI Process
-        output_image = remove(input_image, session=rembg_session)
-        
-        # Save result
-        filename = f"rbg_{uuid.uuid4().hex[:8]}.png"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        save_image_smart(output_image, output_path, quality_mode=quality, is_cv2=False)
-        
-        # Schedule cleanup
-        background_tasks.add_task(cleanup_resources)
-        
-        # Return URL
+        # Process image (decode + AI + save) di inference pool, bukan di event loop
         base_url = str(request.base_url).rstrip("/")
-        return {
-            "url": f"{base_url}/outputs/{filename}",
-            "filename": filename,
-            "quality": quality
-        }
+        result = await remove_bg_to_output(
+            contents, quality, base_url, output_format, preset, response_mode, model_name, resolution
+        )
+        
+        return result
         
     except HTTPException:
         raise
@@ -399,63 +988,195 @@ async def remove_bg_endpoint(
         logger.error(f"❌ Error Remove BG: {e}")
         raise HTTPException(status_code=500, detail=f"Gagal memproses gambar: {str(e)}")
 
+# 1b. REMOVE BG BATCH (multi-file, hasil di-stream per gambar)
+@app.post("/api/remove-bg/batch")
+async def remove_bg_batch_endpoint(
+    request: Request, 
+    images: List[UploadFile] = File(...), 
+    quality: str = Form("Medium"),
+    output_format: str = Form("png"),
+    preset: str = Form("balanced"),
+    model: Optional[str] = Form(None),
+    resolution: str = Form("standard")
+):
+    """Remove background banyak gambar sekaligus, hasil NDJSON (satu baris per gambar)"""
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Terlalu banyak gambar. Maksimum {MAX_BATCH_IMAGES} per request")
+    burst = rate_limiter.limiters["inference"].burst
+    if len(images) > burst:
+        raise HTTPException(status_code=400, detail=f"Terlalu banyak gambar. Maksimum {burst} per request")
+    # Satu token per gambar: batch tidak bisa dipakai melewati limit inference
+    check_rate_limit(request, "inference", len(images))
+    model_name = resolve_model(model)
+    check_resolution(resolution)
+    
+    check_output_format(output_format, preset, need_alpha=True)
+    
+    # Ukuran dari parser multipart (file sudah di-spool ke disk), dicek sebelum dibaca ke RAM
+    if sum(upload.size or 0 for upload in images) > MAX_BATCH_BYTES:
+        raise HTTPException(status_code=413, detail=f"Total file terlalu besar. Maksimum {MAX_BATCH_BYTES // 1024 // 1024}MB per batch")
+    
+    # Baca semua file dulu (UploadFile tidak bisa dibaca lagi setelah response mulai).
+    # Per file maksimal MAX_REQUEST_SIZE + 1 byte: file yang lebih besar ditolak validate_upload
+    uploads = []
+    total = 0
+    for upload in images:
+        contents = await upload.read(MAX_REQUEST_SIZE + 1)
+        total += len(contents)
+        if total > MAX_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail=f"Total file terlalu besar. Maksimum {MAX_BATCH_BYTES // 1024 // 1024}MB per batch")
+        uploads.append((upload.filename, contents))
+    base_url = str(request.base_url).rstrip("/")
+    
+    # Batasi gambar yang diproses bersamaan agar satu batch tidak memenuhi antrian inference
+    concurrency = asyncio.Semaphore(max(1, min(BATCH_MAX_SIZE, INFERENCE_QUEUE_SIZE)))
+    
+    async def process_one(index, original, contents):
+        try:
+            async with concurrency:
+                result = await remove_bg_to_output(
+                    contents, quality, base_url, output_format, preset,
+                    model_name=model_name, resolution=resolution
+                )
+            return {"index": index, "original": original, **result}
+        except HTTPException as e:
+            return {"index": index, "original": original, "error": e.detail, "status": e.status_code}
+        except Exception as e:
+            logger.error(f"❌ Error Remove BG batch ({original}): {e}")
+            return {"index": index, "original": original, "error": f"Gagal memproses gambar: {str(e)}", "status": 500}
+    
+    async def stream_results():
+        # Semua gambar jalan bareng (micro-batcher menggabungkan inference-nya),
+        # tiap hasil langsung dikirim begitu selesai
+        tasks = [
+            asyncio.ensure_future(process_one(i, original, contents))
+            for i, (original, contents) in enumerate(uploads)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # Client putus di tengah jalan: batalkan sisa pekerjaan
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson"
+    )
+
 # 2. MAGIC ERASER
+async def erase_to_output(request: Request, input_keys, image_info: ImageInfo, decode_inputs,
+                          parse_path: str, strength: int, detail: int, quality: str,
+                          output_format: str, preset: str, response_mode: str,
+                          mask_info: ImageInfo = None):
+    """Cache lookup -> decode + inpaint + encode di inference pool -> output store.
+
+    mask_info: header mask PNG (kalau ada) -> memori decode mask ikut dihitung admission.
+    """
+    output_format = check_output_format(output_format, preset)
+    filename = f"magic_{uuid.uuid4().hex[:8]}{encoder.ext_for(output_format)}"
+    
+    # Cache hit: request identik (gambar + mask + parameter) tidak diproses ulang
+    output_key = make_key(
+        "erase", *input_keys,
+        strength, detail, quality, output_format, preset, SERVER_MAX_DIMENSION,
+        "opencv" if cv2_available() else INPAINT_PRESET
+    )
+    result_bytes = await cache_get(output_key)
+    if result_bytes is None:
+        # Decode + inpainting + encode di inference pool
+        cost = estimate_cost(image_info, "erase", SERVER_MAX_DIMENSION)
+        if mask_info is not None:
+            # Mask di-decode penuh sebelum di-resize ke ukuran gambar
+            cost += decode_bytes(mask_info, SERVER_MAX_DIMENSION)
+        async with admitted(cost):
+            result_bytes = await run_inference(
+                erase_object_job, decode_inputs,
+                strength, detail, quality, output_format, preset, output_key,
+                parse_path, int(request.headers.get("content-length") or 0)
+            )
+    
+    # Return URL (atau bytes langsung)
+    base_url = str(request.base_url).rstrip("/")
+    return await deliver_output(
+        result_bytes, filename, output_format, base_url, response_mode, quality=quality
+    )
+
 @app.post("/api/erase-object")
 async def erase_object_endpoint(
     request: Request, 
-    background_tasks: BackgroundTasks, 
     data: EraseRequest
 ):
     """Hapus object dari gambar"""
-    if not check_rate_limit(request.client.host):
-        raise HTTPException(status_code=429, detail="Terlalu banyak request. Coba lagi nanti.")
+    check_rate_limit(request, "inference")
+    check_response_mode(data.response_mode)
     
     try:
-        # Decode Base64 image dan mask
-        def decode_b64_image(base64_str):
-            """Decode base64 image"""
-            try:
-                # Handle data URL jika ada
-                if ',' in base64_str:
-                    base64_str = base64_str.split(',')[1]
-                
-                image_data = base64.b64decode(base64_str)
-                return Image.open(io.BytesIO(image_data))
-            except Exception as e:
-                logger.error(f"❌ Decode error: {e}")
-                raise HTTPException(status_code=400, detail="Format base64 tidak valid")
-        
-        # Decode images
-        original_img = decode_b64_image(data.image)
-        mask_img = decode_b64_image(data.mask).convert('L')  # Convert ke grayscale
-        
-        # Resize jika perlu
-        original_img = initial_resize(original_img)
-        mask_img = mask_img.resize(original_img.size, Image.NEAREST)
-        
-        # Lakukan inpainting
-        result = pil_inpaint(original_img, mask_img, strength=data.strength)
-        
-        # Apply sharpness jika detail > 0
-        if data.detail > 0:
-            for _ in range(data.detail):
-                result = result.filter(ImageFilter.SHARPEN)
-        
-        # Save result
-        filename = f"magic_{uuid.uuid4().hex[:8]}.jpg"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        save_image_smart(result, output_path, quality_mode=data.quality, is_cv2=False)
+        return await erase_to_output(
+            request,
+            (content_hash(data.image), content_hash(data.mask)),
+            probe_b64_image(data.image),
+            lambda: (ingest_image(decode_b64(data.image)), decode_mask("png", decode_b64(data.mask))),
+            "json-base64",
+            data.strength, data.detail, data.quality, data.format, data.preset, data.response_mode,
+            mask_info=probe_b64_image(data.mask)
+        )
         
-        # Schedule cleanup
-        background_tasks.add_task(cleanup_resources)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error Eraser: {e}")
+        raise HTTPException(status_code=500, detail=f"Gagal menghapus object: {str(e)}")
+
+async def read_mask_fields(mask: Optional[UploadFile], mask_rle: Optional[str], strokes: Optional[str]):
+    """Field mask multipart -> (jenis, payload). Tepat satu yang boleh diisi"""
+    masks_given = [(kind, value) for kind, value in zip(MASK_KINDS, (mask, mask_rle, strokes)) if value]
+    if len(masks_given) != 1:
+        raise HTTPException(status_code=400, detail="Kirim tepat satu mask: mask (file), mask_rle, atau strokes")
+    mask_kind, mask_payload = masks_given[0]
+    if mask_kind == "png":
+        mask_payload = await mask_payload.read()
+        if len(mask_payload) > MAX_REQUEST_SIZE:
+            raise HTTPException(status_code=413, detail="File mask terlalu besar")
+    return mask_kind, mask_payload
+
+@app.post("/api/erase-object/upload")
+async def erase_object_upload_endpoint(
+    request: Request,
+    image: UploadFile = File(...),
+    mask: Optional[UploadFile] = File(None),
+    mask_rle: Optional[str] = Form(None),
+    strokes: Optional[str] = Form(None),
+    strength: int = Form(5),
+    detail: int = Form(2),
+    quality: str = Form("Medium"),
+    output_format: str = Form("jpeg"),
+    preset: str = Form("balanced"),
+    response_mode: str = Form("url")
+):
+    """Hapus object, versi multipart: gambar sebagai file biner, mask ringkas.
+    
+    Mask dikirim salah satu dari: file PNG (boleh 1-bit), mask_rle ("WxH:n0,n1,...")
+    atau strokes (JSON polyline), dirasterisasi di server.
+    """
+    check_rate_limit(request, "inference")
+    check_response_mode(response_mode)
+    
+    try:
+        contents = await image.read()
+        validate_upload(contents)
+        mask_kind, mask_payload = await read_mask_fields(mask, mask_rle, strokes)
         
-        # Return URL
-        base_url = str(request.base_url).rstrip("/")
-        return {
-            "url": f"{base_url}/outputs/{filename}",
-            "filename": filename,
-            "quality": data.quality
-        }
+        return await erase_to_output(
+            request,
+            (content_hash(contents), mask_kind, content_hash(mask_payload)),
+            probe_upload(contents),
+            lambda: (ingest_image(contents), decode_mask(mask_kind, mask_payload)),
+            f"multipart-{mask_kind}",
+            strength, detail, quality, output_format, preset, response_mode,
+            mask_info=probe_upload(mask_payload) if mask_kind == "png" else None
+        )
         
     except HTTPException:
         raise
@@ -463,12 +1184,238 @@ async def erase_object_endpoint(
         logger.error(f"❌ Error Eraser: {e}")
         raise HTTPException(status_code=500, detail=f"Gagal menghapus object: {str(e)}")
 
+# 2b. MAGIC ERASER: SESI EDIT (upload sekali, lalu kirim stroke baru saja)
+def decode_session_image_job(contents: bytes) -> Image.Image:
+    image = normalize_mode(decode_image_job(contents))
+    image.load()
+    return image
+
+def encode_session_image(session, quality: str, output_format: str, preset: str) -> bytes:
+    data = encode_image_smart(session.image, output_format, quality_mode=quality, preset=preset)
+    if data is None:
+        raise RuntimeError("Encode gambar gagal")
+    return data
+
+def apply_stroke_job(session, mask_kind: str, mask_payload, strength: int, detail: int,
+                     quality: str, output_format: str, preset: str):
+    """Inpaint hanya region stroke baru di gambar kerja sesi (sync, di inference pool)"""
+    try:
+        mask_img = decode_mask(mask_kind, mask_payload)
+    except MaskFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with session.lock:
+        with stage("inpaint"):
+            patches = erase_patches(
+                session.image, mask_img, strength=strength, detail=detail,
+                executor=erase_region_executor, inpaint_preset=INPAINT_PRESET
+            )
+        if patches:
+            # Undo cukup menyimpan isi region sebelum ditimpa
+            previous = [(box, session.image.crop(box)) for box, _, _ in patches]
+            paste_patches(session.image, patches)
+            edit_sessions.push_history(session, previous)
+        return encode_session_image(session, quality, output_format, preset), session.snapshot()
+
+def undo_stroke_job(session, quality: str, output_format: str, preset: str):
+    """Kembalikan region stroke terakhir. None jika history kosong"""
+    with session.lock:
+        previous = edit_sessions.pop_history(session)
+        if previous is None:
+            return None
+        for (x0, y0, _, _), patch in reversed(previous):
+            session.image.paste(patch, (x0, y0))
+        return encode_session_image(session, quality, output_format, preset), session.snapshot()
+
+def get_edit_session_or_404(session_id: str):
+    session = edit_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesi edit tidak ditemukan atau sudah kedaluwarsa")
+    return session
+
+async def deliver_session_output(request: Request, result, output_format: str,
+                                 response_mode: str, quality: str):
+    data, snapshot = result
+    filename = f"magic_{uuid.uuid4().hex[:8]}{encoder.ext_for(output_format)}"
+    base_url = str(request.base_url).rstrip("/")
+    return await deliver_output(
+        data, filename, output_format, base_url, response_mode, quality=quality,
+        session_id=snapshot["session_id"], version=snapshot["version"], undo_steps=snapshot["undo_steps"]
+    )
+
+@app.post("/api/erase-sessions")
+async def create_erase_session_endpoint(request: Request, image: UploadFile = File(...)):
+    """Buat sesi edit: gambar di-decode & disimpan di server, return session_id"""
+    check_rate_limit(request, "inference")
+    contents = await image.read()
+    validate_upload(contents)
+    cost = estimate_cost(probe_upload(contents), "edit-session", SERVER_MAX_DIMENSION)
+    try:
+        async with admitted(cost):
+            working_image = await run_inference(decode_session_image_job, contents)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=400, detail="File gambar tidak valid")
+    try:
+        session = edit_sessions.create(working_image)
+    except EditSessionError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {**session.snapshot(), "expires_in": EDIT_SESSION_TTL_SECONDS}
+
+@app.get("/api/erase-sessions/{session_id}")
+async def get_erase_session_endpoint(session_id: str):
+    return get_edit_session_or_404(session_id).snapshot()
+
+@app.delete("/api/erase-sessions/{session_id}")
+async def delete_erase_session_endpoint(session_id: str):
+    if not edit_sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Sesi edit tidak ditemukan atau sudah kedaluwarsa")
+    return {"session_id": session_id, "deleted": True}
+
+@app.post("/api/erase-sessions/{session_id}/strokes")
+async def erase_session_stroke_endpoint(
+    request: Request,
+    session_id: str,
+    mask: Optional[UploadFile] = File(None),
+    mask_rle: Optional[str] = Form(None),
+    strokes: Optional[str] = Form(None),
+    strength: int = Form(5),
+    detail: int = Form(2),
+    quality: str = Form("Medium"),
+    output_format: str = Form("jpeg"),
+    preset: str = Form("balanced"),
+    response_mode: str = Form("url")
+):
+    """Terapkan stroke baru ke gambar kerja sesi (mask sama seperti /api/erase-object/upload)"""
+    check_rate_limit(request, "inference")
+    check_response_mode(response_mode)
+    output_format = check_output_format(output_format, preset)
+    session = get_edit_session_or_404(session_id)
+    mask_kind, mask_payload = await read_mask_fields(mask, mask_rle, strokes)
+    
+    async with admitted(work_cost(*session.image.size, "edit-stroke")):
+        result = await run_inference(
+            apply_stroke_job, session, mask_kind, mask_payload,
+            strength, detail, quality, output_format, preset
+        )
+    return await deliver_session_output(request, result, output_format, response_mode, quality)
+
+@app.post("/api/erase-sessions/{session_id}/undo")
+async def erase_session_undo_endpoint(
+    request: Request,
+    session_id: str,
+    quality: str = Form("Medium"),
+    output_format: str = Form("jpeg"),
+    preset: str = Form("balanced"),
+    response_mode: str = Form("url")
+):
+    """Batalkan stroke terakhir"""
+    check_rate_limit(request, "inference")
+    check_response_mode(response_mode)
+    output_format = check_output_format(output_format, preset)
+    session = get_edit_session_or_404(session_id)
+    
+    async with admitted(work_cost(*session.image.size, "edit-undo")):
+        result = await run_inference(undo_stroke_job, session, quality, output_format, preset)
+    if result is None:
+        raise HTTPException(status_code=409, detail="Tidak ada langkah untuk di-undo")
+    return await deliver_session_output(request, result, output_format, response_mode, quality)
+
+# 2c. SMART UPSCALER (2x/4x, tile paralel + PNG streaming)
+def check_upscale_size(info: ImageInfo, scale: int):
+    """413 jika hasil upscale melebihi UPSCALE_MAX_OUTPUT_PIXELS"""
+    if info.width * info.height * scale * scale > UPSCALE_MAX_OUTPUT_PIXELS:
+        max_input = int((UPSCALE_MAX_OUTPUT_PIXELS / scale / scale) ** 0.5)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Gambar terlalu besar untuk upscale {scale}x. Maksimum sekitar {max_input}x{max_input} pixel"
+        )
+
+async def release_admission(ticket):
+    admission.release(ticket)
+
+def write_upscale_job(filename: str, chunks):
+    """Tulis PNG hasil upscale per chunk ke folder outputs (selalu disk: bisa ratusan MB)"""
+    with stage("save"):
+        return disk_outputs.put_stream(filename, chunks, "image/png")
+
+@app.post("/api/upscale")
+async def upscale_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    scale: int = Form(4),
+    sharpen: int = Form(80),
+    preset: str = Form("fast"),
+    response_mode: str = Form("url")
+):
+    """Upscale 2x/4x (Lanczos + unsharp mask). Output selalu PNG, di-encode bertahap:
+    inline = langsung di-stream ke client, url = ditulis ke outputs/ lalu return URL"""
+    check_rate_limit(request, "inference")
+    check_response_mode(response_mode)
+    check_output_format("png", preset)
+    if scale not in SCALES:
+        raise HTTPException(status_code=400, detail=f"scale harus salah satu dari: {', '.join(map(str, SCALES))}")
+    if not 0 <= sharpen <= 300:
+        raise HTTPException(status_code=400, detail="sharpen harus 0-300")
+    
+    contents = await file.read()
+    validate_upload(contents)
+    info = probe_upload(contents)
+    check_upscale_size(info, scale)
+    source_dimension = max(info.width, info.height)
+    cost = decode_bytes(info, source_dimension) + memory_estimate(info.width, info.height, scale, tile=UPSCALE_TILE_SIZE)
+    params = UpscaleParams(scale=scale, sharpen=sharpen, tile=UPSCALE_TILE_SIZE)
+    filename = f"upscale_{uuid.uuid4().hex[:8]}.png"
+    
+    if response_mode == "inline":
+        # Budget admission dipegang sampai stream selesai / client putus (background task),
+        # bukan hanya selama fungsi endpoint ini
+        try:
+            ticket = await admission.acquire(cost)
+        except AdmissionRejected as e:
+            logger.warning(f"⚠️ Admission ditolak ({e}), butuh ~{cost / 1024 / 1024:.0f}MB")
+            raise server_busy_error(e.retry_after)
+        try:
+            image = await asyncio.to_thread(ticket.wrap(ingest_image), contents, source_dimension)
+        except BaseException:
+            admission.release(ticket)
+            raise
+        width, height = image.width * scale, image.height * scale
+        return StreamingResponse(
+            upscale_png_stream(image, params, upscale_executor, preset, wrap=ticket.wrap),
+            media_type="image/png",
+            headers={
+                "X-Filename": filename,
+                "Content-Disposition": f'inline; filename="{filename}"',
+                "X-Scale": str(scale),
+                "X-Width": str(width),
+                "X-Height": str(height),
+            },
+            background=BackgroundTask(release_admission, ticket)
+        )
+    
+    async with admitted(cost):
+        wrap = current_ticket.get().wrap
+        image = await asyncio.to_thread(wrap(ingest_image), contents, source_dimension)
+        chunks = upscale_png_stream(image, params, upscale_executor, preset, wrap=wrap)
+        obj = await asyncio.to_thread(wrap(write_upscale_job), filename, chunks)
+    
+    base_url = str(request.base_url).rstrip("/")
+    return {
+        "url": f"{base_url}/outputs/{filename}",
+        "filename": filename,
+        "scale": scale,
+        "width": image.width * scale,
+        "height": image.height * scale,
+        "format": "png",
+        "size": obj.size
+    }
+
 # 3. VIDEO INFO
 @app.post("/api/video-info")
 async def video_info_endpoint(request: Request, data: VideoRequest):
     """Get info video dari URL"""
-    if not check_rate_limit(request.client.host):
-        raise HTTPException(status_code=429, detail="Terlalu banyak request. Coba lagi nanti.")
+    check_rate_limit(request, "metadata")
     
     # Domain whitelist
     allowed_domains = ['youtube.com', 'youtu.be', 'tiktok.com', 'instagram.com']
@@ -484,147 +1431,245 @@ async def video_info_endpoint(request: Request, data: VideoRequest):
     except Exception as e:
         logger.warning(f"⚠️ URL parsing error: {e}")
     
+    # Cache per URL ternormalisasi (link viral = banyak request URL yang sama)
+    cache_key = normalize_video_url(data.url)
+    cached = video_info_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'noplaylist': True,
-            'extract_flat': False
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(data.url, download=False)
-            
-            formats_list = []
-            
-            # Tambahkan audio option
-            formats_list.append({
-                "format_id": "mp3",
-                "resolution": "Audio MP3",
-                "ext": "mp3",
-                "size": "~3-5MB",
-                "note": "Audio berkualitas tinggi"
-            })
-            
-            # Tambahkan format video
-            seen_res = set()
-            if 'formats' in info:
-                for f in info['formats']:
-                    if f.get('vcodec') != 'none':  # Hanya format dengan video
-                        res = f"{f.get('height') or 'N/A'}p"
-                        ext = f.get('ext', 'mp4')
-                        
-                        if res not in seen_res and ext in ['mp4', 'webm']:
-                            filesize = f.get('filesize') or f.get('filesize_approx')
-                            size_str = format_bytes(filesize) if filesize else "~50MB"
-                            
-                            formats_list.append({
-                                "format_id": f.get('format_id', 'best'),
-                                "resolution": res,
-                                "ext": ext,
-                                "size": size_str,
-                                "note": f.get('format_note', '')
-                            })
-                            seen_res.add(res)
-            
-            return {
-                "title": info.get('title', 'Unknown'),
-                "thumbnail": info.get('thumbnail'),
-                "duration": info.get('duration_string', 'N/A'),
-                "source": info.get('extractor_key', 'Unknown'),
-                "formats": formats_list[:10]  # Batasi ke 10 format
-            }
-            
+        # Request bersamaan untuk URL yang sama cukup satu ekstraksi (di thread, bukan event loop)
+        result = await video_info_flight.do(cache_key, lambda: fetch_video_info(data.url))
     except Exception as e:
         logger.error(f"❌ Error Video Info: {e}")
         raise HTTPException(status_code=400, detail="Gagal mengambil info video. Pastikan URL valid.")
+    
+    video_info_cache.put(cache_key, result)
+    return result
+
+async def fetch_video_info(url: str) -> dict:
+    """Ekstraksi metadata via yt-dlp di thread, lalu ringkas jadi response API"""
+    info = await asyncio.to_thread(extract_video_info, url, video_jobs.ydl_factory)
+    
+    formats_list = []
+    
+    # Tambahkan audio option
+    formats_list.append({
+        "format_id": "mp3",
+        "resolution": "Audio MP3",
+        "ext": "mp3",
+        "size": "~3-5MB",
+        "note": "Audio berkualitas tinggi"
+    })
+    
+    # Tambahkan format video
+    seen_res = set()
+    if 'formats' in info:
+        for f in info['formats']:
+            if f.get('vcodec') != 'none':  # Hanya format dengan video
+                res = f"{f.get('height') or 'N/A'}p"
+                ext = f.get('ext', 'mp4')
+                
+                if res not in seen_res and ext in ['mp4', 'webm']:
+                    filesize = f.get('filesize') or f.get('filesize_approx')
+                    size_str = format_bytes(filesize) if filesize else "~50MB"
+                    
+                    formats_list.append({
+                        "format_id": f.get('format_id', 'best'),
+                        "resolution": res,
+                        "ext": ext,
+                        "size": size_str,
+                        "note": f.get('format_note', '')
+                    })
+                    seen_res.add(res)
+    
+    return {
+        "title": info.get('title', 'Unknown'),
+        "thumbnail": info.get('thumbnail'),
+        "duration": info.get('duration_string', 'N/A'),
+        "source": info.get('extractor_key', 'Unknown'),
+        "formats": formats_list[:10]  # Batasi ke 10 format
+    }
 
 # 4. VIDEO DOWNLOAD
 @app.post("/api/video-download")
 async def video_download_endpoint(
     request: Request, 
-    background_tasks: BackgroundTasks, 
     data: DownloadRequest
 ):
-    """Download video dari URL"""
-    if not check_rate_limit(request.client.host):
-        raise HTTPException(status_code=429, detail="Terlalu banyak request. Coba lagi nanti.")
+    """Download video dari URL.
+
+    stream=false: menunggu job selesai, lalu kirim file (support Range / resume).
+    stream=true: bytes diteruskan ke client selagi diterima dari sumber. Format yang
+    butuh merge / konversi (mp3) dan klip otomatis kembali ke mode menunggu.
+    start/end (detik): hanya segmen itu yang di-download & dipotong di keyframe.
+    """
+    check_rate_limit(request, "video")
     
-    filename = f"dl_{uuid.uuid4().hex[:8]}"
-    output_template = os.path.join(OUTPUT_FOLDER, f"{filename}.%(ext)s")
+    if data.stream and data.format_id != 'mp3' and video_clip(data) is None:
+        job, response = await stream_video_download(request, data)
+        if response is not None:
+            return response
+    else:
+        job = submit_video_job(data)
     
+    # Download jalan di worker pool video, event loop tetap bebas
+    await video_jobs.wait(job)
+    
+    if job.status != JOB_FINISHED:
+        raise HTTPException(
+            status_code=500, 
+            detail=f"Gagal download video. Mungkin file terlalu besar (>{MAX_VIDEO_SIZE_MB}MB) atau terjadi error: {job.error}"
+        )
+    
+    # Return file
+    obj = disk_outputs.get(job.filename)
+    if obj is None:
+        raise HTTPException(status_code=410, detail="File sudah kedaluwarsa")
+    return stored_object_response(request, obj, download_name=job.filename)
+
+# 5. VIDEO JOBS (download asinkron + progress)
+@app.post("/api/video-jobs", status_code=202)
+async def create_video_job(request: Request, data: DownloadRequest):
+    """Submit download video, langsung return job id"""
+    check_rate_limit(request, "video")
+    
+    job = submit_video_job(data)
+    return video_job_response(request, job)
+
+@app.get("/api/video-jobs/{job_id}")
+async def get_video_job(request: Request, job_id: str):
+    """Status & progress job download"""
+    return video_job_response(request, get_video_job_or_404(job_id))
+
+@app.get("/api/video-jobs/{job_id}/events")
+async def video_job_events(job_id: str):
+    """Progress job download sebagai Server-Sent Events"""
+    job = get_video_job_or_404(job_id)
+    
+    async def stream_events():
+        async for snapshot in video_jobs.events(job):
+            yield f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n"
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/video-jobs/{job_id}/file")
+async def video_job_file(request: Request, job_id: str):
+    """Ambil file hasil job (support Range / resume)"""
+    job = get_video_job_or_404(job_id)
+    if job.status != JOB_FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job belum selesai (status: {job.status})")
+    
+    obj = disk_outputs.get(job.filename)
+    if obj is None:
+        raise HTTPException(status_code=410, detail="File sudah kedaluwarsa")
+    return stored_object_response(request, obj, download_name=job.filename)
+
+@app.delete("/api/video-jobs/{job_id}")
+async def cancel_video_job(request: Request, job_id: str):
+    """Batalkan job download yang masih jalan"""
+    job = video_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    return video_job_response(request, job)
+
+async def stream_video_download(request: Request, data: DownloadRequest):
+    """(job, StreamingResponse) mode stream; response None jika format tidak bisa
+    di-stream (job tetap jalan sebagai download biasa)"""
+    max_chunks = max(1, int(VIDEO_STREAM_BUFFER_MB * 1024 * 1024) // STREAM_CHUNK_SIZE)
     try:
-        # Konfigurasi download
-        ydl_opts = {
-            'outtmpl': output_template,
-            'quiet': True,
-            'noplaylist': True,
-            'max_filesize': MAX_VIDEO_SIZE_MB * 1024 * 1024,
-            'socket_timeout': 30,
-            'retries': 3
-        }
-        
-        # Format spesifik
-        if data.format_id == 'mp3':
-            ydl_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }],
-            })
-            final_ext = "mp3"
-        else:
-            # Untuk video, pilih format yang reasonable
-            if data.format_id == 'best':
-                ydl_opts['format'] = 'best[filesize<100M]'  # Batasi 100MB
-            else:
-                ydl_opts['format'] = data.format_id
-            final_ext = "mp4"
-        
-        # Download
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([data.url])
-        
-        # Cari file yang didownload
-        final_filename = f"{filename}.{final_ext}"
-        final_path = os.path.join(OUTPUT_FOLDER, final_filename)
-        
-        if not os.path.exists(final_path):
-            # Fallback: cari file dengan prefix yang sama
-            for f in os.listdir(OUTPUT_FOLDER):
-                if f.startswith(filename):
-                    final_path = os.path.join(OUTPUT_FOLDER, f)
-                    final_filename = f
-                    break
-        
-        if not os.path.exists(final_path):
-            raise HTTPException(status_code=500, detail="File download tidak ditemukan")
-        
-        # Schedule cleanup
-        background_tasks.add_task(cleanup_resources)
-        
-        # Return file
-        return FileResponse(
-            final_path,
-            filename=final_filename,
-            media_type='application/octet-stream'
+        job, channel = video_jobs.submit_stream(
+            data.url, data.format_id, asyncio.get_running_loop(), max_chunks
         )
+    except JobQueueFull:
+        raise_queue_full()
+    
+    # Channel yang tidak pernah dibaca (error, client putus sebelum response dikirim)
+    # harus di-detach, kalau tidak worker video tertahan di antrian penuh
+    handed_off = False
+    try:
+        kind, meta = await channel.get()
+        if kind == "error":
+            if isinstance(meta, FileTooLarge):
+                raise HTTPException(status_code=413, detail=f"File terlalu besar (>{MAX_VIDEO_SIZE_MB}MB)")
+            raise HTTPException(status_code=500, detail=f"Gagal download video: {meta}")
+        if meta is None:
+            return job, None
         
-    except Exception as e:
-        logger.error(f"❌ Error Download: {e}")
-        raise HTTPException(
-            status_code=500, 
-            detail=f"Gagal download video. Mungkin file terlalu besar (>100MB) atau terjadi error: {str(e)}"
+        base_url = str(request.base_url).rstrip("/")
+        headers = {
+            "Content-Disposition": f'attachment; filename="{meta["filename"]}"',
+            "X-Job-Id": job.id,
+            # Client putus di tengah jalan: download tetap selesai di server, sisa file
+            # bisa diambil dengan Range dari URL ini
+            "X-Resume-Url": f"{base_url}/api/video-jobs/{job.id}/file",
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no",
+        }
+        if meta["size"]:
+            headers["Content-Length"] = str(meta["size"])
+        response = StreamingResponse(
+            channel.chunks(), media_type=guess_media_type(meta["filename"]), headers=headers,
+            background=BackgroundTask(channel.close)
         )
+        handed_off = True
+        return job, response
+    finally:
+        if not handed_off:
+            channel.detach()
+
+def raise_queue_full():
+    raise HTTPException(
+        status_code=503,
+        detail="Antrian download penuh. Coba lagi nanti.",
+        headers={"Retry-After": "30"}
+    )
+
+def video_clip(data: DownloadRequest):
+    """(start, end) dari request (end None = sampai akhir video), None jika bukan klip"""
+    if data.start is None and data.end is None:
+        return None
+    start = data.start or 0.0
+    if start < 0 or (data.end is not None and data.end <= start):
+        raise HTTPException(status_code=400, detail="Rentang klip tidak valid (0 <= start < end)")
+    if data.end is not None and data.end - start > MAX_CLIP_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Klip maksimal {MAX_CLIP_SECONDS:g} detik")
+    return start, data.end
+
+def submit_video_job(data: DownloadRequest):
+    """Submit job ke worker pool video, 503 jika antrian penuh"""
+    clip = video_clip(data)
+    try:
+        return video_jobs.submit(data.url, data.format_id, clip)
+    except JobQueueFull:
+        raise_queue_full()
+
+def get_video_job_or_404(job_id: str):
+    job = video_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    return job
+
+def video_job_response(request: Request, job) -> dict:
+    base_url = str(request.base_url).rstrip("/")
+    result = job.snapshot()
+    result["status_url"] = f"{base_url}/api/video-jobs/{job.id}"
+    result["events_url"] = f"{base_url}/api/video-jobs/{job.id}/events"
+    if job.status == JOB_FINISHED:
+        result["file_url"] = f"{base_url}/api/video-jobs/{job.id}/file"
+    return result
 
 # Error handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail}
+        content={"detail": exc.detail},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -635,6 +1680,10 @@ async def general_exception_handler(request, exc):
         content={"detail": f"Internal server error: {str(exc)}"}
     )
 
+# Startup breakdown: interpreter + uvicorn sampai main mulai di-import, lalu import main
+startup.record("boot", _imports_started - startup.process_started)
+startup.record("imports", time.time() - _imports_started)
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 5000))
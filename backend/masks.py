@@ -0,0 +1,151 @@
+# backend/masks.py
+# Mask ringkas untuk magic eraser (dikirim lewat multipart, bukan base64 di JSON):
+# - png:     file gambar biasa / PNG 1-bit
+# - rle:     "WxH:n0,n1,n2,..." panjang run bergantian 0/255, mulai dari 0, row-major
+# - strokes: JSON polyline {"width", "height", "strokes": [{"size", "points", "erase"}]}
+# Semua dirasterisasi ke mask L (0/255) di server.
+import io
+import json
+import math
+import threading
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+MASK_KINDS = ("png", "rle", "strokes")
+MAX_MASK_DIMENSION = 8192
+MAX_STROKES = 512
+MAX_STROKE_POINTS = 100_000
+
+
+class MaskFormatError(ValueError):
+    """Payload mask tidak valid"""
+
+
+def _check_size(width, height):
+    if not (isinstance(width, int) and isinstance(height, int)):
+        raise MaskFormatError("Ukuran mask harus bilangan bulat")
+    if not (0 < width <= MAX_MASK_DIMENSION and 0 < height <= MAX_MASK_DIMENSION):
+        raise MaskFormatError(f"Ukuran mask harus 1..{MAX_MASK_DIMENSION} px")
+
+
+def decode_png_mask(data: bytes) -> Image.Image:
+    try:
+        mask = Image.open(io.BytesIO(data))
+        _check_size(mask.width, mask.height)
+        return mask.convert("L")
+    except MaskFormatError:
+        raise
+    except Exception:
+        raise MaskFormatError("File mask bukan gambar yang valid")
+
+
+def encode_rle(mask: np.ndarray) -> str:
+    """Mask bool/uint8 (HxW) -> string RLE (kebalikan decode_rle)"""
+    h, w = mask.shape
+    flat = np.asarray(mask).reshape(-1) > 0
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], changes, [flat.size]))
+    runs = np.diff(bounds).tolist()
+    if flat.size and flat[0]:
+        runs.insert(0, 0)  # run pertama selalu background
+    return f"{w}x{h}:" + ",".join(map(str, runs))
+
+
+def decode_rle(text: str) -> Image.Image:
+    try:
+        size, _, body = text.strip().partition(":")
+        width, height = (int(v) for v in size.lower().split("x"))
+        runs = np.array([int(v) for v in body.split(",")] if body else [], dtype=np.int64)
+    except ValueError:
+        raise MaskFormatError("Format RLE harus 'WxH:n0,n1,...'")
+    _check_size(width, height)
+    if runs.size and runs.min() < 0:
+        raise MaskFormatError("Panjang run RLE tidak boleh negatif")
+    if int(runs.sum()) != width * height:
+        raise MaskFormatError(f"Total run RLE harus {width * height} (WxH)")
+    values = np.zeros(runs.size, dtype=np.uint8)
+    values[1::2] = 255
+    return Image.fromarray(np.repeat(values, runs).reshape(height, width), "L")
+
+
+def rasterize_strokes(text: str) -> Image.Image:
+    try:
+        spec = json.loads(text)
+        width, height = spec["width"], spec["height"]
+        strokes = spec["strokes"]
+    except (ValueError, KeyError, TypeError):
+        raise MaskFormatError("Format strokes harus JSON {width, height, strokes: [...]}")
+    _check_size(width, height)
+    if not isinstance(strokes, list) or len(strokes) > MAX_STROKES:
+        raise MaskFormatError(f"Maksimum {MAX_STROKES} stroke")
+
+    # Brush lebih lebar dari ini sudah menutupi seluruh mask; koordinat di luar margin
+    # ini tidak mengubah mask (biaya raster Pillow naik dengan size & jarak titik)
+    limit = 2 * max(width, height)
+    mask = Image.new("L", (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    total_points = 0
+    for stroke in strokes:
+        try:
+            size = max(1, int(stroke.get("size", 20)))
+            points = [(float(x), float(y)) for x, y in stroke["points"]]
+            fill = 0 if stroke.get("erase") else 255
+        except (ValueError, KeyError, TypeError, AttributeError, OverflowError):
+            raise MaskFormatError("Stroke harus berisi points [[x, y], ...] dan size")
+        if size > limit:
+            raise MaskFormatError(f"Size stroke maksimum {limit} px")
+        for x, y in points:
+            if not (math.isfinite(x) and math.isfinite(y)
+                    and -limit <= x <= width + limit and -limit <= y <= height + limit):
+                raise MaskFormatError("Koordinat stroke di luar jangkauan mask")
+        total_points += len(points)
+        if total_points > MAX_STROKE_POINTS:
+            raise MaskFormatError(f"Maksimum {MAX_STROKE_POINTS} titik stroke")
+        if len(points) > 1:
+            draw.line(points, fill=fill, width=size, joint="curve")
+        # Ujung bulat (seperti brush canvas di frontend)
+        r = size / 2
+        for x, y in (points[:1] + points[-1:]):
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=fill)
+    return mask
+
+
+def decode_mask(kind: str, payload) -> Image.Image:
+    """Payload mask (bytes untuk png, str untuk rle/strokes) -> mask L"""
+    if kind == "png":
+        return decode_png_mask(payload)
+    if kind == "rle":
+        return decode_rle(payload)
+    if kind == "strokes":
+        return rasterize_strokes(payload)
+    raise MaskFormatError(f"Jenis mask tidak dikenal: {kind}")
+
+
+class ParseStats:
+    """Statistik ukuran payload & waktu decode input eraser per jalur (json-base64, multipart-*)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, path: str, payload_bytes: int, decode_ms: float):
+        with self._lock:
+            entry = self._stats.setdefault(path, {"count": 0, "total_bytes": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_bytes"] += payload_bytes
+            entry["total_ms"] += decode_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                path: {
+                    "count": e["count"],
+                    "avg_payload_bytes": int(e["total_bytes"] / e["count"]),
+                    "avg_decode_ms": round(e["total_ms"] / e["count"], 2),
+                }
+                for path, e in self._stats.items()
+            }
+
+
+parse_stats = ParseStats()
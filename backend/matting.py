@@ -0,0 +1,72 @@
+# backend/matting.py
+# Upsampling mask resolusi rendah ke resolusi asli dengan fast guided filter
+# (He & Sun 2015): koefisien filter dihitung di resolusi rendah, lalu
+# di-upsample dan diterapkan ke guide (gambar asli) per strip baris,
+# sehingga tepi mask mengikuti tepi gambar tanpa inference di resolusi penuh.
+import numpy as np
+from PIL import Image
+
+# Parameter default (di resolusi rendah, nilai pixel 0..1)
+DEFAULT_RADIUS = 4
+DEFAULT_EPS = 1e-3
+# Tinggi strip saat menerapkan koefisien di resolusi penuh (batas memori sementara)
+BAND_ROWS = 256
+
+
+def box_filter(x: np.ndarray, r: int) -> np.ndarray:
+    """Rata-rata jendela (2r+1)x(2r+1) via integral image, jendela terpotong di tepi"""
+    h, w = x.shape
+    padded = np.pad(x, ((r + 1, r), (0, 0)))
+    c = padded.cumsum(axis=0)
+    rows = c[2 * r + 1:] - c[:-2 * r - 1]
+    padded = np.pad(rows, ((0, 0), (r + 1, r)))
+    c = padded.cumsum(axis=1)
+    sums = c[:, 2 * r + 1:] - c[:, :-2 * r - 1]
+
+    count_h = np.minimum(np.arange(h) + r, h - 1) - np.maximum(np.arange(h) - r, 0) + 1
+    count_w = np.minimum(np.arange(w) + r, w - 1) - np.maximum(np.arange(w) - r, 0) + 1
+    return sums / np.outer(count_h, count_w).astype(x.dtype)
+
+
+def guided_coefficients(guide: np.ndarray, mask: np.ndarray, r: int, eps: float):
+    """Koefisien (a, b) guided filter rata-rata: q = a * I + b"""
+    mean_i = box_filter(guide, r)
+    mean_p = box_filter(mask, r)
+    cov_ip = box_filter(guide * mask, r) - mean_i * mean_p
+    var_i = box_filter(guide * guide, r) - mean_i * mean_i
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    return box_filter(a, r), box_filter(b, r)
+
+
+def guided_upsample(mask: Image.Image, guide: Image.Image, radius: int = DEFAULT_RADIUS,
+                    eps: float = DEFAULT_EPS) -> Image.Image:
+    """Mask L resolusi rendah -> mask L seukuran guide, tepi mengikuti guide"""
+    mask = mask.convert("L")
+    if mask.size == guide.size:
+        return mask
+
+    guide_gray = guide.convert("L")
+    low_guide = guide_gray.resize(mask.size, Image.BILINEAR)
+    i_low = np.asarray(low_guide, dtype=np.float32) / 255.0
+    p_low = np.asarray(mask, dtype=np.float32) / 255.0
+    a_low, b_low = guided_coefficients(i_low, p_low, radius, eps)
+    a_img = Image.fromarray(a_low.astype(np.float32), "F")
+    b_img = Image.fromarray(b_low.astype(np.float32), "F")
+
+    width, height = guide.size
+    low_w, low_h = mask.size
+    scale_y = low_h / height
+    out = np.empty((height, width), dtype=np.uint8)
+    # Per strip: upsample koefisien hanya untuk baris ini (box= menjaga alignment
+    # sama dengan resize penuh), jadi memori float tidak sebesar gambar penuh
+    for y0 in range(0, height, BAND_ROWS):
+        y1 = min(height, y0 + BAND_ROWS)
+        box = (0, y0 * scale_y, low_w, y1 * scale_y)
+        a = np.asarray(a_img.resize((width, y1 - y0), Image.BILINEAR, box=box))
+        b = np.asarray(b_img.resize((width, y1 - y0), Image.BILINEAR, box=box))
+        i_band = np.asarray(guide_gray.crop((0, y0, width, y1)), dtype=np.float32) / 255.0
+        q = a * i_band + b
+        np.clip(q * 255.0 + 0.5, 0, 255, out=q)
+        out[y0:y1] = q.astype(np.uint8)
+    return Image.fromarray(out, "L")
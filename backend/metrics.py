@@ -0,0 +1,275 @@
+# backend/metrics.py
+# Metrik runtime dalam format text Prometheus (exposition 0.0.4), tanpa dependency tambahan:
+# - histogram latency per stage (decode, resize, inference, inpaint, encode, save, yt-dlp)
+# - histogram latency & gauge in-flight per endpoint (middleware ASGI)
+# - gauge callback (queue depth, RSS) yang baru dihitung saat /metrics di-scrape
+# Biaya per observasi: bisect + beberapa increment di bawah lock (~1-2 µs).
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+# Detik. Rentang lebar: encode gambar (ms) sampai download video (menit)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def process_rss_bytes() -> int:
+    """RSS proses saat ini (Linux /proc), 0 jika tidak tersedia"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_start_time() -> float:
+    """Waktu start proses (unix), dari /proc. Fallback: waktu modul ini di-import"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, clock tick sejak boot); nama proses bisa berisi spasi
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return _imported_at
+
+
+_imported_at = time.time()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self):
+        return []
+
+    def render(self) -> str:
+        return "\n".join(self.header() + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class CallbackGauge(Metric):
+    """Gauge yang nilainya diambil dari fungsi saat scrape.
+
+    fn() -> angka, atau dict {tuple label: angka} jika ada labelnames.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+
+    def samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [count per bucket (+Inf di akhir), sum]
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, (list(counts), total)) for k, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metrik {metric.name} sudah terdaftar")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, fn, labelnames=()) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, fn, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "azura_stage_duration_seconds", "Durasi tahap pipeline yang berhasil", ("stage",)
+)
+stage_errors = registry.counter(
+    "azura_stage_errors_total", "Tahap pipeline yang gagal (exception)", ("stage",)
+)
+http_seconds = registry.histogram(
+    "azura_http_request_duration_seconds", "Latency request HTTP per endpoint",
+    ("method", "endpoint", "status")
+)
+http_in_flight = registry.gauge(
+    "azura_http_requests_in_flight", "Request HTTP yang sedang diproses per endpoint", ("endpoint",)
+)
+registry.callback(
+    "process_resident_memory_bytes", "Resident memory (RSS) proses", process_rss_bytes
+)
+_started = process_start_time()
+registry.callback("process_start_time_seconds", "Waktu start proses (unix)", lambda: _started)
+
+
+@contextmanager
+def stage(name: str):
+    """Ukur satu tahap pipeline: durasi masuk histogram kalau sukses, error dihitung terpisah"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(name)
+        raise
+    stage_seconds.observe(time.perf_counter() - start, name)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latency per (method, template route, status) + gauge in-flight.
+
+    Label endpoint memakai template path (/api/video-jobs/{job_id}), bukan URL mentah,
+    jadi jumlah series tetap terbatas. Path yang tidak cocok route mana pun -> "other".
+    """
+
+    # Batas cache path statis (path ber-ID tidak di-cache, jumlahnya tidak terbatas)
+    MAX_CACHED_PATHS = 1024
+
+    def __init__(self, app):
+        self.app = app
+        self._static = {}  # (method, path) -> template route
+
+    @staticmethod
+    def _match(scope) -> str:
+        # scope["app"] = app FastAPI (di-set sebelum middleware stack dipanggil)
+        router = getattr(scope.get("app"), "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "other")
+        return "other"
+
+    def _endpoint(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        endpoint = self._static.get(key)
+        if endpoint is None:
+            endpoint = self._match(scope)
+            if endpoint != "other" and "{" not in endpoint and len(self._static) < self.MAX_CACHED_PATHS:
+                self._static[key] = endpoint
+        return endpoint
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint = self._endpoint(scope)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        http_in_flight.inc(endpoint)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(endpoint)
+            http_seconds.observe(time.perf_counter() - start, scope["method"], endpoint, str(status["code"]))
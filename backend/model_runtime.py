@@ -0,0 +1,227 @@
+# backend/model_runtime.py
+# Pembuat session rembg untuk SessionPool:
+# - ExecutionProfile: thread intra/inter-op, mode eksekusi, level optimasi graph & arena memori
+#   ONNX Runtime (default ORT boros thread & RAM untuk container CPU kecil)
+# - Varian INT8 (dynamic quantization bobot) dibuat sekali dari model FP32 bawaan rembg
+# - Graph ONNX dioptimasi ONNX Runtime sekali lalu hasilnya disimpan di folder model;
+#   start berikutnya langsung load graph tersebut tanpa optimasi ulang
+# rembg & onnxruntime baru di-import saat model pertama di-load (bukan saat import main).
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+logger = logging.getLogger(__name__)
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+# Level "all" menambah optimasi layout yang spesifik hardware: tidak disimpan ke disk
+CACHEABLE_LEVELS = ("basic", "extended")
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+PRECISIONS = ("fp32", "int8")
+
+
+@dataclass
+class ExecutionProfile:
+    """Setting ONNX Runtime untuk session rembg (thread 0 = default ORT: jumlah core)"""
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    execution_mode: str = "sequential"
+    graph_optimization: str = "extended"
+    cpu_mem_arena: bool = True   # arena: alokasi cepat, tapi RAM puncak tidak dikembalikan
+    mem_pattern: bool = True     # pre-alokasi berdasarkan pola alokasi run sebelumnya
+
+    def __post_init__(self):
+        if self.graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+            raise ValueError(
+                f"Level optimasi graph tidak dikenal: {self.graph_optimization}. "
+                f"Pilihan: {', '.join(GRAPH_OPTIMIZATION_LEVELS)}"
+            )
+        if self.execution_mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"Mode eksekusi tidak dikenal: {self.execution_mode}. Pilihan: {', '.join(EXECUTION_MODES)}"
+            )
+        if self.intra_op_threads < 0 or self.inter_op_threads < 0:
+            raise ValueError("Jumlah thread tidak boleh negatif")
+
+    def session_options(self, ort, graph_optimization: str = None):
+        """ort.SessionOptions sesuai profil (graph_optimization bisa di-override)"""
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[self.execution_mode])
+        level = GRAPH_OPTIMIZATION_LEVELS[graph_optimization or self.graph_optimization]
+        options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level)
+        options.enable_cpu_mem_arena = self.cpu_mem_arena
+        options.enable_mem_pattern = self.mem_pattern
+        return options
+
+    def describe(self) -> dict:
+        return asdict(self)
+
+
+def _cache_name(model_name: str, precision: str, level: str, ort_version: str) -> str:
+    # Graph hasil optimasi spesifik versi ONNX Runtime (format node fused bisa berubah)
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", f"{model_name}.{precision}.{level}.ort-{ort_version}")
+    return f"{safe}.opt.onnx"
+
+
+class SessionBuilder:
+    """session_factory SessionPool: session rembg dengan profil ORT, presisi (fp32/int8)
+    & graph teroptimasi yang di-cache di disk"""
+
+    def __init__(self, cache_folder: str = None, profile: ExecutionProfile = None, precision: str = "fp32"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Presisi model tidak dikenal: {precision}. Pilihan: {', '.join(PRECISIONS)}")
+        self.cache_folder = cache_folder
+        self.profile = profile or ExecutionProfile()
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._loads = {}  # model -> info load terakhir
+
+        # Statistik
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.quantized = 0
+        self.fallbacks = 0
+
+    def __call__(self, model_name: str):
+        try:
+            return self._build(model_name)
+        except Exception as e:
+            # Apa pun yang gagal (rembg versi lain, file cache rusak, disk read-only):
+            # pakai jalur bawaan rembg (FP32, tanpa cache) dengan profil yang sama
+            logger.warning(f"⚠️ Session {model_name} ({self.precision}) gagal dibuat, pakai default rembg: {e}")
+            with self._lock:
+                self.fallbacks += 1
+                self._loads[model_name] = {"precision": "fp32", "graph_cache": "off", "fallback": True}
+            return self._default_session(model_name)
+
+    def _default_session(self, model_name: str):
+        import onnxruntime as ort
+        session_class = self._session_class(model_name)
+        return session_class(model_name, self.profile.session_options(ort), ["CPUExecutionProvider"])
+
+    @staticmethod
+    def _session_class(model_name: str):
+        from rembg.sessions import sessions_class
+        for session_class in sessions_class:
+            if session_class.name() == model_name:
+                return session_class
+        raise LookupError(f"Model rembg '{model_name}' tidak dikenal")
+
+    def _quantize(self, model_name: str, source: str) -> str:
+        """Path model INT8 (dynamic quantization bobot), dibuat sekali dari model FP32"""
+        folder = self.cache_folder or os.path.dirname(source)
+        target = os.path.join(folder, f"{model_name}.int8.onnx")
+        if os.path.exists(target):
+            return target
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"🔧 Quantize {model_name} ke INT8...")
+        start = time.perf_counter()
+        tmp = f"{target}.{os.getpid()}.tmp"
+        try:
+            # QUInt8: ConvInteger CPU di ONNX Runtime versi lama hanya menerima bobot uint8
+            quantize_dynamic(source, tmp, weight_type=QuantType.QUInt8)
+            os.replace(tmp, target)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        quantize_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.quantized += 1
+        logger.info(
+            f"✅ {model_name} INT8: {os.path.getsize(source) / 1024 / 1024:.1f}MB -> "
+            f"{os.path.getsize(target) / 1024 / 1024:.1f}MB ({quantize_ms:.0f}ms)"
+        )
+        return target
+
+    def _build(self, model_name: str):
+        import onnxruntime as ort
+
+        session_class = self._session_class(model_name)
+        source = str(session_class.download_models())
+        if self.precision == "int8":
+            source = self._quantize(model_name, source)
+        providers = ["CPUExecutionProvider"]
+        level = self.profile.graph_optimization
+
+        cached = None
+        if self.cache_folder and level in CACHEABLE_LEVELS:
+            cached = os.path.join(self.cache_folder, _cache_name(model_name, self.precision, level, ort.__version__))
+
+        start = time.perf_counter()
+        inner = None
+        hit = cached is not None and os.path.exists(cached)
+        if hit:
+            # Graph sudah dioptimasi: lewati optimasi saat load
+            options = self.profile.session_options(ort, graph_optimization="disable")
+            try:
+                inner = ort.InferenceSession(cached, sess_options=options, providers=providers)
+            except Exception as e:
+                logger.warning(f"⚠️ Graph cache {cached} rusak, dibuat ulang: {e}")
+                hit = False
+                os.remove(cached)
+
+        if inner is None:
+            options = self.profile.session_options(ort)
+            tmp = None
+            if cached is not None:
+                # Tulis ke file sementara lalu rename: proses lain tidak pernah membaca file setengah jadi
+                tmp = f"{cached}.{os.getpid()}.tmp"
+                options.optimized_model_filepath = tmp
+            inner = ort.InferenceSession(source, sess_options=options, providers=providers)
+            if tmp is not None and os.path.exists(tmp):
+                os.replace(tmp, cached)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        # Setara BaseSession.__init__, tapi inner_session dari graph pilihan kita
+        session = session_class.__new__(session_class)
+        session.model_name = model_name
+        session.providers = providers
+        session.inner_session = inner
+
+        graph_cache = "off" if cached is None else ("hit" if hit else "miss")
+        with self._lock:
+            if cached is not None:
+                if hit:
+                    self.cache_hits += 1
+                else:
+                    self.cache_misses += 1
+            self._loads[model_name] = {
+                "precision": self.precision,
+                "graph_cache": graph_cache,
+                "session_ms": round(load_ms, 1),
+            }
+        logger.info(f"⚙️ Session {model_name} ({self.precision}): graph cache {graph_cache} ({load_ms:.0f}ms)")
+        return session
+
+    def loaded_precision(self, model_name: str) -> str:
+        """Presisi session yang benar-benar termuat (fp32 kalau INT8 gagal & fallback).
+        Model yang belum dimuat: presisi konfigurasi"""
+        with self._lock:
+            return self._loads.get(model_name, {}).get("precision", self.precision)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "precision": self.precision,
+                "loaded_precision": {name: info["precision"] for name, info in self._loads.items()},
+                "profile": self.profile.describe(),
+                "cache_folder": self.cache_folder,
+                "graph_cache_hits": self.cache_hits,
+                "graph_cache_misses": self.cache_misses,
+                "quantized": self.quantized,
+                "fallbacks": self.fallbacks,
+                "models": dict(self._loads),
+            }
@@ -0,0 +1,91 @@
+# backend/ratelimit.py
+# Rate limiter token bucket per client, O(1) per request.
+# Setiap kelas endpoint (inference, video, metadata) punya budget sendiri.
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Token bucket per client dengan eviksi idle yang di-amortisasi.
+
+    Bucket disimpan di OrderedDict urut waktu akses terakhir, jadi entry
+    paling depan selalu yang paling lama idle. Setiap check cukup melihat
+    beberapa entry terdepan untuk membuang bucket yang sudah penuh lagi
+    (tidak perlu scan semua client).
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = 100_000):
+        self.rate = max(rate_per_minute, 0.001) / 60.0  # token per detik
+        self.burst = max(1, burst)
+        self.max_clients = max(1, max_clients)
+        # Bucket yang idle selama ini pasti sudah terisi penuh -> aman dibuang
+        self.idle_ttl = self.burst / self.rate
+        self._buckets = OrderedDict()  # client -> [tokens, last_update]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def check(self, client: str, now: float = None, tokens: int = 1):
+        """Ambil token (default 1) untuk client, semua atau tidak sama sekali.
+        Return (diizinkan, retry_after_detik)"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                bucket = [float(self.burst), now]
+            else:
+                level, last = bucket
+                bucket[0] = min(float(self.burst), level + (now - last) * self.rate)
+                bucket[1] = now
+            self._buckets[client] = bucket  # pindah ke belakang (paling baru)
+
+            if bucket[0] >= tokens:
+                bucket[0] -= tokens
+                allowed, retry_after = True, 0.0
+                self.allowed += 1
+            else:
+                allowed, retry_after = False, (tokens - bucket[0]) / self.rate
+                self.rejected += 1
+
+            self._expire(now)
+            return allowed, retry_after
+
+    def _expire(self, now: float):
+        # Maks 2 entry per check: amortized O(1), tapi tetap lebih cepat dari laju insert
+        for _ in range(2):
+            if not self._buckets:
+                return
+            client, (_, last) = next(iter(self._buckets.items()))
+            if now - last < self.idle_ttl and len(self._buckets) <= self.max_clients:
+                return
+            del self._buckets[client]
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": round(self.rate * 60, 3),
+            "burst": self.burst,
+            "tracked_clients": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """Kumpulan token bucket, satu per kelas endpoint"""
+
+    def __init__(self, budgets: dict, max_clients: int = 100_000):
+        self.limiters = {
+            name: TokenBucketLimiter(rate, burst, max_clients=max_clients)
+            for name, (rate, burst) in budgets.items()
+        }
+
+    def check(self, endpoint_class: str, client: str, tokens: int = 1):
+        return self.limiters[endpoint_class].check(client, tokens=tokens)
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
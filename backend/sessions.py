@@ -0,0 +1,184 @@
+# backend/sessions.py
+# Pool session rembg: model di-load saat pertama dipakai, disimpan di RAM
+# selama masih muat di budget, model paling lama tidak dipakai dibuang dulu (LRU).
+import asyncio
+import gc
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from metrics import process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+# Model yang boleh diminta lewat API (ukuran file ONNX kira-kira)
+AVAILABLE_MODELS = {
+    "u2netp": 4.7,            # Sangat ringan
+    "silueta": 43,            # Quick silhouette
+    "u2net_human_seg": 176,   # Spesifik manusia
+    "u2net": 176,             # General purpose
+    "isnet-anime": 176,       # Untuk anime
+    "isnet-general-use": 179,
+}
+
+# RSS setelah load kira-kira 2x ukuran file (weights + arena ONNX Runtime)
+_RESIDENT_FACTOR = 2.0
+
+
+class ModelNotAvailable(ValueError):
+    """Model tidak dikenal / tidak diizinkan"""
+
+
+def default_session_factory(model_name: str):
+    from rembg import new_session
+    return new_session(model_name)
+
+
+class PooledSession:
+    def __init__(self, model_name: str, session, load_ms: float, resident_bytes: int, pinned: bool):
+        self.model_name = model_name
+        self.session = session
+        self.load_ms = load_ms
+        self.resident_bytes = resident_bytes
+        self.pinned = pinned
+        self.last_used = time.monotonic()
+        self.uses = 0
+        self.batcher = None  # diisi on_load (MicroBatcher per model)
+
+
+class SessionPool:
+    """Session rembg per model, lazy load + eviksi LRU berdasarkan budget RAM"""
+
+    def __init__(self, budget_bytes: int, default_model: str = "u2netp", pin_default: bool = True,
+                 session_factory: Callable = None, on_load: Optional[Callable] = None,
+                 allowed_models=None):
+        self.budget_bytes = budget_bytes
+        self.default_model = default_model
+        self.pin_default = pin_default
+        self.session_factory = session_factory or default_session_factory
+        self.on_load = on_load
+        self.allowed_models = set(allowed_models or AVAILABLE_MODELS)
+        self.allowed_models.add(default_model)
+        self._entries = {}
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.load_failures = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry.resident_bytes for entry in self._entries.values())
+
+    def is_loaded(self, model_name: str = None) -> bool:
+        return (model_name or self.default_model) in self._entries
+
+    def resolve(self, model_name: Optional[str]) -> str:
+        """Nama model dari request (None = default), error jika tidak diizinkan"""
+        model_name = (model_name or self.default_model).strip()
+        if model_name not in self.allowed_models:
+            raise ModelNotAvailable(
+                f"Model '{model_name}' tidak tersedia. Pilihan: {', '.join(sorted(self.allowed_models))}"
+            )
+        return model_name
+
+    async def acquire(self, model_name: Optional[str] = None) -> PooledSession:
+        """Session untuk model ini (load dulu di thread jika belum ada)"""
+        model_name = self.resolve(model_name)
+        entry = self._entries.get(model_name)
+        if entry is None:
+            lock = self._load_locks.setdefault(model_name, asyncio.Lock())
+            async with lock:
+                entry = self._entries.get(model_name)
+                if entry is None:
+                    entry = await asyncio.to_thread(self.load, model_name)
+        entry.last_used = time.monotonic()
+        entry.uses += 1
+        return entry
+
+    def load(self, model_name: str) -> PooledSession:
+        """Load model (sync). Model lain dibuang dulu jika budget tidak cukup"""
+        entry = self._entries.get(model_name)
+        if entry is not None:
+            return entry
+
+        estimate = int(AVAILABLE_MODELS.get(model_name, 50) * 1024 * 1024 * _RESIDENT_FACTOR)
+        self._evict_for(estimate, keep=model_name)
+
+        logger.info(f"📦 Loading model {model_name}...")
+        rss_before = process_rss_bytes()
+        start = time.perf_counter()
+        try:
+            session = self.session_factory(model_name)
+        except Exception:
+            self.load_failures += 1
+            raise
+        load_ms = (time.perf_counter() - start) * 1000
+        measured = process_rss_bytes() - rss_before
+        # Delta RSS bisa 0/negatif (memori bekas model lain dipakai ulang): pakai estimasi
+        resident = measured if measured > estimate // 4 else estimate
+
+        entry = PooledSession(
+            model_name, session, load_ms, resident,
+            pinned=self.pin_default and model_name == self.default_model
+        )
+        if self.on_load is not None:
+            self.on_load(entry)
+        with self._lock:
+            self._entries[model_name] = entry
+            self.loads += 1
+        logger.info(f"✅ Model {model_name} loaded ({load_ms:.0f}ms, ~{resident / 1024 / 1024:.0f}MB)")
+
+        self._evict_for(0, keep=model_name)
+        return entry
+
+    def _evict_for(self, needed: int, keep: str):
+        """Buang model LRU (yang tidak di-pin) sampai needed byte muat di budget"""
+        evicted = False
+        with self._lock:
+            while self.resident_bytes + needed > self.budget_bytes:
+                candidates = [
+                    e for e in self._entries.values()
+                    if not e.pinned and e.model_name != keep
+                ]
+                if not candidates:
+                    break
+                victim = min(candidates, key=lambda e: e.last_used)
+                del self._entries[victim.model_name]
+                self.evictions += 1
+                evicted = True
+                logger.info(f"♻️ Model {victim.model_name} dibuang dari RAM (LRU)")
+        if evicted:
+            gc.collect()
+        if needed and self.resident_bytes + needed > self.budget_bytes:
+            logger.warning(
+                f"⚠️ Budget model {self.budget_bytes / 1024 / 1024:.0f}MB tidak cukup "
+                f"(model lain di-pin); tetap load {keep}"
+            )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "default_model": self.default_model,
+                "budget_bytes": self.budget_bytes,
+                "resident_bytes": self.resident_bytes,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "evictions": self.evictions,
+                "available": sorted(self.allowed_models),
+                "models": {
+                    name: {
+                        "load_ms": round(e.load_ms, 1),
+                        "resident_bytes": e.resident_bytes,
+                        "pinned": e.pinned,
+                        "uses": e.uses,
+                        "batching": e.batcher.stats() if e.batcher is not None else None,
+                    }
+                    for name, e in self._entries.items()
+                },
+            }
@@ -0,0 +1,64 @@
+# backend/startup.py
+# Catatan tahap startup (boot interpreter, import, load model, warmup, ...) untuk log,
+# /health/ready, /api/stats dan /metrics. Server sudah menerima koneksi (liveness)
+# sebelum model siap; readiness baru true setelah semua tahap selesai.
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import process_start_time
+
+
+class StartupTracker:
+    def __init__(self):
+        self.process_started = process_start_time()
+        self._lock = threading.Lock()
+        self._stages = {}  # nama -> {"seconds", "ok", "detail"} (urutan = urutan tahap)
+        self.ready = False
+        self.ready_at = None
+
+    def record(self, name: str, seconds: float, ok: bool = True, detail: str = None):
+        with self._lock:
+            self._stages[name] = {"seconds": round(seconds, 3), "ok": ok}
+            if detail:
+                self._stages[name]["detail"] = detail
+
+    @contextmanager
+    def stage(self, name: str):
+        """Ukur satu tahap (boleh membungkus await). Exception tetap diteruskan"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, time.perf_counter() - start, ok=False, detail=str(e) or type(e).__name__)
+            raise
+        self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self):
+        self.ready_at = time.time()
+        self.ready = True
+
+    def stage_seconds(self) -> dict:
+        with self._lock:
+            return {(name,): info["seconds"] for name, info in self._stages.items()}
+
+    def summary(self) -> str:
+        """Ringkasan satu baris untuk log"""
+        with self._lock:
+            parts = [f"{name}={info['seconds'] * 1000:.0f}ms" for name, info in self._stages.items()]
+        total = (self.ready_at or time.time()) - self.process_started
+        return f"{' '.join(parts)} | total {total:.2f}s"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: dict(info) for name, info in self._stages.items()}
+        end = self.ready_at if self.ready else time.time()
+        return {
+            "ready": self.ready,
+            # Dari proses dibuat (exec python) sampai ready / sekarang
+            "seconds_since_process_start": round(end - self.process_started, 3),
+            "stages": stages,
+        }
+
+
+startup = StartupTracker()
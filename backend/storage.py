@@ -0,0 +1,345 @@
+# backend/storage.py
+# Output store: tempat hasil proses disimpan sebelum diambil client lewat /outputs/{name}.
+# Backend "disk" (folder outputs/) atau "memory" (RAM, TTL + budget byte total).
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StoredObject:
+    name: str
+    size: int
+    media_type: str
+    etag: str
+    created: float
+    data: Optional[bytes] = None  # backend memory
+    path: Optional[str] = None    # backend disk
+
+    def read_range(self, start: int, end: int, chunk_size: int = 64 * 1024):
+        """Generator bytes [start, end] (inklusif), dipotong per chunk"""
+        if self.data is not None:
+            view = memoryview(self.data)
+            for offset in range(start, end + 1, chunk_size):
+                yield bytes(view[offset:min(offset + chunk_size, end + 1)])
+            return
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+def is_safe_name(name: str) -> bool:
+    """Nama file output harus polos (tanpa path / file tersembunyi)"""
+    return bool(name) and os.path.basename(name) == name and not name.startswith(".")
+
+
+MEDIA_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".avif": "image/avif",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+}
+
+
+def guess_media_type(name: str) -> str:
+    return MEDIA_TYPES.get(os.path.splitext(name)[1].lower(), "application/octet-stream")
+
+
+class DiskOutputStore:
+    """Output disimpan sebagai file di folder outputs/"""
+
+    blocking = True
+
+    def __init__(self, folder: str, janitor: "OutputJanitor" = None):
+        self.folder = folder
+        self.janitor = janitor
+        os.makedirs(folder, exist_ok=True)
+
+    def path_for(self, name: str) -> str:
+        return os.path.join(self.folder, name)
+
+    def put(self, name: str, data: bytes, media_type: str = None) -> StoredObject:
+        path = self.path_for(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self.janitor is not None:
+            self.janitor.track(path, len(data))
+        return self.get(name)
+
+    def put_stream(self, name: str, chunks, media_type: str = None) -> StoredObject:
+        """Seperti put, tapi data ditulis per chunk (output besar tidak dikumpulkan di RAM)"""
+        path = self.path_for(name)
+        tmp_path = f"{path}.tmp"
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if self.janitor is not None:
+            self.janitor.track(path, size)
+        return self.get(name)
+
+    def get(self, name: str) -> Optional[StoredObject]:
+        if not is_safe_name(name):
+            return None
+        path = self.path_for(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return StoredObject(
+            name=name,
+            size=st.st_size,
+            media_type=guess_media_type(name),
+            etag=f'"{st.st_size:x}-{st.st_mtime_ns:x}"',
+            created=st.st_mtime,
+            path=path,
+        )
+
+    def delete(self, name: str):
+        if is_safe_name(name):
+            try:
+                os.remove(self.path_for(name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {"backend": "disk", "folder": self.folder}
+
+
+class MemoryOutputStore:
+    """Output disimpan di RAM dengan TTL dan budget byte total (LRU by umur)"""
+
+    blocking = False
+
+    def __init__(self, ttl: float = 900, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._objects = OrderedDict()  # name -> StoredObject, urut waktu simpan
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def put(self, name: str, data: bytes, media_type: str = None) -> StoredObject:
+        obj = StoredObject(
+            name=name,
+            size=len(data),
+            media_type=media_type or guess_media_type(name),
+            etag=f'"{hashlib.md5(data).hexdigest()}"',
+            created=time.time(),
+            data=data,
+        )
+        with self._lock:
+            self._remove(name)
+            self._objects[name] = obj
+            self._bytes += obj.size
+            self._purge_expired(obj.created)
+            # Budget penuh: buang yang paling lama (selain yang baru masuk)
+            while self._bytes > self.max_bytes and len(self._objects) > 1:
+                oldest = next(iter(self._objects))
+                self._remove(oldest)
+                self.evicted += 1
+        return obj
+
+    def get(self, name: str) -> Optional[StoredObject]:
+        with self._lock:
+            obj = self._objects.get(name)
+            if obj is None:
+                return None
+            if time.time() - obj.created > self.ttl:
+                self._remove(name)
+                self.expired += 1
+                return None
+            return obj
+
+    def delete(self, name: str):
+        with self._lock:
+            self._remove(name)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_expired(time.time())
+
+    def _purge_expired(self, now: float) -> int:
+        # Semua object punya TTL sama, jadi yang kedaluwarsa selalu di depan
+        purged = 0
+        while self._objects:
+            name, obj = next(iter(self._objects.items()))
+            if now - obj.created <= self.ttl:
+                break
+            self._remove(name)
+            purged += 1
+        self.expired += purged
+        return purged
+
+    def _remove(self, name: str):
+        obj = self._objects.pop(name, None)
+        if obj is not None:
+            self._bytes -= obj.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "objects": len(self._objects),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "evicted": self.evicted,
+                "expired": self.expired,
+            }
+
+
+class OutputJanitor:
+    """Hapus file output yang kedaluwarsa berdasarkan index waktu (min-heap), bukan scan folder.
+
+    Setiap file yang dibuat server didaftarkan lewat track(). Sweep periodik
+    hanya mem-pop entry yang sudah lewat TTL, plus membuang file terlama jika
+    total ukuran melewati batas disk.
+    """
+
+    def __init__(self, ttl: float = 900, max_bytes: int = 0, interval: float = 60):
+        self.ttl = ttl
+        self.max_bytes = max_bytes  # 0 = tanpa batas
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._files = {}         # path -> (created, expires_at, size)
+        self._by_expiry = []     # heap (expires_at, path)
+        self._by_age = []        # heap (created, path)
+        self._bytes = 0
+        self.deleted_expired = 0
+        self.deleted_capacity = 0
+        self.memory_stores = []  # MemoryOutputStore yang ikut di-purge tiap sweep
+
+    def track(self, path: str, size: int = None, ttl: float = None, created: float = None):
+        """Daftarkan file baru (dipanggil setelah file selesai ditulis)"""
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                return
+        created = time.time() if created is None else created
+        expires_at = created + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._files[path] = (created, expires_at, size)
+            self._bytes += size
+            heapq.heappush(self._by_expiry, (expires_at, path))
+            heapq.heappush(self._by_age, (created, path))
+
+    def seed(self, folders):
+        """Scan sekali saat startup untuk file sisa proses sebelumnya"""
+        for folder in folders:
+            if not os.path.isdir(folder):
+                continue
+            for entry in os.scandir(folder):
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        self.track(entry.path, st.st_size, created=st.st_mtime)
+                except OSError:
+                    pass
+
+    def sweep(self, now: float = None) -> int:
+        """Hapus file expired + file terlama jika melewati batas disk. Return jumlah file dihapus"""
+        now = time.time() if now is None else now
+        victims = []
+        with self._lock:
+            while self._by_expiry and self._by_expiry[0][0] <= now:
+                expires_at, path = heapq.heappop(self._by_expiry)
+                entry = self._files.get(path)
+                if entry is None or entry[1] != expires_at:
+                    continue  # entry lama (file sudah dihapus / di-track ulang)
+                self._forget(path)
+                victims.append(path)
+                self.deleted_expired += 1
+
+            while self.max_bytes and self._bytes > self.max_bytes and self._by_age:
+                created, path = heapq.heappop(self._by_age)
+                entry = self._files.get(path)
+                if entry is None or entry[0] != created:
+                    continue
+                self._forget(path)
+                victims.append(path)
+                self.deleted_capacity += 1
+
+            # Buang entry basi dari heap (cegah heap tumbuh tanpa batas)
+            if len(self._by_age) > 2 * len(self._files) + 64:
+                self._by_age = [(c, p) for p, (c, _, _) in self._files.items()]
+                heapq.heapify(self._by_age)
+            if len(self._by_expiry) > 2 * len(self._files) + 64:
+                self._by_expiry = [(e, p) for p, (_, e, _) in self._files.items()]
+                heapq.heapify(self._by_expiry)
+
+        for path in victims:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        for store in self.memory_stores:
+            store.purge_expired()
+        return len(victims)
+
+    def _forget(self, path: str):
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    async def run(self):
+        """Loop periodik (dijalankan sebagai background task dari lifespan)"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                deleted = await asyncio.to_thread(self.sweep)
+                if deleted:
+                    logger.info(f"🧹 Janitor: {deleted} file dihapus")
+            except Exception as e:
+                logger.error(f"Janitor error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked_files": len(self._files),
+                "tracked_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "interval_seconds": self.interval,
+                "deleted_expired": self.deleted_expired,
+                "deleted_capacity": self.deleted_capacity,
+            }
@@ -0,0 +1,180 @@
+# backend/upscaler.py
+# Smart Upscaler (2x/4x, Lanczos + unsharp mask) per tile: gambar sumber dipotong jadi
+# tile dengan margin overlap, tiap tile di-resize & dipertajam di thread pool (Pillow
+# melepas GIL), margin dibuang lalu tile disusun per band baris dan band langsung
+# di-encode (PNG streaming). Gambar hasil ukuran penuh tidak pernah ada di RAM.
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from encoder import PNGStreamWriter, deflate_band
+from metrics import stage
+
+SCALES = (2, 4)
+LANCZOS_SUPPORT = 3      # radius kernel Lanczos di pixel sumber
+DEFAULT_TILE = 256       # sisi tile di pixel sumber
+BAND_BYTES = 8 * 1024 * 1024  # target ukuran satu band hasil (RAM per band yang sedang diproses)
+LOOKAHEAD_BANDS = 2      # band yang boleh diproses di depan band yang sedang dikirim
+
+
+@dataclass
+class UpscaleParams:
+    scale: int
+    sharpen: int = 80        # persen unsharp mask (0 = tanpa sharpening)
+    radius: float = 1.5      # radius unsharp mask di pixel hasil
+    threshold: int = 2
+    tile: int = DEFAULT_TILE
+
+    @property
+    def overlap(self) -> int:
+        """Margin tile (pixel sumber): lebih lebar dari jangkauan Lanczos + blur unsharp,
+        jadi pixel inti tile identik dengan hasil proses gambar utuh (tanpa seam)"""
+        blur = math.ceil(3 * self.radius / self.scale) if self.sharpen else 0
+        return LANCZOS_SUPPORT + blur + 1
+
+
+def output_size(width: int, height: int, scale: int):
+    return width * scale, height * scale
+
+
+def band_rows(width: int, scale: int, channels: int, tile: int) -> int:
+    """Tinggi band (pixel sumber): dibatasi BAND_BYTES, maksimal satu tile"""
+    per_row = width * scale * scale * channels
+    return max(8, min(tile, BAND_BYTES // max(1, per_row)))
+
+
+def memory_estimate(width: int, height: int, scale: int, channels: int = 4, tile: int = DEFAULT_TILE) -> int:
+    """Perkiraan puncak RAM upscale (byte) di luar decode: gambar sumber + band yang sedang
+    di-resize (tile + margin) & dikompres (band disusun + hasil filter PNG)"""
+    rows = band_rows(width, scale, channels, tile)
+    band = rows * scale * width * scale * channels
+    return width * height * channels + band * (3 * LOOKAHEAD_BANDS + 1)
+
+
+def _render_tile(image: Image.Image, box, params: UpscaleParams) -> np.ndarray:
+    """Resize + sharpen satu tile (dengan margin), return pixel inti tile"""
+    x0, y0, x1, y1 = box
+    m = params.overlap
+    cx0, cy0 = max(0, x0 - m), max(0, y0 - m)
+    cx1, cy1 = min(image.width, x1 + m), min(image.height, y1 + m)
+    s = params.scale
+    with stage("upscale"):
+        tile = image.crop((cx0, cy0, cx1, cy1)).resize(((cx1 - cx0) * s, (cy1 - cy0) * s), Image.LANCZOS)
+        if params.sharpen:
+            unsharp = ImageFilter.UnsharpMask(params.radius, params.sharpen, params.threshold)
+            if tile.mode == "RGBA":
+                # Alpha tidak dipertajam (halo di tepi transparan)
+                alpha = tile.getchannel("A")
+                tile = tile.convert("RGB").filter(unsharp)
+                tile.putalpha(alpha)
+            else:
+                tile = tile.filter(unsharp)
+        core = tile.crop(((x0 - cx0) * s, (y0 - cy0) * s, (x1 - cx0) * s, (y1 - cy0) * s))
+        return np.asarray(core)
+
+
+def _deflate_tiles(tiles, level: int):
+    rows = np.concatenate([future.result() for future in tiles], axis=1)
+    return deflate_band(rows, level)
+
+
+class UpscaleStats:
+    """Statistik upscale: jumlah, waktu, pixel & byte hasil"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.tiles = 0
+        self.total_ms = 0.0
+        self.output_pixels = 0
+        self.output_bytes = 0
+        self.cancelled = 0
+
+    def record(self, ms: float, tiles: int, pixels: int, size: int):
+        with self._lock:
+            self.count += 1
+            self.tiles += tiles
+            self.total_ms += ms
+            self.output_pixels += pixels
+            self.output_bytes += size
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "completed": self.count,
+                "cancelled": self.cancelled,
+                "tiles": self.tiles,
+                "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+                "output_megapixels": round(self.output_pixels / 1_000_000, 1),
+                "output_bytes": self.output_bytes,
+            }
+
+
+upscale_stats = UpscaleStats()
+
+
+def upscale_png_stream(image: Image.Image, params: UpscaleParams, executor: Executor,
+                       preset: str = "balanced", wrap=None):
+    """Generator bytes PNG hasil upscale, band demi band dari atas.
+
+    Tile satu band di-resize paralel di executor, band lalu dikompres juga di executor
+    (beberapa band sekaligus); maksimal LOOKAHEAD_BANDS band di depan band yang dikirim,
+    jadi client yang lambat menahan (backpressure) pekerjaan berikutnya.
+    wrap(fn) opsional membungkus setiap job executor (mis. Ticket.wrap admission).
+    """
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    wrap = wrap or (lambda fn: fn)
+    width, height = image.size
+    out_w, out_h = output_size(width, height, params.scale)
+    channels = len(image.getbands())
+    rows = band_rows(width, params.scale, channels, params.tile)
+    writer = PNGStreamWriter(out_w, out_h, image.mode, preset)
+    render, deflate = wrap(_render_tile), wrap(_deflate_tiles)
+
+    start = time.perf_counter()
+    rendering, deflating = deque(), deque()
+    tiles = 0
+    finished = False
+    try:
+        yield writer.header()
+        for y0 in range(0, height, rows):
+            y1 = min(height, y0 + rows)
+            band = [
+                executor.submit(render, image, (x0, y0, min(width, x0 + params.tile), y1), params)
+                for x0 in range(0, width, params.tile)
+            ]
+            tiles += len(band)
+            rendering.append(band)
+            if len(rendering) > LOOKAHEAD_BANDS:
+                deflating.append(executor.submit(deflate, rendering.popleft(), writer.level))
+            while len(deflating) > LOOKAHEAD_BANDS:
+                yield writer.band(deflating.popleft().result())
+        while rendering:
+            deflating.append(executor.submit(deflate, rendering.popleft(), writer.level))
+        while deflating:
+            yield writer.band(deflating.popleft().result())
+        tail = writer.finish()
+        finished = True
+        upscale_stats.record((time.perf_counter() - start) * 1000, tiles, out_w * out_h,
+                             writer.bytes_written)
+        yield tail
+    finally:
+        if not finished:
+            # Client putus / error: tile & band yang belum jalan tidak usah dikerjakan
+            upscale_stats.record_cancelled()
+            for future in deflating:
+                future.cancel()
+            for band in rendering:
+                for future in band:
+                    future.cancel()